@@ -24,3 +24,17 @@ import pytest
 
 def pytest_addoption(parser):
     parser.addoption("--runslow", action="store_true", help="run slow tests")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: run only with --runslow")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip the tests marked as slow unless --runslow is given."""
+    if config.getoption("--runslow"):
+        return
+    skip = pytest.mark.skip(reason="need --runslow option to run")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
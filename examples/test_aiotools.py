@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+This code is part of the Mathematical Programming Toolbox PyMPL.
+
+Copyright (C) 2015-2016, Filipe Brandao
+Faculdade de Ciencias, Universidade do Porto
+Porto, Portugal. All rights reserved. E-mail: <fdabrandao@dcc.fc.up.pt>.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from __future__ import print_function
+
+import time
+import asyncio
+from pympl import Tools
+from test_unittests import sleep_wrapper
+
+
+def test_ascript():
+    """Test the asyncio interface of Tools."""
+    script, models = sleep_wrapper(4)
+
+    async def solve_all():
+        return await asyncio.gather(*[
+            Tools.ascript(script, model, verbose=False) for model in models
+        ])
+
+    t0 = time.time()
+    results = asyncio.run(solve_all())
+    assert time.time() - t0 < 1.5
+    assert [values for output, values in results] == [
+        {"x": i+1} for i in range(4)
+    ]
+
+    async def cancel():
+        task = asyncio.ensure_future(Tools.arun("sleep 30", verbose=False))
+        await asyncio.sleep(0.2)
+        proc = Tools.PLIST[-1]
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return proc.returncode
+
+    t0 = time.time()
+    assert asyncio.run(cancel()) == -15
+    assert time.time() - t0 < 5
+
+
+def test_arun_limits():
+    """Test the limits and the resource usage of the asyncio interface."""
+    import sys
+    import pytest
+    script, models = sleep_wrapper(1, seconds=0.1)
+    output, values, usage = asyncio.run(Tools.ascript(
+        script, models[0], verbose=False, cache=False, return_usage=True
+    ))
+    assert values == {"x": 1} and usage["exit_code"] == 0
+    assert usage["wall"] >= 0.1 and not usage["timeout"]
+    python = "{0} -c \"{1}\"".format(sys.executable, "{0}")
+    usage = asyncio.run(Tools.arun(
+        python.format("x = bytearray(2**26); x[::4096] = b'1'*len(x[::4096])"),
+        verbose=False
+    ))
+    if usage["max_rss"] is not None:
+        assert usage["max_rss"] >= 2**26 and usage["cpu"] > 0
+    with pytest.raises(RuntimeError):
+        asyncio.run(Tools.arun(
+            python.format("x = bytearray(2**30)"), verbose=False,
+            memory_limit=2**28
+        ))
+    t0 = time.time()
+    with pytest.raises(RuntimeError):
+        asyncio.run(Tools.arun(
+            python.format("while True: pass"), verbose=False, cpu_limit=1
+        ))
+    assert time.time() - t0 < 5
+    t0 = time.time()
+    usage = asyncio.run(Tools.arun("sleep 5", verbose=False, timeout=0.2))
+    assert usage["timeout"] and usage["exit_code"] != 0
+    assert time.time() - t0 < 2
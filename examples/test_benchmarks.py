@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+"""
+This code is part of the Mathematical Programming Toolbox PyMPL.
+
+Copyright (C) 2015-2016, Filipe Brandao
+Faculdade de Ciencias, Universidade do Porto
+Porto, Portugal. All rights reserved. E-mail: <fdabrandao@dcc.fc.up.pt>.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from __future__ import print_function
+from builtins import range
+
+import os
+import sys
+import json
+import time
+import random
+import pytest
+slow = pytest.mark.slow  # see conftest.py
+
+RESULTS = []
+BASELINE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "benchmarks.json"
+)
+# the peak memory may exceed the baseline by this factor plus a small
+# margin for noise; times depend on the machine and are only reported
+# (regenerate the baseline with "python test_benchmarks.py
+# data/benchmarks.json")
+MEMORY_TOLERANCE = float(os.environ.get("PYMPL_BENCH_MEMORY_TOLERANCE", 1.2))
+MEMORY_MARGIN = 1e6
+
+
+def load_baseline(fname=BASELINE_FILE):
+    """Load the stored measurements indexed by (name, size)."""
+    try:
+        with open(fname) as f:
+            results = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    return {(res["name"], res["size"]): res for res in results}
+
+
+BASELINE = load_baseline()
+
+
+def measure(name, size, func, *args):
+    """Run func(*args) twice, measuring the time (first run) and the peak
+    memory traced by tracemalloc (second run); checks the peak memory
+    against the baseline and returns the result."""
+    from pympl import Recorder
+    t0 = time.time()
+    func(*args)
+    seconds = time.time() - t0
+    with Recorder() as rec:
+        result = func(*args)
+    memory = rec.report()["stages"]["peak_memory"]
+    RESULTS.append(
+        {"name": name, "size": size, "time": seconds, "memory": memory}
+    )
+    base = BASELINE.get((name, size))
+    print("{0:>20}: {1:8d} {2:8.3f}s {3:8.1f}MB{4}".format(
+        name, size, seconds, memory/1e6,
+        "" if base is None else " (baseline: {0:.3f}s {1:.1f}MB)".format(
+            base["time"], base["memory"]/1e6
+        )
+    ))
+    if base is not None:
+        assert memory <= base["memory"]*MEMORY_TOLERANCE + MEMORY_MARGIN, (
+            "{0} ({1}): {2:.1f}MB (baseline: {3:.1f}MB)".format(
+                name, size, memory/1e6, base["memory"]/1e6
+            )
+        )
+    return result
+
+
+def generate_template(ncmds):
+    """Generate a synthetic PyMPL template with ncmds commands."""
+    return "".join(
+        "$PARAM[P{0}]{{{0}}};\n"
+        "$VAR[x{0}]{{\"integer\", 0, 10}};\n"
+        "/* constraint {0} */\n"
+        "s.t. c{0}: x{0} >= ${{P{0} % 7}}$;\n".format(i)
+        for i in range(ncmds // 3)
+    )
+
+
+def bench_translate(ncmds):
+    """Measure the time taken by PyMPL.translate with ncmds commands."""
+    from pympl import PyMPL
+    template = generate_template(ncmds)
+    parser = PyMPL(locals_={"P{0}".format(i): i for i in range(ncmds)})
+    t0 = time.time()
+    parser.translate(template, comment_cmds=True, inline_data=False)
+    return time.time() - t0
+
+
+@slow
+def test_translate_scaling():
+    """Test if PyMPL.translate scales linearly with the number of commands."""
+    sizes = [3000, 6000, 12000, 24000]
+    times = [bench_translate(n) for n in sizes]
+    for n, t in zip(sizes, times):
+        print("translate: {0:6d} commands {1:8.3f}s {2:8.2f}us/cmd".format(
+            n, t, 1e6*t/n
+        ))
+    # doubling the number of commands three times should keep the time
+    # per command roughly constant (a quadratic translator would be 8x)
+    assert times[-1]/sizes[-1] < 3*times[0]/sizes[0]
+
+
+def generate_model(nnz, row_size=10):
+    """Generate a synthetic model with nnz nonzeros."""
+    from pympl import Model
+    model = Model()
+    nvars = max(nnz // row_size, 1)
+    model.add_vars(
+        ["x{0}".format(j) for j in range(nvars)], lb=0, ub=10, vtype="I"
+    )
+    nrows = nnz // row_size
+    rows = [i for i in range(nrows) for k in range(row_size)]
+    cols = [(i*7+k*13) % nvars for i in range(nrows) for k in range(row_size)]
+    coefs = [(k % 5) - 2 or 1.5 for i in range(nrows) for k in range(row_size)]
+    model.add_cons(rows, cols, coefs, ">=", 1)
+    model.set_obj("min", ["x0", "x1"] if nvars > 1 else ["x0"])
+    return model
+
+
+def bench_write_lp(nnz, lp_file):
+    """Measure the time taken by write_lp on a model with nnz nonzeros."""
+    model = generate_model(nnz)
+    t0 = time.time()
+    model.write_lp(lp_file)
+    return time.time() - t0
+
+
+@slow
+def test_write_lp(tmpdir):
+    """Measure the throughput of the LP writer (default: 10M nonzeros)."""
+    nnz = int(os.environ.get("PYMPL_BENCH_NNZ", 10**7))
+    lp_file = os.path.join(str(tmpdir), "bench.lp")
+    t = bench_write_lp(nnz, lp_file)
+    print("write_lp: {0:d} nonzeros {1:8.3f}s {2:8.1f}MB/s".format(
+        nnz, t, os.path.getsize(lp_file)/1e6/t
+    ))
+
+
+@slow
+@pytest.mark.parametrize("nnz", [10**5, 10**6])
+def test_add_con(nnz):
+    """Measure Model.add_con (one call per constraint)."""
+    from pympl import Model
+
+    def build():
+        model = Model()
+        nvars = nnz // 10
+        xvars = model.add_vars(["x{0}".format(j) for j in range(nvars)])
+        for i in range(nnz // 10):
+            model.add_con(
+                [(xvars[(i*7+k*13) % nvars], k+1) for k in range(10)],
+                ">=", 1
+            )
+        return model
+
+    measure("add_con", nnz, build)
+
+
+@slow
+@pytest.mark.parametrize("nnz", [10**5, 10**6])
+def test_writers(nnz, tmpdir):
+    """Measure the LP, MPS (fixed and free) and GMPL writers."""
+    model = generate_model(nnz)
+    fname = os.path.join(str(tmpdir), "bench")
+    measure("write_lp", nnz, model.write_lp, fname + ".lp")
+    measure("write_mps", nnz, model.write_mps, fname + ".mps")
+    measure("write_mps_free", nnz, model.write_mps, fname + ".mps", True)
+    measure("write_mod", nnz, model.write_mod, fname + ".mod")
+
+
+XFORM_CMDS = [
+    ("WW_U", ["s", "y", "d", "NT"]),
+    ("WW_U_B", ["s", "r", "y", "d", "NT"]),
+    ("WW_CC", ["s", "y", "d", "C", "NT"]),
+    ("LS_U1", ["s", "x", "y", "d", "NT"]),
+    ("LS_U2", ["s", "x", "y", "d", "NT"]),
+    ("DLSI_CC", ["s0", "y", "d", "C", "NT"]),
+]
+# e.g., PYMPL_BENCH_XFORM_SIZES=100,250,500 (500 periods take tens of
+# minutes and several GB)
+XFORM_SIZES = [
+    int(nt)
+    for nt in os.environ.get("PYMPL_BENCH_XFORM_SIZES", "100,250").split(",")
+]
+ATSP_SIZES = [50, 100, 200]
+
+
+def bench_xform(cmd, nt, args):
+    """Translate an LS-LIB command with nt periods."""
+    from pympl import PyMPL
+    rnd = random.Random(nt)
+    variables = {
+        "s": ["s{0}".format(t) for t in range(nt+1)],
+        "r": ["r{0}".format(t) for t in range(nt)],
+        "x": ["x{0}".format(t) for t in range(nt)],
+        "y": ["y{0}".format(t) for t in range(nt)],
+        "z": ["z{0}".format(t) for t in range(nt)],
+        "w": ["w{0}".format(t) for t in range(nt)],
+        "d": [rnd.randint(0, 10) for t in range(nt)],
+        "C": 20, "NT": nt, "s0": "s0",
+    }
+    parser = PyMPL(locals_=variables)
+    return parser.translate("${0}{{{1}}};".format(cmd, ", ".join(args)))
+
+
+@slow
+@pytest.mark.parametrize("nt", XFORM_SIZES)
+@pytest.mark.parametrize("cmd,args", XFORM_CMDS)
+def test_xform(cmd, args, nt):
+    """Measure the LS-LIB extended formulations."""
+    measure(cmd, nt, bench_xform, cmd, nt, args)
+
+
+def complete_graph(n):
+    """Return the graph and x variables of a complete digraph."""
+    V = list(range(1, n+1))
+    A = [(u, v) for u in V for v in V if u != v]
+    xvars = {(u, v): "x_{0}_{1}".format(u, v) for (u, v) in A}
+    return (V, A, V[0]), xvars
+
+
+def bench_atsp(builder, n):
+    """Build an ATSP formulation for a complete digraph with n vertices."""
+    from pympl import Model
+    from pympl.cmds import atsputils
+    graph, xvars = complete_graph(n)
+    model = Model()
+    atsputils.add_assign_constraints(model, xvars, graph)
+    getattr(atsputils, "add_{0}_constraints".format(builder))(
+        model, xvars, graph
+    )
+    return model
+
+
+@slow
+@pytest.mark.parametrize("n", ATSP_SIZES)
+@pytest.mark.parametrize("builder", ["mtz", "scf", "mcf"])
+def test_atsp(builder, n):
+    """Measure the ATSP formulations."""
+    if builder == "mcf" and n > 100:
+        pytest.skip("O(|V|^3) nonzeros (several GB of memory)")
+    measure("atsp_" + builder, n, bench_atsp, builder, n)
+
+
+@slow
+@pytest.mark.parametrize("n", ATSP_SIZES)
+def test_tsp_cut_generator(n):
+    """Measure tsp_cut_generator on a solution made of 5-vertex subtours."""
+    from pympl import Model, Solution
+    from pympl.cmds import atsputils
+    graph, xvars = complete_graph(n)
+    model = Model()
+    atsputils.add_assign_constraints(model, xvars, graph)
+    cutvars = atsputils.add_cut_variables(model, xvars, graph)
+    V = graph[0]
+    values = {}
+    for i in range(0, n - n % 5, 5):
+        cycle = V[i:i+5]
+        for u, v in zip(cycle, cycle[1:] + cycle[:1]):
+            values[cutvars[min(u, v), max(u, v)]] = 1
+    solution = Solution.from_dict(values)
+    cuts = measure(
+        "tsp_cut_generator", n,
+        atsputils.tsp_cut_generator, graph, cutvars, solution
+    )
+    assert len(cuts) == n // 5
+
+
+if __name__ == "__main__":
+    import tempfile
+    tmpdir = tempfile.mkdtemp()
+    if len(sys.argv) > 1:  # record a new baseline
+        BASELINE.clear()
+    test_translate_scaling()
+    test_write_lp(tmpdir)
+    for nnz in [10**5, 10**6]:
+        test_add_con(nnz)
+        test_writers(nnz, tmpdir)
+    for cmd, args in XFORM_CMDS:
+        for nt in XFORM_SIZES:
+            test_xform(cmd, args, nt)
+    for n in ATSP_SIZES:
+        for builder in ["mtz", "scf", "mcf"]:
+            if builder != "mcf" or n <= 100:
+                test_atsp(builder, n)
+        test_tsp_cut_generator(n)
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "w") as f:
+            json.dump(RESULTS, f, indent=2)
@@ -23,11 +23,7 @@ from __future__ import print_function
 
 import sys
 import pytest
-try:
-    runslow = pytest.config.getoption("--runslow")
-except:
-    runslow = False
-slow = pytest.mark.skipif(not runslow, reason="need --runslow option to run")
+slow = pytest.mark.slow  # see conftest.py
 
 
 def test_equivknapsack():
@@ -26,11 +26,7 @@ from builtins import map
 import os
 import sys
 import pytest
-try:
-    runslow = pytest.config.getoption("--runslow")
-except:
-    runslow = False
-slow = pytest.mark.skipif(not runslow, reason="need --runslow option to run")
+slow = pytest.mark.slow  # see conftest.py
 
 
 inf = float("inf")
@@ -21,6 +21,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 from __future__ import print_function
 
+import io
 import os
 import pytest
 from pympl import PyMPL
@@ -142,6 +143,103 @@ def test_eval():
     assert "var x1, >= 8, <= 50;" in parser.output
 
 
+def test_translate():
+    """Test if the output of a command is not translated again."""
+    parser = PyMPL()
+    output = parser.translate(
+        """$STMT{"${9}$"}; ${9}$ /* $PARAM[Z]{1}; */ ${9}$""",
+        comment_cmds=False
+    )
+    assert output == "${9}$ 9 /* $PARAM[Z]{1}; */ 9"
+
+
+def test_prefixes():
+    """Test that the prefixes of the commands do not depend on globals."""
+    template = "var x{1..3};\n$SOS1{['x[1]', 'x[2]', 'x[3]']};"
+    outputs = set(
+        PyMPL(globals_=globals_).translate(template)
+        for globals_ in [None, {}, {"unused": 1}]
+    )
+    assert len(outputs) == 1
+    assert "_sos114_1_y_0" in outputs.pop()
+
+
+def test_source_map():
+    """Test the source map and the positions in error messages."""
+    parser = PyMPL()
+    output = parser.translate(
+        "var x;\n  $PARAM[X]{[1,2]};\ndata;\nparam y := ${3+4}$;\nend;",
+        comment_cmds=False, inline_data=False
+    )
+    assert output.index("param X :=") < output.index("7")
+    assert parser.source_position(output.index("param X{X_I}")) == (
+        2, 3, "$PARAM[...]{...}"
+    )
+    assert parser.source_position(output.index("7")) == (4, 12, "${...}$")
+    assert parser.source_position(0) is None
+    with pytest.raises(ZeroDivisionError) as excinfo:
+        parser.translate("\n\n  ${1/0}$")
+    assert excinfo.value.args[-1].endswith("at line 3 col 3")
+
+
+def test_code_cache():
+    """Test the cache of compiled commands."""
+    template = "$PARAM[X]{x};\nvar y, >= ${ x+1 }$;"
+    PyMPL.CODE_CACHE.clear()
+    for x in range(10):
+        parser = PyMPL(locals_={"x": x})
+        output = parser.translate(template, comment_cmds=False)
+        assert "var y, >= {0};".format(x+1) in output
+    info = PyMPL.code_cache_info()
+    assert info["misses"] == 2 and info["hits"] == 18 and info["size"] == 2
+    PyMPL.set_code_cache_size(1)
+    assert PyMPL.code_cache_info()["size"] == 1
+    PyMPL.set_code_cache_size(4096)
+
+
+def test_compile():
+    """Test precompiled templates."""
+    os.chdir(os.path.dirname(__file__) or os.curdir)
+    plan = PyMPL.compile_file("sos1.mod")
+    parser = PyMPL()
+    parser.parse("sos1.mod")
+    for i in range(2):
+        assert plan.render(comment_cmds=True, inline_data=False) == (
+            parser.output
+        )
+    template = "/* $VAR[z]{}; */$PARAM[N]{n};\nvar x, <= ${2*n}$;"
+    plan = PyMPL.compile(template)
+    assert plan.commands() == [
+        (1, 17, "$PARAM[...]{...}"), (2, 11, "${...}$")
+    ]
+    for n in range(3):
+        output = plan.render({"n": n})
+        assert output == PyMPL({"n": n}).translate(template)
+        assert "var x, <= {0};".format(2*n) in output
+    assert plan.render({"n": 1}, comment_cmds=True).startswith(
+        "/*IGNORED:VAR[z]{}*//*EVALUATED:PARAM[N]{n}*/"
+    )
+
+
+def test_stream():
+    """Test streaming translation."""
+    os.chdir(os.path.dirname(__file__) or os.curdir)
+    for mod_in in ["sos1.mod", "sos2.mod", "pwl.mod"]:
+        parser = PyMPL()
+        parser.parse(mod_in, "tmp/stream1.out.mod")
+        parser = PyMPL()
+        parser.parse(mod_in, "tmp/stream2.out.mod", stream=True)
+        assert parser.output is None
+        with open("tmp/stream1.out.mod") as f1:
+            with open("tmp/stream2.out.mod") as f2:
+                assert f1.read() == f2.read()
+    template = "$PARAM[X]{[1]};\ndata;\nparam Y := ${1}$;\nend;"
+    output = PyMPL().translate(template, inline_data=False)
+    fout = io.StringIO()
+    PyMPL().translate_stream(template, fout, inline_data=False)
+    assert fout.getvalue() == output
+
+
 def test_comments():
     """Test valid comments."""
     parser = PyMPL()
@@ -208,6 +306,593 @@ def test_glpkutils():
     out, varvalues = Tools.script("glpk_wrapper.sh", mps_out, verbose=True)
 
 
+def test_glpk_in_process():
+    """Test solving models in-process with the GLPK C API."""
+    pytest.importorskip("swiglpk")
+    from pympl import Model, glpkutils
+    os.chdir(os.path.dirname(__file__) or os.curdir)
+    model = Model()
+    model.add_vars(["x", "y"], lb=0, ub=[10, None], vtype=["I", "C"])
+    model.add_var(name="z", vtype="B")
+    model.add_var(name="f")
+    model.add_con([("x", 1), ("y", 2), ("z", 3)], "<=", 7.5)
+    model.add_con([("x", 1), ("y", -1)], ">=", -1)
+    model.add_con([("f", 1), ("x", 1)], "=", 0)
+    model.set_obj("max", [("x", 1), ("y", 1), ("z", 2)])
+    status, values = glpkutils.glpk_solve(model, verbose=False)
+    assert status == "optimal"
+    assert all(
+        abs(a - b) < 1e-6 for a, b in zip(values, [7, 0.25, 0, -7])
+    )
+    model.add_con(["x", "y"], ">=", 100)
+    assert glpkutils.glpk_solve(model, verbose=False) == ("infeasible", None)
+
+    parser = PyMPL()
+    parser.parse("pwl.mod", "tmp/pwl.out.mod")
+    status, varvalues = glpkutils.glpk_solve_mod(
+        "tmp/pwl.out.mod", verbose=False
+    )
+    assert status == "optimal"
+    assert abs(varvalues["x"] - 33.72093023255814) < 1e-6
+
+    # the GLPK objects are freed even if the model cannot be read
+    import swiglpk
+    freed = []
+    delete_prob, free_wksp = swiglpk.glp_delete_prob, swiglpk.glp_mpl_free_wksp
+    swiglpk.glp_delete_prob = lambda lp: freed.append(delete_prob(lp))
+    swiglpk.glp_mpl_free_wksp = lambda tran: freed.append(free_wksp(tran))
+    try:
+        with open("tmp/bad.mod", "w") as f:
+            f.write("var x; s.t. c: x >= y;\n")
+        with pytest.raises(RuntimeError):
+            glpkutils.glpk_solve_mod("tmp/bad.mod", verbose=False)
+    finally:
+        swiglpk.glp_delete_prob = delete_prob
+        swiglpk.glp_mpl_free_wksp = free_wksp
+    assert len(freed) == 2
+
+
+def sleep_wrapper(nmodels, seconds=0.5):
+    """Create a fake solver script and models with known solutions."""
+    os.chdir(os.path.dirname(__file__) or os.curdir)
+    script = os.path.abspath("tmp/sleep_wrapper.sh")
+    with open(script, "w") as f:
+        # the model file holds the solution
+        f.write(
+            "#!/bin/sh\nsleep {0}\nfor sol; do :; done\n"
+            "cp $2 $sol\necho done\n".format(seconds)
+        )
+    os.chmod(script, 0o755)
+    models = []
+    for i in range(nmodels):
+        models.append("tmp/sleep_{0}.lp".format(i))
+        with open(models[-1], "w") as f:
+            f.write("x {0}\n".format(i+1))
+    return script, models
+
+
+def test_script_many():
+    """Test running solver scripts concurrently."""
+    import time
+    from pympl import Tools
+    script, models = sleep_wrapper(4)
+    jobs = [(script, model) for model in models]
+    jobs.append({"script_name": script, "model": "tmp/invalid.txt"})
+    t0 = time.time()
+    results = dict(Tools.script_many(jobs, max_workers=5))
+    assert time.time() - t0 < 1.5
+    for i in range(4):
+        output, values = results[i]
+        assert output == "done\n" and values == {"x": i+1}
+    assert isinstance(results[4], Exception)
+
+    # closing the generator kills the jobs that have not finished
+    script, models = sleep_wrapper(1, seconds=0)
+    slow = os.path.abspath("tmp/slow_wrapper.sh")
+    marker = os.path.abspath("tmp/slow_wrapper.done")
+    if os.path.exists(marker):
+        os.remove(marker)
+    with open(slow, "w") as f:
+        f.write("#!/bin/sh\nsleep 1\ntouch {0}\n".format(marker))
+    os.chmod(slow, 0o755)
+    jobs = [(script, models[0]), (slow, models[0]), (slow, models[0])]
+    t0 = time.time()
+    results = Tools.script_many(jobs, max_workers=3)
+    assert next(results)[0] == 0
+    results.close()
+    assert time.time() - t0 < 1
+    time.sleep(1.5)
+    assert not os.path.exists(marker)
+
+
+def test_workspace():
+    """Test running pipelines in separate workspaces."""
+    import threading
+    from pympl import Tools, Workspace
+    script, models = sleep_wrapper(2, seconds=0.1)
+    names = []
+
+    def allocate(workspace):
+        names.extend(workspace.new_file() for _ in range(1000))
+
+    with Workspace(shm=True) as ws1, Workspace(root="tmp/ws") as ws2:
+        threads = [
+            threading.Thread(target=allocate, args=(ws,))
+            for ws in (ws1, ws1, ws2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(set(names)) == 3000
+        assert ws1.directory != ws2.directory
+        assert os.path.dirname(ws2.directory).endswith("tmp/ws")
+        for ws, model, x in [(ws1, models[0], 1), (ws2, models[1], 2)]:
+            output, values = ws.script(script, model, verbose=False)
+            assert values == {"x": x}
+            assert ws.processes == []
+        results = dict(Tools.script_many(
+            [(script, model) for model in models], workspace=ws1
+        ))
+        assert results[1][1] == {"x": 2} and ws1.processes == []
+        directory = ws1.directory
+    assert not os.path.exists(directory) and ws1.directory is None
+    assert Tools.PLIST is Tools.WORKSPACE.processes
+
+    # a workspace that is never cleared deletes its directory when it is
+    # garbage collected
+    import gc
+    ws = Workspace(root="tmp/ws")
+    directory = ws.tmp_dir()
+    ws.new_file()
+    del ws
+    gc.collect()
+    assert not os.path.exists(directory)
+
+
+def test_script_portfolio():
+    """Test racing solver scripts on the same model."""
+    import time
+    from pympl import Tools, Workspace
+    script, models = sleep_wrapper(1)
+    race = os.path.abspath("tmp/race_wrapper.sh")
+    with open(race, "w") as f:
+        # --lp model --options seconds --wsol sol
+        f.write("#!/bin/sh\nsleep $4 || exit 1\ncp $2 $6\necho $4\n")
+    os.chmod(race, 0o755)
+    t0 = time.time()
+    with Workspace() as ws:
+        output, values, winner = Tools.script_portfolio(
+            [(race, "3"), (race, "invalid"), (race, "0.2"), script],
+            models[0], workspace=ws
+        )
+        assert time.time() - t0 < 1.5
+        assert winner == 2 and output == "0.2\n" and values == {"x": 1}
+        time.sleep(0.2)
+        assert os.listdir(ws.directory) == []
+    with pytest.raises(RuntimeError):
+        Tools.script_portfolio([(race, "invalid")], models[0])
+
+    # the winner must prove optimality (and must not be stopped)
+    fakes = {
+        "glpk_feasible.sh": "sleep 0.1\ncp $2 $4\n",
+        "glpk_timeout.sh": "trap 'cp $2 $4; exit 0' INT\nsleep 5 & wait\n",
+        "glpk_optimal.sh": "sleep 0.6\ncp $2 $4\n"
+                           "echo INTEGER OPTIMAL SOLUTION FOUND\n",
+    }
+    for name, body in fakes.items():
+        fakes[name] = os.path.abspath("tmp/" + name)
+        with open(fakes[name], "w") as f:
+            f.write("#!/bin/bash\n" + body)  # --lp model --wsol sol
+        os.chmod(fakes[name], 0o755)
+    t0 = time.time()
+    output, values, winner = Tools.script_portfolio(
+        [fakes["glpk_feasible.sh"],
+         {"script_name": fakes["glpk_timeout.sh"], "timeout": 0.2},
+         fakes["glpk_optimal.sh"]], models[0]
+    )
+    assert winner == 2 and values == {"x": 1} and "OPTIMAL" in output
+    assert time.time() - t0 < 3
+    output, values, winner = Tools.script_portfolio(
+        [fakes["glpk_feasible.sh"]], models[0]
+    )
+    assert winner is None and values == {"x": 1}
+
+    # processes tracked after cancel() are killed right away
+    with Workspace() as ws:
+        ws.cancel()
+        t0 = time.time()
+        with pytest.raises(RuntimeError):
+            ws.run("sleep 5", verbose=False)
+        assert time.time() - t0 < 2
+
+
+def test_solver_log():
+    """Test the solver log parsers."""
+    from pympl import solverlog
+    lines = {
+        "glpk": "+   456: >>>>>   1.230000000e+02 >=   1.200000000e+02"
+                "   2.4% (20; 3)",
+        "coinor": "Cbc0010I After 1000 nodes, 50 on tree, 123 best "
+                  "solution, best possible 120 (3.45 seconds)",
+        "gurobi": "*  100    20              10  123.0000000  120.00000"
+                  "  2.44%  12.3    3s",
+        "cplex": "    100    20      120.6000    12      123.0000"
+                 "      120.0000     5000    2.44%",
+    }
+    for solver, line in lines.items():
+        parser = solverlog.get_parser(solver + "_wrapper.sh")
+        assert parser.parse("Starting the solver...") is None
+        event = parser.parse(line)
+        assert event["incumbent"] == 123 and event["bound"] == 120
+        assert abs(event["gap"] - 0.024) < 1e-3
+    parser = solverlog.get_parser("scip")
+    parser.parse(" time | node  | left  |  dualbound   | primalbound  |  gap ")
+    event = parser.parse("  1.5s|   100 |    20 | 1.200000e+02 |      --  "
+                         "    |    Inf ")
+    assert event["incumbent"] is None and event["bound"] == 120
+    assert event["time"] == 1.5
+    # lines printed by glpsol (glp_intopt)
+    parser = solverlog.get_parser("glpk")
+    rule = solverlog.GapBelow(0.001)
+    for line, incumbent, bound, gap in [
+        ("+    26: mip =     not found yet <=   1.540000000e+03        "
+         "(2; 0)", None, 1540, None),
+        ("+    39: mip =   1.524000000e+03 <=   1.539000000e+03   1.0% "
+         "(7; 2)", 1524, 1539, 0.01),
+        ("+    91: mip =   1.524000000e+03 <=   1.525000000e+03 < 0.1% "
+         "(1; 42)", 1524, 1525, 0.001),
+        ("+    93: mip =   1.524000000e+03 <=     tree is empty   0.0% "
+         "(0; 47)", 1524, 1524, 0),
+    ]:
+        event = parser.parse(line)
+        assert (event["incumbent"], event["bound"]) == (incumbent, bound)
+        assert event["gap"] == gap
+        assert rule(event) == (gap is not None and gap <= 0.001)
+    assert parser.parse("+    12: mip =   1.5e+03 <=   1.6e+03   ?% (1; 0)") \
+        is None
+    for script, output, optimal in [
+        ("glpk_wrapper.sh", "INTEGER OPTIMAL SOLUTION FOUND\n", True),
+        ("glpk_wrapper.sh", "TIME LIMIT EXCEEDED; SEARCH TERMINATED\n", False),
+        ("coinor_wrapper.sh", "Result - Optimal solution found\n", True),
+        ("coinor_wrapper.sh", "Result - Stopped on time limit\n", False),
+        ("scip_wrapper.sh", "SCIP Status        : problem is solved "
+         "[optimal solution found]\n", True),
+        ("gurobi_wrapper.sh", "Optimal solution found (tolerance 1e-4)\n",
+         True),
+        ("cplex_wrapper.sh", "MIP - Integer optimal solution:  Obj = 1\n",
+         True),
+        ("lpsolve_wrapper.sh", "The model is sub-optimal. Only a faster "
+         "solution was found.\n\nValue of objective function: 1\n", False),
+        ("custom.sh", "", None),
+    ]:
+        assert solverlog.is_optimal(script, output) is optimal
+    rule = solverlog.NoImprovement(1)
+    assert not rule({"incumbent": 10, "elapsed": 0})
+    assert not rule({"incumbent": 10, "elapsed": 0.5})
+    assert rule({"incumbent": 10, "elapsed": 1})
+
+
+def test_stop_rules():
+    """Test stopping a solver with a stop rule."""
+    import time
+    from pympl import Tools
+    from pympl.solverlog import GapBelow
+    script, models = sleep_wrapper(1)
+    script = os.path.abspath("tmp/coinor_fake.sh")
+    with open(script, "w") as f:
+        # --lp model --wsol sol
+        f.write(
+            "#!/bin/bash\n"
+            "trap 'cp $2 $4; echo stopped; exit 0' INT\n"
+            "for i in $(seq 1 20); do\n"
+            "  echo \"Cbc0010I After $i nodes, 1 on tree, 100 best "
+            "solution, best possible $((90+i)) (0.$i seconds)\"\n"
+            "  sleep 0.1\n"
+            "done\n"
+            "exit 1\n"
+        )
+    os.chmod(script, 0o755)
+    events = []
+    t0 = time.time()
+    output, values = Tools.script(
+        script, models[0], verbose=False, progress=events.append,
+        stop=GapBelow(0.05)
+    )
+    assert time.time() - t0 < 1.5
+    assert "stopped" in output and values == {"x": 1}
+    assert [event["bound"] for event in events] == [91, 92, 93, 94, 95]
+    assert events[-1]["gap"] == 0.05 and events[-1]["solver"] == "cbc"
+    assert events[-1]["time"] == 0.5 and events[-1]["elapsed"] > 0
+
+    def progress(event):
+        raise ValueError("progress failed")
+
+    t0 = time.time()
+    with pytest.raises(ValueError):
+        Tools.script(script, models[0], verbose=False, progress=progress)
+    assert time.time() - t0 < 1.5 and Tools.PLIST == []
+
+
+def test_wrapper_interrupt():
+    """Test stopping glpk_wrapper.sh gracefully with a stop rule."""
+    import time
+    from pympl import Tools
+    from pympl.solverlog import GapBelow
+    script, models = sleep_wrapper(1)
+    os.chdir(os.path.dirname(__file__) or os.curdir)
+    if not os.path.exists("tmp/bin"):
+        os.makedirs("tmp/bin")
+    with open("tmp/bin/glpsol", "w") as f:
+        # glpsol --lp model.lp --seed 1234 -o sol.out; reports x = 1 on SIGINT
+        f.write(
+            "#!/bin/bash\n"
+            "trap 'printf \"No. Column name St Activity\\n---\\n"
+            "1 x * 1\\n\\n\" > $6; exit 0' INT\n"
+            "echo '+    91: mip =   1.524000000e+03 <=   1.525000000e+03"
+            " < 0.1% (1; 42)'\n"
+            "while :; do sleep 0.05; done\n"
+        )
+    os.chmod("tmp/bin/glpsol", 0o755)
+    wrapper = os.path.abspath("../scripts/glpk_wrapper.sh")
+    path = os.environ["PATH"]
+    os.environ["PATH"] = os.path.abspath("tmp/bin") + os.pathsep + path
+    try:
+        t0 = time.time()
+        output, values = Tools.script(
+            wrapper, models[0], verbose=False, stop=GapBelow(0.001)
+        )
+    finally:
+        os.environ["PATH"] = path
+    assert time.time() - t0 < 5
+    assert values == {"x": 1}
+
+
+def test_resource_limits():
+    """Test the time and memory limits and the resource usage."""
+    import sys
+    import time
+    from pympl import Tools
+    script, models = sleep_wrapper(1, seconds=0.1)
+    output, values, usage = Tools.script(
+        script, models[0], verbose=False, cache=False, return_usage=True
+    )
+    assert values == {"x": 1} and usage["exit_code"] == 0
+    assert usage["wall"] >= 0.1 and not usage["timeout"]
+    python = "{0} -c \"{1}\"".format(sys.executable, "{0}")
+    usage = Tools.run(
+        python.format("x = bytearray(2**26); x[::4096] = b'1'*len(x[::4096])"),
+        verbose=False
+    )
+    if usage["max_rss"] is not None:
+        assert usage["max_rss"] >= 2**26 and usage["cpu"] > 0
+    with pytest.raises(RuntimeError):
+        Tools.run(python.format("x = bytearray(2**30)"), verbose=False,
+                  memory_limit=2**28)
+    t0 = time.time()
+    with pytest.raises(RuntimeError):
+        Tools.run(python.format("while True: pass"), verbose=False,
+                  cpu_limit=1)
+    assert time.time() - t0 < 5
+    t0 = time.time()
+    usage = Tools.run("sleep 5", verbose=False, timeout=0.2)
+    assert usage["timeout"] and usage["exit_code"] != 0
+    assert time.time() - t0 < 2
+
+
+def test_mip_start():
+    """Test passing MIP starts to solver scripts."""
+    from pympl import Tools, Solution
+    script, models = sleep_wrapper(1, seconds=0)
+    start = Solution(["x", "y[1]", "z"], [1, 2.5, 0])
+    for fmt, expected in [("sol", "x 1\n"), ("cbc", "0 x 1 0\n"),
+                          ("mst", '<variable name="x" value="1"/>')]:
+        start.write("tmp/start." + fmt, fmt)
+        with open("tmp/start." + fmt) as f:
+            assert expected in f.read()
+    assert Solution.read("tmp/start.sol") == {"x": 1, "y[1]": 2.5}
+    fake = os.path.abspath("tmp/scip_fake.sh")
+    with open(fake, "w") as f:
+        # --lp model --start start.sol --wsol sol
+        f.write("#!/bin/sh\ncp $4 $6\necho $4\n")
+    os.chmod(fake, 0o755)
+    output, values = Tools.script(
+        fake, models[0], verbose=False, start={"x": 2, "y": 3}
+    )
+    assert values == {"x": 2, "y": 3} and output.strip().endswith(".sol")
+    assert not os.path.exists(output.strip())
+    start_file = Tools.write_start("coinor_wrapper.sh", values)
+    assert start_file.endswith(".sol")
+    with open(start_file) as f:
+        assert f.read().startswith("Stopped on iterations")
+    assert Tools.write_start("cplex_wrapper.sh", values).endswith(".mst")
+
+
+def test_script_cache():
+    """Test the solve-result cache of Tools.script."""
+    import time
+    import shutil
+    from pympl import Tools
+    from pympl.utils import DiskCache
+    script, models = sleep_wrapper(2, seconds=0.3)
+    shutil.rmtree("tmp/cache", ignore_errors=True)
+    Tools.set_cache("tmp/cache")
+    try:
+        result = Tools.script(script, models[0], verbose=False)
+        t0 = time.time()
+        assert Tools.script(script, models[0], verbose=False) == result
+        assert time.time() - t0 < 0.2
+        assert Tools.CACHE.info()["hits"] == 1
+        Tools.script(script, models[0], verbose=False, cache=False)
+        Tools.script(script, models[0], options="x", verbose=False)
+        assert Tools.CACHE.info()["entries"] == 2
+        with open(models[0], "w") as f:
+            f.write("x 5\n")
+        assert Tools.script(script, models[0], verbose=False)[1] == {"x": 5}
+    finally:
+        Tools.set_cache(None)
+
+    cache = DiskCache("tmp/cache", maxsize=10)
+    cache.clear()
+    cache.put("a", b"123456")
+    time.sleep(0.01)
+    cache.put("b", b"123456")
+    assert "a" not in cache and cache.load("b") == b"123456"
+    assert cache.load("a") is None
+
+    # temporary files left by interrupted writers are removed when stale
+    stale, recent = "tmp/cache/.tmp-stale", "tmp/cache/.tmp-recent"
+    for fname in (stale, recent):
+        with open(fname, "wb") as f:
+            f.write(b"123456")
+    old = time.time() - DiskCache.TMP_MAX_AGE - 1
+    os.utime(stale, (old, old))
+    cache.put("c", b"1")
+    assert not os.path.exists(stale) and os.path.exists(recent)
+    os.utime(recent, (old, old))
+    DiskCache("tmp/cache")
+    assert not os.path.exists(recent)
+
+
+def test_conversion_cache():
+    """Test the conversion cache of glpkutils."""
+    import shutil
+    from pympl import glpkutils
+    os.chdir(os.path.dirname(__file__) or os.curdir)
+    bindir = os.path.abspath("tmp/fakebin")
+    if not os.path.isdir(bindir):
+        os.makedirs(bindir)
+    with open(os.path.join(bindir, "glpsol"), "w") as f:
+        # fake glpsol: counts the conversions and copies the model
+        f.write(
+            "#!/bin/sh\nif [ \"$1\" = --version ]; then echo v0; exit; fi\n"
+            "echo >> {0}/calls\ncp $2 $5\n".format(bindir)
+        )
+    os.chmod(os.path.join(bindir, "glpsol"), 0o755)
+    calls = os.path.join(bindir, "calls")
+    path = os.environ["PATH"]
+    os.environ["PATH"] = bindir + os.pathsep + path
+    shutil.rmtree("tmp/cache", ignore_errors=True)
+    glpkutils.set_cache("tmp/cache")
+    glpkutils.GLPSOL_VERSION = None
+    try:
+        with open("tmp/conv.mod", "w") as f:
+            f.write("var x;\n")
+        for i in range(3):
+            glpkutils.mod2lp(
+                "tmp/conv.mod", "tmp/conv.lp", verbose=False, native=False
+            )
+            glpkutils.mod2mps(
+                "tmp/conv.mod", "tmp/conv.mps", verbose=False, native=False
+            )
+        # modifying an output file must not modify the cached result
+        with open("tmp/conv.lp", "a") as f:
+            f.write("var z;\n")
+        glpkutils.mod2lp(
+            "tmp/conv.mod", "tmp/conv.lp", verbose=False, native=False
+        )
+        with open(calls) as f:
+            assert len(f.read()) == 2
+        with open("tmp/conv.lp") as f:
+            assert f.read() == "var x;\n"
+        glpkutils.mod2lp(
+            "tmp/conv.mod", "tmp/conv.lp", verbose=False, cache=False,
+            native=False
+        )
+        with open(calls) as f:
+            assert len(f.read()) == 3
+        with open("tmp/conv.lp") as f:
+            assert f.read() == "var x;\n"
+        with open("tmp/conv.mod", "w") as f:
+            f.write("var y;\n")
+        glpkutils.mod2lp(
+            "tmp/conv.mod", "tmp/conv.lp", verbose=False, native=False
+        )
+        with open("tmp/conv.lp") as f:
+            assert f.read() == "var y;\n"
+    finally:
+        os.environ["PATH"] = path
+        glpkutils.set_cache(None)
+        glpkutils.GLPSOL_VERSION = None
+        os.remove(calls)
+
+
+def test_glpsol_version():
+    """Test that a missing glpsol is only looked for once."""
+    import subprocess
+    from pympl import glpkutils
+    calls = []
+
+    def check_output(args):
+        calls.append(args)
+        raise OSError("not found")
+
+    check_output_, subprocess.check_output = (
+        subprocess.check_output, check_output
+    )
+    glpkutils.GLPSOL_VERSION = None
+    try:
+        assert glpkutils.glpsol_version() is None
+        assert glpkutils.glpsol_version() is None
+        assert len(calls) == 1
+    finally:
+        subprocess.check_output = check_output_
+        glpkutils.GLPSOL_VERSION = None
+
+
+def test_mod2model():
+    """Test the native conversion of GMPL files."""
+    from pympl import Model, glpkutils
+    os.chdir(os.path.dirname(__file__) or os.curdir)
+    model = Model()
+    model.add_var(name="x", lb=0, ub=10, vtype="I")
+    model.add_var(name="y", lb=-1.5)
+    model.add_var(name="z", vtype="B")
+    model.add_var(name="w")
+    model.add_con([(2, "x"), "y", 3], ">=", [(0.5, "z"), 1], name="c1")
+    model.add_con(["x", (-1, "w")], "=", 4, name="c2")
+    model.set_obj("max", [("x", 1), ("y", -2.5)])
+    model.write_mod("tmp/native.mod")
+    loaded = glpkutils.mod2model("tmp/native.mod")
+    assert loaded.vars_list == model.vars_list
+    assert loaded.cons_list == model.cons_list
+    assert loaded.obj == model.obj
+    assert loaded.get_bounds() == model.get_bounds()
+    assert loaded.get_vtypes() == model.get_vtypes()
+    assert loaded.get_rhs() == model.get_rhs()
+    assert (
+        sorted(loaded.cons["c1"][0]) == sorted(model.cons["c1"][0])
+    )
+
+    with open("tmp/native.mod", "w") as f:
+        f.write(
+            "/* comment */ var x >= 0, integer; var y;\n"
+            "maximize obj: x + 2 * y;\n"
+            "subject to c1: - x + y*3 - 2 + x <= 2 * y + 1;\n"
+            "end;\n"
+        )
+    loaded = glpkutils.mod2model("tmp/native.mod")
+    assert loaded.cons["c1"][0] == [("x", 0), ("y", 1)]
+    assert loaded.cons["c1"][2] == 3
+    glpkutils.mod2lp("tmp/native.mod", "tmp/native.lp", native=True)
+    with open("tmp/native.lp") as f:
+        assert "c1: +0 x +y <= 3" in f.read()
+    glpkutils.mod2mps("tmp/native.mod", "tmp/native.mps", native=True)
+    with open("tmp/native.mps") as f:
+        assert f.readline() == "NAME          MODEL\n"
+
+    for text in [
+        "set I := 1..3; var x{I}; s.t. c: sum{i in I} x[i] >= 1;",
+        "param p := 2; var x; s.t. c: p*x >= 1;",
+        "var x; s.t. c: x*x >= 1;",
+        "var x; s.t. c: x >= y;",
+        "var x; s.t. c: 1 <= x <= 2;",
+    ]:
+        with open("tmp/native.mod", "w") as f:
+            f.write(text)
+        assert glpkutils.mod2model("tmp/native.mod") is None
+
+
 def test_model():
     """Test model."""
     from pympl import Model, Tools, glpkutils
@@ -238,3 +923,284 @@ def test_model():
     glpkutils.mod2lp(mod_out, lp_out, verbose=True)
     out, varvalues = Tools.script("glpk_wrapper.sh", lp_out, verbose=True)
     assert varvalues[profit] == 29
+
+
+def test_model_storage():
+    """Test the name-based views of the columnar model."""
+    from pympl import Model
+    model = Model()
+    x = model.add_var(lb=0, ub=1.5, vtype="I")
+    y = model.add_var(name="y", vtype="B")
+    z = model.add_var(lb=-float("inf"), name="z")
+    model.add_con([(x, 2), (y, 1.0), "z"], ">=", 3)
+    model.add_con([(y, 1), (y, 1)], "=", 1.5, name="c2")
+    assert list(model.vars) == [x, "y", "z"] == model.vars_list
+    assert model.vars[x] == {"lb": 0, "ub": 1.5, "vtype": "I"}
+    assert model.vars["y"] == {"lb": 0, "ub": 1, "vtype": "B"}
+    assert model.vars["z"] == {"lb": None, "ub": None, "vtype": "C"}
+    assert model.cons["RC0"] == ([(x, 2), ("y", 1.0), ("z", 1)], ">=", 3)
+    assert model.cons["c2"] == ([("y", 2)], "=", 1.5)
+    assert repr(model.cons["RC0"][0][1][1]) == "1.0"
+    for modify in [
+        lambda: model.vars["y"].update(ub=0),
+        lambda: model.vars["y"].__setitem__("ub", 0),
+        lambda: model.vars.__setitem__("w", {}),
+        lambda: model.cons["c2"][0].append(("z", 1)),
+        lambda: model.cons["c2"][0].__setitem__(0, ("z", 1)),
+        lambda: model.cons.__delitem__("c2"),
+    ]:
+        with pytest.raises(TypeError):
+            modify()
+    assert model.vars["y"]["ub"] == 1 and len(model.cons["c2"][0]) == 1
+    assert model.num_nonzeros() == 4
+    start, cols, coefs = model.get_csr()
+    assert list(start) == [0, 3, 4] and list(cols) == [0, 1, 2, 1]
+    rows, cols, coefs = model.get_coo()
+    assert list(rows) == [0, 0, 0, 1] and list(coefs) == [2, 1, 1, 2]
+    model.rename_vars(lambda name: "_"+name)
+    model.rename_cons(lambda name: "_"+name)
+    assert "_y" in model.vars and "y" not in model.vars
+    assert model.cons["_c2"] == ([("_y", 2)], "=", 1.5)
+    assert model.var_index("_z") == 2 and model.con_index("_c2") == 1
+
+
+def test_model_bulk():
+    """Test adding variables and constraints in bulk."""
+    from pympl import Model
+    model = Model()
+    names = model.add_vars(["x", "y", "z"], lb=[0, None, 1], vtype="I")
+    assert names == ["x", "y", "z"]
+    model.add_vars(("b1", "b2"), vtype="B")
+    assert model.vars["y"] == {"lb": None, "ub": None, "vtype": "I"}
+    assert model.vars["b2"] == {"lb": 0, "ub": 1, "vtype": "B"}
+    cons = model.add_cons(
+        [1, 0, 1, 3], ["x", 1, "b1", 2], [2, 1.5, -1, 1],
+        [">=", "=", "<=", "<"], [1, 2, 3, 4]
+    )
+    assert cons == ["RC0", "RC1", "RC2"]
+    assert model.cons["RC0"] == ([("y", 1.5)], ">=", 1)
+    assert model.cons["RC1"] == ([("x", 2), ("b1", -1)], "=", 2)
+    assert model.cons["RC2"] == ([("z", 1)], "<=", 4)
+    model.add_cons([0, 0], ["x", "y"], [1, 1], "=", 5, names=["c"])
+    assert model.cons["c"] == ([("x", 1), ("y", 1)], "=", 5)
+    try:
+        model.add_cons([0], ["w"], [1], "=", 0)
+        failed = False
+    except AssertionError:
+        failed = True
+    assert failed and model.num_cons() == 4
+
+
+def test_write_lp():
+    """Test the LP writer."""
+    from pympl import Model
+    model = Model()
+    model.add_var(name="x", lb=0, ub=2.5, vtype="I")
+    model.add_var(name="^y", vtype="B")
+    model.add_var(name="z", ub=3)
+    model.add_var(name="w")
+    model.add_var(name="^v")
+    model.add_con([("x", 2), ("^y", -1.0), "z"], ">=", 1)
+    model.add_con([("x", 0.5), ("w", -3)], "<=", 1.5, name="c")
+    model.set_obj("max", [("x", 1), ("z", 2)])
+    lp_file = "tmp/test_write_lp.lp"
+    model.write_lp(lp_file)
+    with open(lp_file) as f:
+        assert f.read() == (
+            "Maximize\n"
+            "\tobjective: +x +2 z\n"
+            "Subject To\n"
+            "\tRC0: -y +2 x +z >= 1\n"
+            "\tc: -3 w +0.5 x <= 1.5\n"
+            "Bounds\n"
+            "\t0 <= x <= 2.5\n"
+            "\t0 <= y <= 1\n"
+            "\t-inf <= z <= 3\n"
+            "\tw free\n"
+            "\tv free\n"
+            "General\n"
+            "\tx\n"
+            "Binary\n"
+            "\ty\n"
+            "End\n"
+        )
+    mps_file = "tmp/test_write_lp.mps"
+    model.write_mps(mps_file)
+    with open(mps_file) as f:
+        bounds = [line.split() for line in f if line.startswith(" ")]
+    assert ["MI", "BND1", "z"] in bounds and ["UP", "BND1", "z", "3"] in bounds
+    assert ["FR", "BND1", "w"] in bounds
+
+
+def test_write_free_mps():
+    """Test the free MPS writer."""
+    from pympl import Model
+    model = Model()
+    model.add_var(name="_vbp_flow12_1_x", lb=0, vtype="I")
+    model.add_var(name="_vbp_flow12_1_y", vtype="B")
+    model.add_var(name="z", lb=-1, ub=2.5)
+    model.add_var(name="w")
+    model.add_con([("_vbp_flow12_1_x", 2), ("z", -1.0)], ">=", 1)
+    model.add_con(["_vbp_flow12_1_y", "_vbp_flow12_1_x"], "=", 1, name="c")
+    model.set_obj("min", ["z"])
+    mps_file = "tmp/test_write_free_mps.mps"
+    model.write_mps(mps_file, free=True)
+    with open(mps_file) as f:
+        assert f.read() == (
+            "NAME MODEL\n"
+            "ROWS\n"
+            " N OBJ\n"
+            " G RC0\n"
+            " E c\n"
+            "COLUMNS\n"
+            " MARKER 'MARKER' 'INTORG'\n"
+            " _vbp_flow12_1_x RC0 2\n"
+            " _vbp_flow12_1_x c 1\n"
+            " _vbp_flow12_1_y c 1\n"
+            " MARKER 'MARKER' 'INTEND'\n"
+            " z OBJ 1\n"
+            " z RC0 -1.0\n"
+            " w OBJ 0\n"
+            "RHS\n"
+            " RHS1 RC0 1\n"
+            " RHS1 c 1\n"
+            "BOUNDS\n"
+            " LO BND1 _vbp_flow12_1_x 0\n"
+            " PL BND1 _vbp_flow12_1_x\n"
+            " LO BND1 _vbp_flow12_1_y 0\n"
+            " UP BND1 _vbp_flow12_1_y 1\n"
+            " LO BND1 z -1\n"
+            " UP BND1 z 2.5\n"
+            " FR BND1 w\n"
+            "ENDATA\n"
+        )
+
+
+def test_solution():
+    """Test solutions."""
+    from pympl import Solution
+    os.chdir(os.path.dirname(__file__) or os.curdir)
+    with open("tmp/test.sol", "w") as f:
+        f.write("x 1\ny 0\nz 2.5\n_p_a 3\n_p_b 0\n_q_c 1e+00\n")
+    sol = Solution.read("tmp/test.sol")
+    assert sol == {"x": 1, "z": 2.5, "_p_a": 3, "_q_c": 1}
+    assert isinstance(sol["x"], int) and isinstance(sol["z"], float)
+    assert "y" not in sol and len(sol) == 4
+    assert sol.get("y", 0) == 0 and sol("y") == 0 and sol("w", None) is None
+    assert sol.lookup(["z", "w", "y", "x"]) == [2.5, 0, 0, 1]
+    assert sol.prefix("_p_") == {"a": 3, "b": 0}
+    assert sol.prefix("_r") == {}
+    assert Solution.from_dict(sol.as_dict()) == sol
+    sol["z"] = 1.0
+    sol["w"] = 2
+    sol.update({"x": 0, "_p_b": 4})
+    del sol["_q_c"]
+    assert sol == {"z": 1, "w": 2, "_p_a": 3, "_p_b": 4}
+    assert sol.lookup(["x", "w", "_q_c"]) == [0, 2, 0]
+    assert sol.prefix("_p_") == {"a": 3, "b": 4}
+    with pytest.raises(KeyError):
+        del sol["y"]
+    with open("tmp/test.sol", "w") as f:
+        f.write("x 1\ny\n")
+    with pytest.raises(AssertionError):
+        Solution.read("tmp/test.sol")
+
+
+def test_recorder():
+    """Test the instrumentation of the pipeline stages."""
+    import json
+    from pympl import Model, Recorder, Tools, glpkutils
+    script, models = sleep_wrapper(1, seconds=0)
+    model = Model()
+    model.add_var(name="x", lb=0)
+    model.add_con(["x"], "<=", 2)
+    model.write_mod("tmp/recorder.mod")
+    parser = PyMPL()
+    with Recorder() as rec:
+        parser.translate("$EXEC{pass};\n${1+1}$;\n$VAR[y]{lb=0};")
+        glpkutils.mod2lp(
+            "tmp/recorder.mod", "tmp/recorder.lp", native=True
+        )
+        Tools.script(script, models[0], verbose=False, cache=False)
+    report = json.loads(rec.to_json())
+    stages = report["stages"]["stages"]
+    assert [stage["name"] for stage in stages] == [
+        "translate", "mod2lp", "script"
+    ]
+    cmds = stages[0]["stages"]
+    assert [(cmd["name"], cmd["line"]) for cmd in cmds] == [
+        ("$EXEC{...}", 1), ("${...}$", 2), ("$VAR[...]{...}", 3)
+    ]
+    for stage in stages + cmds:
+        assert stage["wall"] >= 0 and stage["cpu"] >= 0
+        assert stage["peak_memory"] >= 0
+    assert report["totals"]["script"]["count"] == 1
+    parser.translate("${1+1}$")
+    assert len(rec.report()["stages"]["stages"]) == 3
+
+
+def test_translation_profile():
+    """Test translate(profile=True)."""
+    import json
+    os.chdir(os.path.dirname(__file__) or os.curdir)
+    parser = PyMPL()
+    parser.translate("${1+1}$;")
+    assert parser.translation_profile() is None
+    output = parser.translate(
+        "$EXEC{x = sum(range(1000))};\n"
+        "$VAR[y]{lb=0};\n$VAR[z]{lb=0};\n"
+        "$PARAM[p]{[1, 2, 3]};\n"
+        "${x}$;",
+        profile=True
+    )
+    prof = parser.translation_profile()
+    report = json.loads(prof.to_json(top=2))
+    assert len(report["commands"]) == 5
+    assert report["totals"]["$VAR[...]{...}"]["count"] == 2
+    assert report["totals"]["${...}$"]["model_bytes"] == len("499500")
+    assert len(report["top_time"]) == len(report["top_bytes"]) == 2
+    assert report["top_bytes"][0]["cmd"] == "$PARAM[...]{...}"
+    assert report["top_bytes"][0]["line"] == 4
+    assert "499500" in output
+    stacks = prof.collapsed()
+    assert any(stack.startswith("$EXEC{...}@1:1;") for stack in stacks)
+    for stack in stacks:
+        frames, time = stack.rsplit(" ", 1)
+        assert int(time) > 0 and "profiling" not in frames
+    prof.write_collapsed("tmp/profile.folded")
+    assert prof.stats("$VAR[...]{...}") is not None
+
+
+def test_lazy_imports():
+    """Test that importing pympl and translating stay lightweight."""
+    import sys
+    import json
+    import subprocess
+    script = """
+import sys, json, time, signal
+handler = signal.getsignal(signal.SIGINT)
+start = time.time()
+from pympl import PyMPL, Tools
+elapsed = time.time() - start
+PyMPL().translate("$PARAM[n]{3};\\n$VAR[x]{lb=0};")
+print(json.dumps({
+    "time": elapsed,
+    "modules": sorted(sys.modules),
+    "signals": signal.getsignal(signal.SIGINT) is handler,
+    "tmp_dir": Tools.WORKSPACE.directory,
+}))
+"""
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [root] + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+    output = subprocess.check_output([sys.executable, "-c", script], env=env)
+    result = json.loads(output.decode().strip().splitlines()[-1])
+    assert result["time"] < 2
+    assert result["signals"] and result["tmp_dir"] is None
+    if sys.version_info >= (3, 7):
+        for module in ["asyncio", "multiprocessing", "pympl.glpkutils",
+                       "pympl.cmds.vpsolver", "pympl.cmds.xformutils",
+                       "pympl.utils.profiling"]:
+            assert module not in result["modules"], module
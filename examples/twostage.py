@@ -66,7 +66,7 @@ def main():
     assert varvalues["Z"] == 11  # check the solution objective value
 
     exctacted_solution = parser["VBP_FLOW"].extract(
-        lambda name: varvalues.get(name, 0),
+        varvalues,
         verbose=True
     )
 
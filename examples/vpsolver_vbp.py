@@ -40,7 +40,7 @@ def main():
             "glpk_wrapper.sh", lp_out, verbose=True
         )
         sol = parser["MVP_FLOW"].extract(
-            lambda varname: varvalues.get(varname, 0),
+            varvalues,
             verbose=True
         )
 
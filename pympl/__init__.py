@@ -21,7 +21,23 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 __version__ = "1.2.1"
 
-from .pympl import PyMPL
+import sys
+
+from .pympl import PyMPL, TranslationPlan
 from .model import Model
 from .tools import Tools
-from . import glpkutils
+from .solution import Solution
+from .workspace import Workspace
+from .utils import Recorder
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        """Import glpkutils on first use (PEP 562)."""
+        if name == "glpkutils":
+            from importlib import import_module
+            return import_module(".glpkutils", __name__)
+        raise AttributeError(
+            "module {0!r} has no attribute {1!r}".format(__name__, name)
+        )
+else:
+    from . import glpkutils
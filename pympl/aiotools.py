@@ -0,0 +1,181 @@
+"""
+This code is part of the Mathematical Programming Toolbox PyMPL.
+
+Copyright (C) 2015-2016, Filipe Brandao
+Faculdade de Ciencias, Universidade do Porto
+Porto, Portugal. All rights reserved. E-mail: <fdabrandao@dcc.fc.up.pt>.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+# asyncio versions of Tools.run and Tools.script (Python 3.5+ only)
+import os
+import sys
+import signal
+import asyncio
+import subprocess
+
+from .tools import Tools
+from .utils import instrument
+
+LINE_LIMIT = 1 << 24
+
+
+def _killpg(proc, sig):
+    """Send a signal to the process group of a process."""
+    try:
+        os.killpg(proc.pid, sig)
+    except OSError:
+        pass
+
+
+async def arun(cmd, tee=None, grep=None, grepv=None, verbose=None,
+               workspace=None, progress=None, stop=None, parser=None,
+               stop_grace=10, timeout=None, memory_limit=None,
+               cpu_limit=None):
+    """Run a system command without blocking the event loop.
+
+    If the coroutine is cancelled, the process group of the command is
+    killed. See Tools.run for progress, stop, the limits and the resource
+    usage that is returned.
+    """
+    if verbose is None:
+        verbose = Tools.VERBOSE
+    if workspace is None:
+        workspace = Tools.WORKSPACE
+    monitor = None
+    if progress is not None or stop is not None:
+        from .solverlog import LogMonitor, get_parser
+        monitor = LogMonitor(
+            get_parser(parser or cmd), progress=progress, stop=stop
+        )
+    Tools.set_signal_handlers()
+    loop = asyncio.get_event_loop()
+
+    usage = {"stopped": False, "timeout": False}
+    timers = []
+
+    def interrupt(reason):
+        usage[reason] = True
+        _killpg(proc, signal.SIGINT)
+        timers.append(
+            loop.call_later(stop_grace, _killpg, proc, signal.SIGTERM)
+        )
+
+    # the process is reaped with os.wait4 (see Tools._reap) in a thread,
+    # since asyncio subprocesses do not report their resource usage
+    start = instrument.wall_time()
+    proc = subprocess.Popen(
+        cmd, shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        preexec_fn=Tools._preexec(memory_limit, cpu_limit)
+    )
+    workspace.track(proc)
+    reader = asyncio.StreamReader(limit=LINE_LIMIT)
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), proc.stdout
+    )
+    if timeout is not None:
+        timers.append(loop.call_later(timeout, interrupt, "timeout"))
+
+    fout_list = []
+    if verbose:
+        fout_list.append(sys.stdout)
+    ftee = open(tee, "w") if tee is not None else None
+    if ftee is not None:
+        fout_list.append(ftee)
+    reaped = None
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            line = line.decode("utf-8")
+            if monitor is not None and monitor.feed(line):
+                interrupt("stopped")
+            if grep is not None and grep not in line:
+                continue
+            if grepv is not None and grepv in line:
+                continue
+            for f in fout_list:
+                f.write(line)
+                f.flush()
+        reaped = loop.run_in_executor(None, Tools._reap, proc)
+        exit_code, rusage = await asyncio.shield(reaped)
+    except BaseException:  # cancelled or, e.g., an error raised by progress
+        _killpg(proc, signal.SIGTERM)
+        if reaped is None:
+            reaped = loop.run_in_executor(None, Tools._reap, proc)
+        await asyncio.shield(reaped)
+        raise
+    finally:
+        for timer in timers:
+            timer.cancel()
+        transport.close()
+        if ftee is not None:
+            ftee.close()
+        workspace.untrack(proc)
+    usage.update(Tools._usage(rusage))
+    usage["wall"] = instrument.wall_time() - start
+    usage["exit_code"] = exit_code
+    if exit_code != 0 and not (usage["stopped"] or usage["timeout"]):
+        raise RuntimeError("failed to run '{0}'".format(cmd))
+    return usage
+
+
+async def ascript(script_name, model, options=None, verbose=None,
+                  cache=True, workspace=None, progress=None, stop=None,
+                  timeout=None, memory_limit=None, cpu_limit=None,
+                  return_usage=False, start=None):
+    """Call a solver script without blocking the event loop and return
+    the solutions (and the resource usage) as Tools.script does."""
+    key = None
+    if cache and stop is None and start is None:
+        key, result = Tools.cache_lookup(script_name, model, options)
+        if result is not None:
+            Tools.log(result[0].rstrip("\n"), verbose)
+            return result + (None,) if return_usage else result
+    start_file = None
+    if start is not None:
+        start_file = Tools.write_start(script_name, start, workspace)
+    cmd = Tools.script_cmd(script_name, model, options, start_file)
+    out_file = Tools.new_tmp_file(workspace=workspace)
+    sol_file = Tools.new_tmp_file(".sol", workspace=workspace)
+    try:
+        usage = await arun(
+            "{0} --wsol {1}".format(cmd, sol_file),
+            tee=out_file,
+            verbose=verbose,
+            workspace=workspace,
+            progress=progress,
+            stop=stop,
+            parser=script_name,
+            timeout=timeout,
+            memory_limit=memory_limit,
+            cpu_limit=cpu_limit
+        )
+    except BaseException:
+        for fname in (out_file, sol_file):
+            if os.path.exists(fname):
+                os.remove(fname)
+        raise
+    finally:
+        if start_file is not None:
+            os.remove(start_file)
+    output, values = Tools.read_output(out_file, sol_file)
+    if not usage["timeout"]:
+        Tools.cache_store(key, output, values)
+    if return_usage:
+        return output, values, usage
+    return output, values
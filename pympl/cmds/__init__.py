@@ -19,16 +19,64 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import sys
 from .base import CmdBase, SubmodBase
-from .default import CmdSet, CmdParam, CmdVar, CmdCon, CmdStmt
-from .vpsolver import SubmodVBPFlow, CmdVBPGraph, SubmodMVPFlow, CmdMVPGraph
-from .atsp import SubmodATSPSCF, SubmodATSPMCF, SubmodATSPMTZ
-from .sos import SubmodSOS1, SubmodSOS2, SubmodPWL
-from .xform import SubmodWWU, SubmodWWUB
-from .xform import SubmodWWUSC, SubmodWWUSCB, SubmodWWULB
-from .xform import SubmodWWCC, SubmodWWCCB
-from .xform import SubmodLSU, SubmodLSU1, SubmodLSU2
-from .xform import SubmodLSUB, SubmodLSUSC, SubmodLSUSCB
-from .xform import SubmodDLSICC, SubmodDLSICCB
-from .xform import SubmodDLSCCB, SubmodDLSCCSC
-from .xform import SubmodWWU_AMPL, SubmodWWUB_AMPL
+
+# command classes and the modules defining them (imported on first use)
+CLASSES = {
+    "CmdSet": "default",
+    "CmdParam": "default",
+    "CmdVar": "default",
+    "CmdCon": "default",
+    "CmdStmt": "default",
+    "SubmodVBPFlow": "vpsolver",
+    "CmdVBPGraph": "vpsolver",
+    "SubmodMVPFlow": "vpsolver",
+    "CmdMVPGraph": "vpsolver",
+    "SubmodATSPSCF": "atsp",
+    "SubmodATSPMCF": "atsp",
+    "SubmodATSPMTZ": "atsp",
+    "SubmodSOS1": "sos",
+    "SubmodSOS2": "sos",
+    "SubmodPWL": "sos",
+    "SubmodWWU": "xform",
+    "SubmodWWUB": "xform",
+    "SubmodWWUSC": "xform",
+    "SubmodWWUSCB": "xform",
+    "SubmodWWULB": "xform",
+    "SubmodWWCC": "xform",
+    "SubmodWWCCB": "xform",
+    "SubmodLSU": "xform",
+    "SubmodLSU1": "xform",
+    "SubmodLSU2": "xform",
+    "SubmodLSUB": "xform",
+    "SubmodLSUSC": "xform",
+    "SubmodLSUSCB": "xform",
+    "SubmodDLSICC": "xform",
+    "SubmodDLSICCB": "xform",
+    "SubmodDLSCCB": "xform",
+    "SubmodDLSCCSC": "xform",
+    "SubmodWWU_AMPL": "xform",
+    "SubmodWWUB_AMPL": "xform",
+}
+
+
+def __getattr__(name):
+    """Import the module of a command class on first use (PEP 562)."""
+    if name not in CLASSES:
+        raise AttributeError(
+            "module {0!r} has no attribute {1!r}".format(__name__, name)
+        )
+    from importlib import import_module
+    cls = getattr(import_module("." + CLASSES[name], __name__), name)
+    globals()[name] = cls
+    return cls
+
+
+def __dir__():
+    return sorted(set(globals()) | set(CLASSES))
+
+
+if sys.version_info < (3, 7):  # no module __getattr__
+    for _name in CLASSES:
+        __getattr__(_name)
@@ -20,23 +20,49 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from ..utils.common import UnionFind
+from ..solution import get_values
+
+
+def _adjacency(graph):
+    """Return the incoming and outgoing arcs of each vertex."""
+    V, A, start = graph
+    arcs_in = {k: [] for k in V}
+    arcs_out = {k: [] for k in V}
+    for (u, v) in A:
+        arcs_out[u].append((u, v))
+        arcs_in[v].append((u, v))
+    return arcs_in, arcs_out
+
+
+def _add_rows(model, rows, sign, rhs):
+    """Add the constraints sum{(var, coef) in rows[i]} coef*var sign rhs[i]."""
+    row_ids, cols, coefs = [], [], []
+    for i, row in enumerate(rows):
+        lincomb = {}
+        for var, coef in row:
+            lincomb[var] = lincomb.get(var, 0) + coef
+        for var in sorted(lincomb):
+            row_ids.append(i)
+            cols.append(var)
+            coefs.append(lincomb[var])
+    model.add_cons(row_ids, cols, coefs, sign, rhs)
 
 
 def add_assign_constraints(model, xvars, graph):
     """Add TSP assignment constraints to the model."""
     V, A, start = graph
+    arcs_in, arcs_out = _adjacency(graph)
 
     # var x{A}, binary;
-    for var in xvars.values():
-        model.add_var(name=var, lb=0, ub=1, vtype="B")
+    model.add_vars(list(xvars.values()), lb=0, ub=1, vtype="B")
 
     # s.t. leave{i in V}: sum{(i,j) in A} x[i,j] = 1;
     # s.t. enter{j in V}: sum{(i,j) in A} x[i,j] = 1;
+    rows = []
     for k in V:
-        vars_in = [xvars[u, v] for u, v in A if v == k]
-        vars_out = [xvars[u, v] for u, v in A if u == k]
-        model.add_con(vars_in, "=", 1)
-        model.add_con(vars_out, "=", 1)
+        rows.append([(xvars[arc], 1) for arc in arcs_in[k]])
+        rows.append([(xvars[arc], 1) for arc in arcs_out[k]])
+    _add_rows(model, rows, "=", [1]*len(rows))
 
 
 def add_cut_variables(model, xvars, graph, prefix=""):
@@ -51,14 +77,16 @@ def add_cut_variables(model, xvars, graph, prefix=""):
         cu, cv = min(u, v), max(u, v)
         cutvars[cu, cv] = yvar(cu, cv)
 
+    model.add_vars(list(cutvars.values()), lb=0, ub=1)
+    rows = []
     for u, v in cutvars:
-        model.add_var(name=cutvars[u, v], lb=0, ub=1)
-        lincomb = []
+        lincomb = [(cutvars[u, v], -1)]
         if (u, v) in xvars:
-            lincomb.append(xvars[u, v])
+            lincomb.append((xvars[u, v], 1))
         if (v, u) in xvars:
-            lincomb.append(xvars[v, u])
-        model.add_con(lincomb, "=", cutvars[u, v])
+            lincomb.append((xvars[v, u], 1))
+        rows.append(lincomb)
+    _add_rows(model, rows, "=", [0]*len(rows))
 
     return cutvars
 
@@ -83,9 +111,7 @@ def add_mtz_constraints(model, xvars, graph, DL=False, prefix=""):
         return "{0}u_{1}".format(prefix, u)
 
     # var u{i in V: i != n}, >= 0;
-    for u in V:
-        if u != start:
-            model.add_var(name=uvar(u), lb=0, vtype="C")
+    model.add_vars([uvar(u) for u in V if u != start], lb=0, vtype="C")
 
     # Miller, Tucker and Zemlin (MTZ) (1960)
     # s.t. MTZ{(i,j) in A: i != n}:
@@ -94,13 +120,16 @@ def add_mtz_constraints(model, xvars, graph, DL=False, prefix=""):
     # Desrochers and Laporte (1991)
     # s.t. DL{(i,j) in A: i != n}:
     #   u[i]-u[j]+(n-1)*x[i,j]+(n-3)*x[j,i] <= n-2;
+    arcs = set(A)
+    rows = []
     for (u, v) in A:
         if u == start or v == start:
             continue
         lincomb = [(uvar(u), 1), (uvar(v), -1), (xvars[u, v], len(V)-1)]
-        if DL and (v, u) in A:
+        if DL and (v, u) in arcs:
             lincomb.append((xvars[v, u], len(V)-3))
-        model.add_con(lincomb, "<=", len(V)-2)
+        rows.append(lincomb)
+    _add_rows(model, rows, "<=", [len(V)-2]*len(rows))
 
 
 def add_scf_constraints(model, xvars, graph, prefix=""):
@@ -117,33 +146,36 @@ def add_scf_constraints(model, xvars, graph, prefix=""):
     """
 
     V, A, start = graph
+    arcs_in, arcs_out = _adjacency(graph)
 
     def yvar(u, v):
         return prefix+"y_{0}_{1}".format(u, v)
 
     # var y{A}, >= 0;
-    for (u, v) in A:
-        model.add_var(name=yvar(u, v), lb=0, vtype="C")
+    yvars = {(u, v): yvar(u, v) for (u, v) in A}
+    model.add_vars([yvars[u, v] for (u, v) in A], lb=0, vtype="C")
 
     # s.t. vub1{(i,j) in A: j == n}: y[i,j] <= (n-1) * x[i,j];
     # s.t. vub2{(i,j) in A: j != n}: y[i,j] <= (n-2) * x[i,j];
+    rows = []
     for (u, v) in A:
         if v == start:
-            model.add_con(yvar(u, v), "<=", (len(V)-1, xvars[u, v]))
+            rows.append([(yvars[u, v], 1), (xvars[u, v], -(len(V)-1))])
         else:
-            model.add_con(yvar(u, v), "<=", (len(V)-2, xvars[u, v]))
+            rows.append([(yvars[u, v], 1), (xvars[u, v], -(len(V)-2))])
+    _add_rows(model, rows, "<=", [0]*len(rows))
 
     # s.t. flowcon{i in V}:
     # sum{(j,i) in A} y[j,i] - sum{(i,j) in A} y[i,j]
     # = if i == n then n-1
     #   else -1;
+    rows = []
     for k in V:
-        lincomb = [(yvar(u, v), 1) for u, v in A if v == k]
-        lincomb += [(yvar(u, v), -1) for u, v in A if u == k]
-        if k == start:
-            model.add_con(lincomb, "=", len(V)-1)
-        else:
-            model.add_con(lincomb, "=", -1)
+        lincomb = [(yvars[arc], 1) for arc in arcs_in[k]]
+        lincomb += [(yvars[arc], -1) for arc in arcs_out[k]]
+        rows.append(lincomb)
+    rhs = [len(V)-1 if k == start else -1 for k in V]
+    _add_rows(model, rows, "=", rhs)
 
 
 def add_mcf_constraints(model, xvars, graph, prefix=""):
@@ -161,21 +193,27 @@ def add_mcf_constraints(model, xvars, graph, prefix=""):
     """
 
     V, A, start = graph
+    arcs_in, arcs_out = _adjacency(graph)
+    commodities = [k for k in V if k != start]
 
     def yvar(u, v, k):
         return prefix+"y_{0}_{1}_{2}".format(u, v, k)
 
     # var y{A}, >= 0;
-    for (u, v) in A:
-        for k in V:
-            if k != start:
-                model.add_var(name=yvar(u, v, k), lb=0, vtype="C")
+    yvars = {
+        (u, v, k): yvar(u, v, k) for (u, v) in A for k in commodities
+    }
+    model.add_vars(
+        [yvars[u, v, k] for (u, v) in A for k in commodities],
+        lb=0, vtype="C"
+    )
 
     # s.t. vub{(i,j) in A, k in V: k != n}: y[i,j,k] <= x[i,j];
-    for (u, v) in A:
-        for k in V:
-            if k != start:
-                model.add_con(yvar(u, v, k), "<=", xvars[u, v])
+    rows = [
+        [(yvars[u, v, k], 1), (xvars[u, v], -1)]
+        for (u, v) in A for k in commodities
+    ]
+    _add_rows(model, rows, "<=", [0]*len(rows))
 
     # s.t. flowcon{i in V, k in V: k != n}:
     #   sum{(j,i) in A} y[j,i,k]
@@ -183,18 +221,19 @@ def add_mcf_constraints(model, xvars, graph, prefix=""):
     #   = if i == k then 1 else
     #     if i == n then -1 else
     #     0;
+    rows, rhs = [], []
     for i in V:
-        for k in V:
-            if k == start:
-                continue
-            lincomb = [(yvar(u, v, k), 1) for u, v in A if v == i]
-            lincomb += [(yvar(u, v, k), -1) for u, v in A if u == i]
+        for k in commodities:
+            lincomb = [(yvars[u, v, k], 1) for (u, v) in arcs_in[i]]
+            lincomb += [(yvars[u, v, k], -1) for (u, v) in arcs_out[i]]
+            rows.append(lincomb)
             if i == k:
-                model.add_con(lincomb, "=", 1)
+                rhs.append(1)
             elif i == start:
-                model.add_con(lincomb, "=", -1)
+                rhs.append(-1)
             else:
-                model.add_con(lincomb, "=", 0)
+                rhs.append(0)
+    _add_rows(model, rows, "=", rhs)
 
 
 def tsp_cut_generator(graph, cutvars, get_var_value):
@@ -204,9 +243,9 @@ def tsp_cut_generator(graph, cutvars, get_var_value):
     ds = UnionFind(len(V))
     ind = {v: i for i, v in enumerate(V)}
 
-    varvalue = {}
+    names = [cutvars[a] for a in cutvars]
+    varvalue = dict(zip(names, get_values(get_var_value, names)))
     for (u, v) in cutvars:
-        varvalue[cutvars[u, v]] = get_var_value(cutvars[u, v])
         if abs(1-varvalue[cutvars[u, v]]) < 1e-5:
             ds.link(ind[u], ind[v])
 
@@ -29,7 +29,19 @@ import re
 from .base import CmdBase, SubmodBase
 from ..model import Model, writemod
 from ..tools import Tools
+from ..solution import get_values
 from .. import utils
+from ..utils import instrument
+
+
+def _prefixed_values(get_var_value, model, prefix):
+    """Return the values of the variables of model whose name starts with
+    prefix (without the prefix)."""
+    names = [var for var in model.vars if var.startswith(prefix)]
+    n = len(prefix)
+    return dict(
+        zip((var[n:] for var in names), get_values(get_var_value, names))
+    )
 
 
 class CmdVBPGraph(CmdBase):
@@ -263,21 +275,20 @@ class SubmodVBPFlow(SubmodBase):
         lst_sol = []
         for zvar, model, graph, prefix in zip(
                 self._zvars, self._models, self._graphs, self._prefixes):
-            varvalues = {
-                var.replace(prefix, "", 1): get_var_value(var)
-                for var in model.vars if var.startswith(prefix)
-            }
-            total_flow = varvalues.get("_total_flow", 0)
-            graph.set_flow(varvalues)
-            sol = graph.extract_solution(
-                graph.S, "<-", graph.Ts[0], flow_limit=total_flow
-            )
-            lst_sol.append((zvar, total_flow, sol))
-            Tools.log(
-                "Graph: {0} (flow={1:d})\n\t{2}".format(
-                    zvar, total_flow, sol
-                ), verbose=verbose
-            )
+            with instrument.stage(
+                    "extract", cmd=self.cmd_name, prefix=prefix):
+                varvalues = _prefixed_values(get_var_value, model, prefix)
+                total_flow = varvalues.get("_total_flow", 0)
+                graph.set_flow(varvalues)
+                sol = graph.extract_solution(
+                    graph.S, "<-", graph.Ts[0], flow_limit=total_flow
+                )
+                lst_sol.append((zvar, total_flow, sol))
+                Tools.log(
+                    "Graph: {0} (flow={1:d})\n\t{2}".format(
+                        zvar, total_flow, sol
+                    ), verbose=verbose
+                )
         return lst_sol
 
 
@@ -440,20 +451,19 @@ class SubmodMVPFlow(SubmodBase):
         lst_sol = []
         for zvars, model, graph, prefix in zip(
                 self._zvars, self._models, self._graphs, self._prefixes):
-            varvalues = {
-                var.replace(prefix, "", 1): get_var_value(var)
-                for var in model.vars if var.startswith(prefix)
-            }
-            for i, (zvar, T) in enumerate(zip(zvars, graph.Ts)):
-                total_flow_i = varvalues.get("_total_flow_{}".format(i), 0)
-                graph.set_flow(varvalues)
-                sol = graph.extract_solution(
-                    graph.S, "<-", T, flow_limit=total_flow_i
-                )
-                lst_sol.append((zvar, total_flow_i, sol))
-                Tools.log(
-                    "Graph: {0} (flow={1:d})\n\t{2}".format(
-                        zvar, total_flow_i, sol
-                    ), verbose=verbose
-                )
+            with instrument.stage(
+                    "extract", cmd=self.cmd_name, prefix=prefix):
+                varvalues = _prefixed_values(get_var_value, model, prefix)
+                for i, (zvar, T) in enumerate(zip(zvars, graph.Ts)):
+                    total_flow_i = varvalues.get("_total_flow_{}".format(i), 0)
+                    graph.set_flow(varvalues)
+                    sol = graph.extract_solution(
+                        graph.S, "<-", T, flow_limit=total_flow_i
+                    )
+                    lst_sol.append((zvar, total_flow_i, sol))
+                    Tools.log(
+                        "Graph: {0} (flow={1:d})\n\t{2}".format(
+                            zvar, total_flow_i, sol
+                        ), verbose=verbose
+                    )
         return lst_sol
@@ -18,28 +18,544 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
+from builtins import map
+from builtins import range
 
 import os
+import re
+import shutil
+import subprocess
+from array import array
 from .tools import Tools
+from .utils import DiskCache, instrument
+from .model import Model
+from .solution import Solution
 
+CACHE = None
+GLPSOL_VERSION = None  # False if glpsol cannot be run
 
-def mod2lp(fname_mod, fname_lp, verbose=None):
-    """Convert a GMPL file into a LP file using GLPK."""
+
+def set_cache(directory, maxsize=2**30):
+    """Enable the cache of mod2lp/mod2mps conversions in directory
+    (maxsize in bytes) or disable it if directory is None."""
+    global CACHE
+    if directory is None:
+        CACHE = None
+    else:
+        CACHE = DiskCache(directory, maxsize)
+
+
+def glpsol_version():
+    """Return the version line of glpsol (None if it cannot be run)."""
+    global GLPSOL_VERSION
+    if GLPSOL_VERSION is None:
+        try:
+            output = subprocess.check_output(["glpsol", "--version"])
+        except (OSError, subprocess.CalledProcessError):
+            GLPSOL_VERSION = False
+        else:
+            GLPSOL_VERSION = output.decode("utf-8").split("\n")[0].strip()
+    return GLPSOL_VERSION or None
+
+
+def _remove(fname):
+    """Remove a file if it exists."""
+    try:
+        os.remove(fname)
+    except OSError:
+        if os.path.exists(fname):
+            raise
+
+
+def _convert(option, fname_mod, fname_out, verbose, cache):
+    """Run glpsol --math to convert a GMPL file (or reuse a cached result).
+
+    Cached results are copied to fname_out, so the output files can be
+    modified without corrupting the cache.
+    """
+    key = None
+    if cache and CACHE is not None:
+        version = glpsol_version()
+        if version is not None:
+            key = DiskCache.hash_key(
+                option, version, DiskCache.hash_file(fname_mod)
+            )
+            path = CACHE.get(key)
+            if path is not None:
+                _remove(fname_out)
+                try:
+                    shutil.copyfile(path, fname_out)
+                    Tools.log(
+                        "Using the cached result of 'glpsol --math {0} {1}'"
+                        .format(fname_mod, option), verbose
+                    )
+                    return
+                except (IOError, OSError):  # evicted by another process
+                    pass
+    _remove(fname_out)
     Tools.run(
-        "glpsol --math {0} --check --wlp {1}".format(
-            fname_mod, fname_lp
+        "glpsol --math {0} --check {1} {2}".format(
+            fname_mod, option, fname_out
         ),
         grepv="Generating _",
         verbose=verbose
     )
+    if key is not None:
+        CACHE.put_file(key, fname_out)
 
 
-def mod2mps(fname_mod, fname_mps, verbose=None):
-    """Convert a GMPL file into a MPS file using GLPK."""
-    Tools.run(
-        "glpsol --math {0} --check --wmps {1}".format(
-            fname_mod, fname_mps
-        ),
-        grepv="Generating _",
-        verbose=verbose
+NAME = r"[A-Za-z_][A-Za-z0-9_]*"
+NUMBER = r"(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+COMMENT_RE = re.compile(r"/\*.*?\*/|#[^\n]*", re.S)
+KEYWORD_RE = re.compile(r"s\.t\.|\w+")
+VAR_RE = re.compile(r"var\s+({0})\s*(.*)$".format(NAME), re.S)
+ATTR_RE = re.compile(
+    r"\s*,?\s*(?:(integer|binary)|(>=|<=|==|=)\s*([+-]?\s*{0}))\s*".format(
+        NUMBER
     )
+)
+OBJ_RE = re.compile(r"(maximize|minimize)\s+{0}\s*:(.*)$".format(NAME), re.S)
+CON_RE = re.compile(
+    r"(?:s\.t\.|subject\s+to|subj\s+to)\s+({0})\s*:(.*)$".format(NAME), re.S
+)
+REL_RE = re.compile(r"(<=|>=|==|=|<|>)")
+TERM = r"(?:{num}\s*(?:\*\s*{name})?|{name}(?:\s*\*\s*{num})?)"
+TERM_RE = re.compile(
+    r"\s*([+-]?)\s*" + TERM.format(
+        name="({0})".format(NAME), num="({0})".format(NUMBER)
+    )
+)
+SIGNED_NUMBER_RE = re.compile(r"[+-]?{0}$".format(NUMBER))
+EXPR_RE = re.compile(
+    r"\s*[+-]?\s*{0}(?:\s*[+-]\s*{0})*\s*$".format(
+        TERM.format(name=NAME, num=NUMBER)
+    )
+)
+
+
+def _number(value):
+    """Convert a GMPL numeric literal into an int or a float."""
+    value = value.replace(" ", "")
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+class _NumberCache(dict):
+    """Cache of the values of (optionally signed) GMPL numeric literals;
+    maps anything else to None."""
+
+    def __missing__(self, value):
+        if SIGNED_NUMBER_RE.match(value) is None:
+            num = None
+        else:
+            num = _number(value)
+        self[value] = num
+        return num
+
+
+def _split_expr(expr, variables, numbers, names, coefs, sign):
+    """Fast path of _linear_expr for expressions with one term per
+    whitespace-separated token (e.g., "+2*x -y +3")."""
+    constant = 0
+    first = True
+    for token in expr.split():
+        if not first and token[0] not in "+-":
+            return None
+        first = False
+        coef, star, var = token.partition("*")
+        if star:
+            num = numbers[coef]
+            if num is None or var not in variables:
+                return None
+        elif token in variables:
+            var, num = token, 1
+        elif token[1:] in variables and token[0] in "+-":
+            var, num = token[1:], (1 if token[0] == "+" else -1)
+        else:
+            num = numbers[token]
+            if num is None:
+                return None
+            constant += sign*num
+            continue
+        names.append(var)
+        coefs.append(sign*num)
+    if first:
+        return None
+    return constant
+
+
+def _linear_expr(expr, variables, numbers, names, coefs, sign=1):
+    """Append the terms of a linear expression multiplied by sign to
+    (names, coefs); returns the constant term (None if the expression is
+    not in the subset)."""
+    start = len(names)
+    constant = _split_expr(expr, variables, numbers, names, coefs, sign)
+    if constant is not None:
+        return constant
+    del names[start:], coefs[start:]
+    if EXPR_RE.match(expr) is None:
+        return None
+    constant = 0
+    for neg, num1, var1, var2, num2 in TERM_RE.findall(expr):
+        num = num1 or num2
+        if num == "":
+            num = sign
+        else:
+            num = sign*numbers[num]
+        if neg == "-":
+            num = -num
+        var = var1 or var2
+        if var == "":
+            constant += num
+        elif var in variables:
+            names.append(var)
+            coefs.append(num)
+        else:  # sets, parameters, undeclared symbols, ...
+            return None
+    return constant
+
+
+def _var_attrs(attrs):
+    """Parse the attributes of a variable into (lb, ub, vtype) (None if
+    they are not in the subset)."""
+    lb, ub, vtype = None, None, "C"
+    pos = 0
+    while pos < len(attrs):
+        attr = ATTR_RE.match(attrs, pos)
+        if attr is None or attr.end() == pos:
+            return None
+        typ, rel, value = attr.groups()
+        if typ is not None:
+            if vtype != "C":
+                return None
+            vtype = "I" if typ == "integer" else "B"
+        elif rel == ">=":
+            lb = _number(value)
+        elif rel == "<=":
+            ub = _number(value)
+        else:
+            lb = ub = _number(value)
+        pos = attr.end()
+    return lb, ub, vtype
+
+
+def _gmpl_statements(text, model):
+    """Add the statements of a GMPL model to model (returns False if the
+    model is not in the subset)."""
+    var_names, lbs, ubs, vtypes = [], [], [], []
+    variables = set()
+    numbers, var_attrs = _NumberCache(), {}
+    con_names, senses, rhs = [], [], []
+    rows, cols, coefs = [], [], []
+    obj = None
+    data_section = False
+    for stmt in text.split(";"):
+        stmt = stmt.strip()
+        keyword = KEYWORD_RE.match(stmt)
+        keyword = keyword.group(0) if keyword is not None else stmt
+        if stmt == "":
+            continue
+        elif keyword == "end":
+            break
+        elif data_section or keyword in ("set", "param"):
+            continue
+        elif keyword == "data" and stmt == "data":
+            data_section = True
+        elif keyword == "var":
+            match = VAR_RE.match(stmt)
+            if match is None:
+                return False
+            name, attrs = match.groups()
+            if attrs not in var_attrs:
+                var_attrs[attrs] = _var_attrs(attrs)
+            if var_attrs[attrs] is None or name in variables:
+                return False
+            lb, ub, vtype = var_attrs[attrs]
+            variables.add(name)
+            var_names.append(name)
+            lbs.append(lb)
+            ubs.append(ub)
+            vtypes.append(vtype)
+        elif keyword in ("maximize", "minimize"):
+            match = OBJ_RE.match(stmt)
+            if match is None or obj is not None:
+                return False
+            objdir, expr = match.groups()
+            names, values = [], []
+            if _linear_expr(expr, variables, numbers, names, values) != 0:
+                return False
+            if names == []:
+                return False
+            obj = (objdir[:3], list(zip(names, values)))
+        elif keyword in ("s.t.", "subject", "subj"):
+            match = CON_RE.match(stmt)
+            if match is None:
+                return False
+            name, expr = match.groups()
+            parts = REL_RE.split(expr)
+            if len(parts) != 3 or parts[1] in ("<", ">"):
+                return False
+            names, values = [], []
+            left = _linear_expr(
+                parts[0], variables, numbers, names, values
+            )
+            if left is None:
+                return False
+            right = _linear_expr(
+                parts[2], variables, numbers, names, values, -1
+            )
+            if right is None:
+                return False
+            if len(set(names)) != len(names):  # merge repeated variables
+                pairs = {}
+                for var, coef in zip(names, values):
+                    pairs[var] = pairs.get(var, 0) + coef
+                names, values = list(pairs), list(pairs.values())
+            row = len(con_names)
+            con_names.append(name)
+            senses.append("=" if parts[1] == "==" else parts[1])
+            rhs.append(-left - right)
+            rows.extend([row]*len(names))
+            cols.extend(names)
+            coefs.extend(values)
+        else:
+            return False
+    model.add_vars(var_names, lb=lbs, ub=ubs, vtype=vtypes)
+    model.add_cons(rows, cols, coefs, senses, rhs, names=con_names)
+    if obj is not None:
+        model.set_obj(*obj)
+    return True
+
+
+def mod2model(fname_mod):
+    """Load a GMPL file that only uses the subset written by PyMPL
+    (non-indexed variables and constraints with linear expressions) into
+    a pympl.model.Model; returns None if the file is not in the subset."""
+    with open(fname_mod) as f:
+        text = COMMENT_RE.sub(" ", f.read())
+    if "'" in text or '"' in text:
+        return None
+    model = Model()
+    try:
+        if not _gmpl_statements(text, model):
+            return None
+    except (AssertionError, ValueError):
+        return None
+    return model
+
+
+def _fixed_mps_names(model):
+    """Check if the names of a model fit in the fixed MPS format."""
+    return all(
+        len(name) <= 8 and " " not in name
+        for names in (model.vars_list, model.cons_list) for name in names
+    )
+
+
+def mod2lp(fname_mod, fname_lp, verbose=None, cache=True, native=False):
+    """Convert a GMPL file into a LP file using GLPK.
+
+    If native is True, files in the subset handled by mod2model are
+    converted without calling glpsol (and without its model checks).
+    """
+    with instrument.stage("mod2lp", model=fname_mod):
+        if native:
+            model = mod2model(fname_mod)
+            if model is not None:
+                _remove(fname_lp)
+                model.write_lp(fname_lp)
+                return
+        _convert("--wlp", fname_mod, fname_lp, verbose, cache)
+
+
+def mod2mps(fname_mod, fname_mps, verbose=None, cache=True, native=False):
+    """Convert a GMPL file into a fixed MPS file using GLPK.
+
+    If native is True, files in the subset handled by mod2model whose
+    names fit in the fixed MPS format are converted without calling glpsol
+    (and without its model checks).
+    """
+    with instrument.stage("mod2mps", model=fname_mod):
+        if native:
+            model = mod2model(fname_mod)
+            if model is not None and _fixed_mps_names(model):
+                _remove(fname_mps)
+                model.write_mps(fname_mps)
+                return
+        _convert("--wmps", fname_mod, fname_mps, verbose, cache)
+
+
+def _glpk_array(values, typecode):
+    """Copy values into a new 1-based GLPK array (typecode "i" or "d")."""
+    import swiglpk
+    values = list(values)
+    if typecode == "i":
+        garr = swiglpk.intArray(len(values)+1)
+    else:
+        garr = swiglpk.doubleArray(len(values)+1)
+    for k, value in enumerate(values, 1):
+        garr[k] = value
+    return garr
+
+
+def model2glpk(model):
+    """Load a pympl.model.Model into a new GLPK problem object."""
+    import swiglpk as glp
+    inf = float("inf")
+    lp = glp.glp_create_prob()
+    if model.objdir == "min":
+        glp.glp_set_obj_dir(lp, glp.GLP_MIN)
+    else:
+        glp.glp_set_obj_dir(lp, glp.GLP_MAX)
+
+    # Variables:
+
+    nvars = model.num_vars()
+    if nvars != 0:
+        glp.glp_add_cols(lp, nvars)
+    lbs, ubs = model.get_bounds()
+    vtypes = model.get_vtypes()
+    for j, name in enumerate(model.vars_list):
+        lb, ub, vtype = lbs[j], ubs[j], vtypes[j]
+        glp.glp_set_col_name(lp, j+1, name)
+        if lb == -inf and ub == inf:
+            glp.glp_set_col_bnds(lp, j+1, glp.GLP_FR, 0, 0)
+        elif ub == inf:
+            glp.glp_set_col_bnds(lp, j+1, glp.GLP_LO, lb, 0)
+        elif lb == -inf:
+            glp.glp_set_col_bnds(lp, j+1, glp.GLP_UP, 0, ub)
+        elif lb == ub:
+            glp.glp_set_col_bnds(lp, j+1, glp.GLP_FX, lb, ub)
+        else:
+            glp.glp_set_col_bnds(lp, j+1, glp.GLP_DB, lb, ub)
+        if vtype == "I":
+            glp.glp_set_col_kind(lp, j+1, glp.GLP_IV)
+        elif vtype == "B":
+            glp.glp_set_col_kind(lp, j+1, glp.GLP_BV)
+    for var, coef in model.obj:
+        glp.glp_set_obj_coef(lp, model.var_index(var)+1, coef)
+
+    # Constraints:
+
+    ncons = model.num_cons()
+    if ncons != 0:
+        glp.glp_add_rows(lp, ncons)
+    signs, rhs = model.get_rhs()
+    for i, name in enumerate(model.cons_list):
+        glp.glp_set_row_name(lp, i+1, name)
+        if signs[i] == "<=":
+            glp.glp_set_row_bnds(lp, i+1, glp.GLP_UP, 0, rhs[i])
+        elif signs[i] == ">=":
+            glp.glp_set_row_bnds(lp, i+1, glp.GLP_LO, rhs[i], 0)
+        else:
+            glp.glp_set_row_bnds(lp, i+1, glp.GLP_FX, rhs[i], rhs[i])
+
+    # A-matrix:
+
+    rows, cols, coefs = model.get_coo()
+    if len(coefs) != 0:
+        glp.glp_load_matrix(
+            lp, len(coefs),
+            _glpk_array(map((1).__add__, rows), "i"),
+            _glpk_array(map((1).__add__, cols), "i"),
+            _glpk_array(coefs, "d")
+        )
+    return lp
+
+
+def _glpk_solve(lp, verbose=None):
+    """Solve a GLPK problem object and return (status, mip)."""
+    import swiglpk as glp
+    if verbose is None:
+        verbose = Tools.VERBOSE
+    mip = glp.glp_get_num_int(lp) != 0
+    term_out = glp.glp_term_out(glp.GLP_ON if verbose else glp.GLP_OFF)
+    try:
+        if mip:
+            parm = glp.glp_iocp()
+            glp.glp_init_iocp(parm)
+            parm.presolve = glp.GLP_ON
+            ret = glp.glp_intopt(lp, parm)
+            status = glp.glp_mip_status(lp)
+        else:
+            parm = glp.glp_smcp()
+            glp.glp_init_smcp(parm)
+            parm.presolve = glp.GLP_ON
+            ret = glp.glp_simplex(lp, parm)
+            status = glp.glp_get_status(lp)
+    finally:
+        glp.glp_term_out(term_out)
+    if ret == glp.GLP_ENOPFS:
+        return "infeasible", mip
+    elif ret == glp.GLP_ENODFS:
+        return "unbounded", mip
+    elif ret not in (0, glp.GLP_ETMLIM, glp.GLP_EMIPGAP, glp.GLP_ESTOP):
+        raise RuntimeError("GLPK failed with error code {0}".format(ret))
+    return {
+        glp.GLP_OPT: "optimal",
+        glp.GLP_FEAS: "feasible",
+        glp.GLP_INFEAS: "infeasible",
+        glp.GLP_NOFEAS: "infeasible",
+        glp.GLP_UNBND: "unbounded",
+    }.get(status, "undefined"), mip
+
+
+def _glpk_values(lp, mip):
+    """Return the array of column values of a solved GLPK problem object."""
+    import swiglpk as glp
+    col_val = glp.glp_mip_col_val if mip else glp.glp_get_col_prim
+    return array(
+        "d", (col_val(lp, j) for j in range(1, glp.glp_get_num_cols(lp)+1))
+    )
+
+
+def glpk_solve(model, verbose=None):
+    """Solve a pympl.model.Model in-process using the GLPK C API (swiglpk).
+
+    Returns (status, values) where values is an array with the value of
+    each variable (ordered as model.vars_list), or None if no solution
+    was found.
+    """
+    import swiglpk as glp
+    lp = model2glpk(model)
+    try:
+        status, mip = _glpk_solve(lp, verbose)
+        if status not in ("optimal", "feasible"):
+            return status, None
+        return status, _glpk_values(lp, mip)
+    finally:
+        glp.glp_delete_prob(lp)
+
+
+def glpk_solve_mod(fname_mod, verbose=None):
+    """Translate and solve a GMPL file in-process using the GLPK C API.
+
+    Returns (status, solution) where solution is a pympl.Solution (as
+    returned by Tools.script), or None if no solution was found.
+    """
+    import swiglpk as glp
+    if verbose is None:
+        verbose = Tools.VERBOSE
+    tran = glp.glp_mpl_alloc_wksp()
+    lp = glp.glp_create_prob()
+    term_out = glp.glp_term_out(glp.GLP_ON if verbose else glp.GLP_OFF)
+    try:
+        if glp.glp_mpl_read_model(tran, fname_mod, 0) != 0:
+            raise RuntimeError("failed to read '{0}'".format(fname_mod))
+        if glp.glp_mpl_generate(tran, None) != 0:
+            raise RuntimeError("failed to generate '{0}'".format(fname_mod))
+        glp.glp_mpl_build_prob(tran, lp)
+        status, mip = _glpk_solve(lp, verbose)
+        if status not in ("optimal", "feasible"):
+            return status, None
+        names = [
+            glp.glp_get_col_name(lp, j)
+            for j in range(1, glp.glp_get_num_cols(lp)+1)
+        ]
+        return status, Solution(names, _glpk_values(lp, mip))
+    finally:
+        glp.glp_term_out(term_out)
+        glp.glp_delete_prob(lp)
+        glp.glp_mpl_free_wksp(tran)
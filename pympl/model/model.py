@@ -19,8 +19,19 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 from builtins import map
+from builtins import zip
+from builtins import range
 from builtins import object
 
+from array import array
+from operator import gt
+from collections import Counter
+from numbers import Integral, Number
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 from ..utils import linear_constraint
 from .writelp import write_lp
 from .writemps import write_mps
@@ -28,38 +39,113 @@ from .writemod import write_mod
 
 inf = float("inf")
 
+VTYPES = ("C", "I", "B")
+SIGNS = {"<": "<=", "=": "=", ">": ">="}
+
+
+def _value(value, isint):
+    """Convert a stored value back into the type it was given with."""
+    return int(value) if isint else value
+
+
+def _tolist(values):
+    """Convert a sequence (e.g., a list or a NumPy array) into a list."""
+    if hasattr(values, "tolist"):
+        return values.tolist()
+    return list(values)
+
+
+def _int_flags(values):
+    """Return isinstance(value, Integral) for each value."""
+    return [
+        type(v) is int or (type(v) is not float and isinstance(v, Integral))
+        for v in values
+    ]
+
+
+def _broadcast(value, n):
+    """Return a list of n values given a single value or a sequence."""
+    if value is None or isinstance(value, (str, Number)):
+        return [value]*n
+    values = _tolist(value)
+    assert len(values) == n
+    return values
+
 
 class Model(object):
-    """Class for creating models."""
+    """Class for creating models.
+
+    Variables and constraints are identified by integer ids (their
+    insertion order) and stored column-wise: bounds, types and right-hand
+    sides in arrays and the constraint matrix in CSR format. Names are
+    mapped to ids through an index dictionary, and ``vars``, ``cons``,
+    ``vars_list`` and ``cons_list`` provide the name-based views.
+    """
 
     def __init__(self):
-        self.vars = {}
-        self.cons = {}
-        self.vars_list = []
-        self.cons_list = []
+        # variables
+        self._var_names = []
+        self._var_index = {}
+        self._lb = array("d")
+        self._ub = array("d")
+        self._lb_int = array("b")
+        self._ub_int = array("b")
+        self._vtype = array("b")
+        # constraints (CSR)
+        self._con_names = []
+        self._con_index = {}
+        self._con_start = array("l", [0])
+        self._con_cols = array("i")
+        self._con_coefs = array("d")
+        self._con_coefs_int = array("b")
+        self._con_sign = array("b")
+        self._con_rhs = array("d")
+        self._con_rhs_int = array("b")
+        # objective
         self.obj = []
         self.objdir = "min"
 
+    @property
+    def vars(self):
+        """Variables: name -> {"lb": lb, "ub": ub, "vtype": vtype}
+        (read-only)."""
+        return _VarsView(self)
+
+    @property
+    def cons(self):
+        """Constraints: name -> (lincomb, sign, rhs) (read-only)."""
+        return _ConsView(self)
+
+    @property
+    def vars_list(self):
+        """Variable names ordered by id (do not modify)."""
+        return self._var_names
+
+    @property
+    def cons_list(self):
+        """Constraint names ordered by id (do not modify)."""
+        return self._con_names
+
     def set_obj(self, objdir, lincomb):
         """Set the model objective."""
         assert objdir in ["min", "max"]
         lincomb = linear_constraint(lincomb, "=", 0)[0]
         self.objdir = objdir
         for var, coef in lincomb:
-            assert var in self.vars
+            assert var in self._var_index
             assert coef != inf and coef != -inf
         self.obj = lincomb
 
     def new_con_name(self):
         """Generate a name for a new constraint."""
-        name = "RC{0:x}".format(len(self.cons))
-        assert name not in self.cons
+        name = "RC{0:x}".format(len(self._con_names))
+        assert name not in self._con_index
         return name
 
     def new_var_name(self):
         """Generate a name for a new variable."""
-        name = "RV{0:x}".format(len(self.vars))
-        assert name not in self.vars
+        name = "RV{0:x}".format(len(self._var_names))
+        assert name not in self._var_index
         return name
 
     def add_var(self, lb=None, ub=None, name=None, vtype="C"):
@@ -70,17 +156,19 @@ class Model(object):
             lb = None
         if ub == inf:
             ub = None
-        assert name not in self.vars
-        assert vtype in ["C", "I", "B"]
+        assert name not in self._var_index
+        assert vtype in VTYPES
         if vtype == "B":
             assert lb in (None, 0)
             assert ub in (None, 1)
             lb, ub = 0, 1
-        self.vars_list.append(name)
-        self.vars[name] = {}
-        self.vars[name]["lb"] = lb
-        self.vars[name]["ub"] = ub
-        self.vars[name]["vtype"] = vtype
+        self._var_index[name] = len(self._var_names)
+        self._var_names.append(name)
+        self._lb.append(-inf if lb is None else lb)
+        self._lb_int.append(isinstance(lb, Integral))
+        self._ub.append(inf if ub is None else ub)
+        self._ub_int.append(isinstance(ub, Integral))
+        self._vtype.append(ord(vtype))
         return name
 
     def add_con(self, left, sign, right, name=None):
@@ -93,43 +181,267 @@ class Model(object):
             return
         if name is None:
             name = self.new_con_name()
+        index = self._var_index
         for var, coef in lincomb:
-            assert var in self.vars
+            assert var in index
             assert coef != inf and coef != -inf
-        assert name not in self.cons
-        self.cons_list.append(name)
-        self.cons[name] = (lincomb, sign, rhs)
+        assert name not in self._con_index
+        self._con_index[name] = len(self._con_names)
+        self._con_names.append(name)
+        self._con_cols.extend(index[var] for var, coef in lincomb)
+        self._con_coefs.extend(coef for var, coef in lincomb)
+        self._con_coefs_int.extend(
+            isinstance(coef, Integral) for var, coef in lincomb
+        )
+        self._con_start.append(len(self._con_cols))
+        self._con_sign.append(ord(sign[0]))
+        self._con_rhs.append(rhs)
+        self._con_rhs_int.append(isinstance(rhs, Integral))
+
+    def add_vars(self, names, lb=None, ub=None, vtype="C"):
+        """Add several variables to the model.
+
+        lb, ub and vtype can be either single values or sequences (e.g.,
+        lists or NumPy arrays) with one entry per variable.
+        """
+        names = _tolist(names)
+        n = len(names)
+        lbs = _broadcast(lb, n)
+        ubs = _broadcast(ub, n)
+        vtypes = _broadcast(vtype, n)
+        index = self._var_index
+        assert len(set(names)) == n
+        assert not any(name in index for name in names)
+        assert set(vtypes) <= set(VTYPES)
+        if "B" in vtypes:
+            for i, typ in enumerate(vtypes):
+                if typ == "B":
+                    assert lbs[i] in (None, 0) and ubs[i] in (None, 1)
+                    lbs[i], ubs[i] = 0, 1
+        lbs = [None if v is None or v == -inf else v for v in lbs]
+        ubs = [None if v is None or v == inf else v for v in ubs]
+        first = len(self._var_names)
+        index.update(zip(names, range(first, first+n)))
+        self._var_names.extend(names)
+        self._lb.extend(-inf if v is None else v for v in lbs)
+        self._lb_int.extend(_int_flags(lbs))
+        self._ub.extend(inf if v is None else v for v in ubs)
+        self._ub_int.extend(_int_flags(ubs))
+        self._vtype.extend(ord(typ) for typ in vtypes)
+        return names
+
+    def add_cons(self, rows, cols, coefs, senses, rhs, names=None):
+        """Add several constraints given in coordinate format.
+
+        The k-th term (rows[k], cols[k], coefs[k]) is the coefficient of
+        the variable cols[k] (a name or an id) in the new constraint
+        rows[k] (0, 1, ...). senses and rhs are single values or sequences
+        with one entry per constraint. Unlike add_con, terms are neither
+        merged nor sorted, and empty constraints are skipped.
+        Returns the names of the new constraints.
+        """
+        rows, cols, coefs = _tolist(rows), _tolist(cols), _tolist(coefs)
+        assert len(rows) == len(cols) == len(coefs)
+        if names is not None:
+            names = _tolist(names)
+            m = len(names)
+        elif not isinstance(rhs, Number):
+            rhs = _tolist(rhs)
+            m = len(rhs)
+        elif not isinstance(senses, str):
+            senses = _tolist(senses)
+            m = len(senses)
+        else:
+            m = max(rows)+1 if rows else 0
+        senses = _broadcast(senses, m)
+        rhs = _broadcast(rhs, m)
+        assert len(senses) == len(rhs) == m
+        senses = [sign[:1] for sign in senses]
+        assert set(senses) <= set(SIGNS)
+        assert all(value != inf and value != -inf for value in rhs)
+        if coefs:
+            assert max(coefs) != inf and min(coefs) != -inf
+        if rows:
+            assert 0 <= min(rows) and max(rows) < m
+
+        index = self._var_index
+        try:
+            cols = [
+                index[col] if isinstance(col, str) else col
+                for col in cols
+            ]
+        except KeyError as e:
+            raise AssertionError("unknown variable {0!r}".format(e.args[0]))
+        if cols:
+            assert 0 <= min(cols) and max(cols) < len(self._var_names)
+
+        # group the terms by row (counting sort)
+        count = [0]*(m+1)
+        for i in rows:
+            count[i+1] += 1
+        start = [0]*(m+1)
+        for i in range(m):
+            start[i+1] = start[i] + count[i+1]
+        if any(map(gt, rows, rows[1:])):
+            pos = start[:m]
+            order = [0]*len(rows)
+            for k, i in enumerate(rows):
+                order[pos[i]] = k
+                pos[i] += 1
+            cols = [cols[k] for k in order]
+            coefs = [coefs[k] for k in order]
+
+        nonempty = [i for i in range(m) if start[i] != start[i+1]]
+        if names is not None:
+            assert len(set(names)) == m
+            assert not any(names[i] in self._con_index for i in nonempty)
+        added = []
+        for i in nonempty:
+            if names is None:
+                name = self.new_con_name()
+            else:
+                name = names[i]
+            self._con_index[name] = len(self._con_names)
+            self._con_names.append(name)
+            self._con_cols.extend(cols[start[i]:start[i+1]])
+            self._con_start.append(len(self._con_cols))
+            self._con_sign.append(ord(senses[i]))
+            self._con_rhs.append(rhs[i])
+            self._con_rhs_int.append(isinstance(rhs[i], Integral))
+            added.append(name)
+        self._con_coefs.extend(coefs)
+        self._con_coefs_int.extend(_int_flags(coefs))
+        return added
 
     def rename_vars(self, var_name):
         """Rename variables."""
-        self.vars_list = list(map(var_name, self.vars_list))
-        oldvars = self.vars
-        self.vars = {}
-        for name in oldvars:
-            self.vars[var_name(name)] = oldvars[name]
-        for name in self.cons:
-            lincomb, sign, rhs = self.cons[name]
-            lincomb = [
-                (var_name(var), coef)
-                for var, coef in lincomb
-            ]
-            self.cons[name] = (lincomb, sign, rhs)
+        self._var_names = list(map(var_name, self._var_names))
+        self._var_index = {
+            name: i for i, name in enumerate(self._var_names)
+        }
+        self.obj = [(var_name(var), coef) for var, coef in self.obj]
 
     def rename_cons(self, con_name):
         """Rename constraints."""
-        self.cons_list = list(map(con_name, self.cons_list))
-        oldcons = self.cons
-        self.cons = {}
-        for con in oldcons:
-            self.cons[con_name(con)] = oldcons[con]
+        self._con_names = list(map(con_name, self._con_names))
+        self._con_index = {
+            name: i for i, name in enumerate(self._con_names)
+        }
+
+    def num_vars(self):
+        """Return the number of variables."""
+        return len(self._var_names)
+
+    def num_cons(self):
+        """Return the number of constraints."""
+        return len(self._con_names)
+
+    def num_nonzeros(self):
+        """Return the number of nonzeros in the constraint matrix."""
+        return len(self._con_cols)
+
+    def var_index(self, name):
+        """Return the id of a variable."""
+        return self._var_index[name]
+
+    def con_index(self, name):
+        """Return the id of a constraint."""
+        return self._con_index[name]
+
+    def var_info(self, i):
+        """Return the (name, lb, ub, vtype) of the variable with id i."""
+        lb, ub = self._lb[i], self._ub[i]
+        return (
+            self._var_names[i],
+            None if lb == -inf else _value(lb, self._lb_int[i]),
+            None if ub == inf else _value(ub, self._ub_int[i]),
+            chr(self._vtype[i])
+        )
+
+    def con_info(self, i):
+        """Return the (name, cols, coefs, sign, rhs) of the constraint
+        with id i (cols holds variable ids)."""
+        start, end = self._con_start[i], self._con_start[i+1]
+        coefs_int = self._con_coefs_int
+        return (
+            self._con_names[i],
+            self._con_cols[start:end],
+            [
+                _value(coef, coefs_int[k])
+                for k, coef in zip(
+                    range(start, end), self._con_coefs[start:end]
+                )
+            ],
+            SIGNS[chr(self._con_sign[i])],
+            _value(self._con_rhs[i], self._con_rhs_int[i])
+        )
+
+    def get_bounds(self):
+        """Return the arrays (lb, ub) of variable bounds (-inf/inf if
+        unbounded)."""
+        return self._lb, self._ub
+
+    def get_int_flags(self):
+        """Return the arrays (lb, ub, coefs, rhs) of flags marking the
+        values that were given as integers."""
+        return (
+            self._lb_int, self._ub_int, self._con_coefs_int, self._con_rhs_int
+        )
+
+    def get_vtypes(self):
+        """Return the list of variable types ("C", "I" or "B")."""
+        return [chr(t) for t in self._vtype]
+
+    def get_csr(self):
+        """Return the constraint matrix in CSR format as arrays
+        (start, cols, coefs); row i is stored in start[i]:start[i+1]."""
+        return self._con_start, self._con_cols, self._con_coefs
+
+    def get_coo(self):
+        """Return the constraint matrix in COO format as arrays
+        (rows, cols, coefs)."""
+        rows = array("i")
+        start = self._con_start
+        for i in range(len(self._con_names)):
+            rows.extend([i]*(start[i+1]-start[i]))
+        return rows, self._con_cols, self._con_coefs
+
+    def get_csc(self):
+        """Return the constraint matrix in CSC format as arrays
+        (start, rows, coefs, pos); column j is stored in start[j]:start[j+1]
+        and pos[k] is the position of the k-th entry in the CSR arrays."""
+        cols = self._con_cols
+        pos = array("l", sorted(range(len(cols)), key=cols.__getitem__))
+        count = Counter(cols)
+        start = array("l", [0])
+        total = 0
+        for j in range(len(self._var_names)):
+            total += count.get(j, 0)
+            start.append(total)
+        rows = self.get_coo()[0]
+        rows = array("i", map(rows.__getitem__, pos))
+        coefs = array("d", map(self._con_coefs.__getitem__, pos))
+        return start, rows, coefs, pos
+
+    def get_rhs(self):
+        """Return the lists of signs ("<=", "=" or ">=") and right-hand
+        sides of the constraints."""
+        rhs_int = self._con_rhs_int
+        return (
+            [SIGNS[chr(s)] for s in self._con_sign],
+            [
+                _value(rhs, rhs_int[i])
+                for i, rhs in enumerate(self._con_rhs)
+            ]
+        )
 
     def write_lp(self, lp_file):
         """Write the model to a file in LP format."""
         write_lp(self, lp_file)
 
-    def write_mps(self, mps_file):
-        """Write the model to a file in MPS format."""
-        write_mps(self, mps_file)
+    def write_mps(self, mps_file, free=False):
+        """Write the model to a file in (free) MPS format."""
+        write_mps(self, mps_file, free=free)
 
     def write_mod(self, mod_file):
         """Write the model to a file in AMPL format."""
@@ -145,3 +457,77 @@ class Model(object):
             self.write_mod(model_file)
         else:
             raise Exception("Invalid file extension!")
+
+
+def _read_only(*args, **kwargs):
+    """Reject the modification of the views of a model."""
+    raise TypeError(
+        "Model.vars and Model.cons are read-only views; "
+        "use add_var/add_con to build the model"
+    )
+
+
+class _ReadOnlyDict(dict):
+    """Dictionary that cannot be modified."""
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+class _ReadOnlyList(list):
+    """List that cannot be modified."""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = reverse = sort = _read_only
+    __setslice__ = __delslice__ = _read_only  # Python 2
+
+
+class _VarsView(Mapping):
+    """Read-only view of the variables of a model by name."""
+
+    __setitem__ = __delitem__ = _read_only
+
+    def __init__(self, model):
+        self._model = model
+
+    def __getitem__(self, name):
+        name, lb, ub, vtype = self._model.var_info(
+            self._model._var_index[name]
+        )
+        return _ReadOnlyDict(lb=lb, ub=ub, vtype=vtype)
+
+    def __contains__(self, name):
+        return name in self._model._var_index
+
+    def __iter__(self):
+        return iter(self._model._var_names)
+
+    def __len__(self):
+        return len(self._model._var_names)
+
+
+class _ConsView(Mapping):
+    """Read-only view of the constraints of a model by name."""
+
+    __setitem__ = __delitem__ = _read_only
+
+    def __init__(self, model):
+        self._model = model
+
+    def __getitem__(self, name):
+        model = self._model
+        name, cols, coefs, sign, rhs = model.con_info(model._con_index[name])
+        names = model._var_names
+        lincomb = _ReadOnlyList(
+            (names[j], coef) for j, coef in zip(cols, coefs)
+        )
+        return (lincomb, sign, rhs)
+
+    def __contains__(self, name):
+        return name in self._model._con_index
+
+    def __iter__(self):
+        return iter(self._model._con_names)
+
+    def __len__(self):
+        return len(self._model._con_names)
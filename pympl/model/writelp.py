@@ -31,76 +31,145 @@ from __future__ import print_function
 # Bounds
 #  0 <= x1 <= 40
 #  2 <= x4 <= 3
+#  x5 free
 # General
 #  x4
 # End
 
+from builtins import zip
+from builtins import range
+from builtins import map
+from operator import add, getitem
+
 from ..utils import lincomb2str
 
+CHUNK_SIZE = 1 << 16
+
+
+def _format_coef(coef):
+    """Format a coefficient as lincomb2str(..., mult=" ") does."""
+    if abs(coef) != 1:
+        if coef >= 0:
+            return " +{0} ".format(repr(coef))
+        else:
+            return " -{0} ".format(repr(abs(coef)))
+    else:
+        return " +" if coef >= 0 else " -"
+
+
+class _CoefCache(dict):
+    """Cache of formatted coefficients (integers if isint is True)."""
+
+    def __init__(self, isint):
+        dict.__init__(self)
+        self.isint = isint
+
+    def __missing__(self, coef):
+        prefix = _format_coef(int(coef) if self.isint else coef)
+        if coef != 0:  # do not mix 0.0 with -0.0
+            self[coef] = prefix
+        return prefix
+
 
 def write_lp(model, filename):
     """Write a model to a file in LP format."""
     fout = open(filename, "w")
+    buf = []
 
     # Objective:
 
     if model.objdir == "min":
-        print("Minimize", file=fout)
+        buf.append("Minimize\n")
     else:
-        print("Maximize", file=fout)
+        buf.append("Maximize\n")
 
-    obj = model.obj
-    if obj == []:
-        obj = [(var, 0) for var in model.vars]
-    print("\tobjective:{0}".format(lincomb2str(obj, mult=" ")), file=fout)
+    names = [name.lstrip("^") for name in model.vars_list]  # PyMPL marker
+    if model.obj != []:
+        obj = lincomb2str(model.obj, mult=" ")
+    else:
+        obj = "".join(" +0 "+name for name in names)
+    buf.append("\tobjective:{0}\n".format(obj))
 
     # Constraints:
 
-    print("Subject To", file=fout)
-
-    for name in model.cons_list:
-        lincomb, sign, rhs = model.cons[name]
-        if sign in (">", "<"):
-            sign += "="
-        print(
-            "\t{0}:{1} {2} {3}".format(
-                name, lincomb2str(lincomb, mult=" "), sign, rhs
-            ), file=fout
-        )
+    buf.append("Subject To\n")
+
+    start, cols, coefs = model.get_csr()
+    lb_int, ub_int, coefs_int, _ = model.get_int_flags()
+    signs, rhs = model.get_rhs()
+    caches = (_CoefCache(False), _CoefCache(True))
+    con_names = model.cons_list
+    nrows = len(con_names)
+    i = 0
+    while i < nrows:
+        # format the terms of a block of rows at once
+        j = min(i + CHUNK_SIZE, nrows)
+        s, e = start[i], start[j]
+        flags = coefs_int[s:e]
+        nint = flags.count(1)
+        if nint == 0 or nint == len(flags):
+            prefixes = map(caches[nint != 0].__getitem__, coefs[s:e])
+        else:
+            # values flagged as integers are always integral
+            prefixes = map(
+                getitem, zip(
+                    map(caches[0].__getitem__, coefs[s:e]),
+                    map(caches[1].__getitem__, coefs[s:e])
+                ), flags
+            )
+        terms = list(map(add, prefixes, map(names.__getitem__, cols[s:e])))
+        fout.write("".join(buf))
+        buf = [
+            "\t{0}:{1} {2} {3}\n".format(
+                con_names[k], "".join(terms[start[k]-s:start[k+1]-s]),
+                signs[k], rhs[k]
+            )
+            for k in range(i, j)
+        ]
+        i = j
+    del signs, rhs
 
     # Bounds:
 
-    bounds = []
-    for name in model.vars_list:
-        lb = model.vars[name].get("lb", None)
-        ub = model.vars[name].get("ub", None)
-        if lb is not None or ub is not None:
-            bounds.append((name, lb, ub))
-
-    if bounds != []:
-        print("Bounds", file=fout)
-        for name, lb, ub in bounds:
-            if lb is not None and ub is not None:
-                print(
-                    "\t{0} <= {1} <= {2}".format(repr(lb), name, repr(ub)),
-                    file=fout
-                )
-            elif lb is not None:
-                print(
-                    "\t{0} <= {1}".format(repr(lb), name), file=fout
-                )
-            elif ub is not None:
-                print(
-                    "\t{0} <= {1}".format(name, repr(ub)), file=fout
-                )
-
-    # Integer variables:
-
-    print("General", file=fout)
-    for name in sorted(model.vars):
-        if model.vars[name]["vtype"] == "I":
-            print("\t{0}".format(name), file=fout)
-
-    print("End", file=fout)
-
+    inf = float("inf")
+    lbs, ubs = model.get_bounds()
+    header = "Bounds\n"
+    for name, lb, ub, lbi, ubi in zip(names, lbs, ubs, lb_int, ub_int):
+        # variables without bounds are free (the LP default is x >= 0)
+        if header is not None:
+            buf.append(header)
+            header = None
+        if lb != -inf:
+            lb = repr(int(lb) if lbi else lb)
+            if ub != inf:
+                ub = repr(int(ub) if ubi else ub)
+                buf.append("\t{0} <= {1} <= {2}\n".format(lb, name, ub))
+            else:
+                buf.append("\t{0} <= {1}\n".format(lb, name))
+        elif ub != inf:
+            ub = repr(int(ub) if ubi else ub)
+            buf.append("\t-inf <= {0} <= {1}\n".format(name, ub))
+        else:
+            buf.append("\t{0} free\n".format(name))
+        if len(buf) >= CHUNK_SIZE:
+            fout.write("".join(buf))
+            del buf[:]
+
+    # Integer and binary variables:
+
+    general, binary = [], []
+    for name, vtype in zip(names, model.get_vtypes()):
+        if vtype == "I":
+            general.append(name)
+        elif vtype == "B":
+            binary.append(name)
+
+    buf.append("General\n")
+    buf.extend("\t{0}\n".format(name) for name in sorted(general))
+    if binary != []:
+        buf.append("Binary\n")
+        buf.extend("\t{0}\n".format(name) for name in sorted(binary))
+
+    buf.append("End\n")
+    fout.write("".join(buf))
     fout.close()
@@ -19,6 +19,8 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 from __future__ import print_function
+from builtins import zip
+from builtins import range
 
 # AMPL format example:
 #
@@ -37,10 +39,8 @@ def write_mod(model, filename):
 
     # Variables:
 
-    for var in model.vars:
-        typ = model.vars[var]["vtype"]
-        lb = model.vars[var]["lb"]
-        ub = model.vars[var]["ub"]
+    for i in range(model.num_vars()):
+        var, lb, ub, typ = model.var_info(i)
         print(ampl_var(name=var, typ=typ, lb=lb, ub=ub), file=fout)
 
     # Objective:
@@ -57,8 +57,10 @@ def write_mod(model, filename):
 
     # Constraints:
 
-    for name in model.cons_list:
-        lincomb, sign, rhs = model.cons[name]
+    names = model.vars_list
+    for i in range(model.num_cons()):
+        name, cols, coefs, sign, rhs = model.con_info(i)
+        lincomb = [(names[j], coef) for j, coef in zip(cols, coefs)]
         print(ampl_con(name, lincomb, sign, rhs), file=fout)
 
     print("end;", file=fout)
@@ -76,28 +78,28 @@ def model2ampl(model, declared_vars=None):
     else:
         declared_vars = set()
 
-    def format_var(name):
-        typ = model.vars[name]["vtype"]
-        lb = model.vars[name]["lb"]
-        ub = model.vars[name]["ub"]
+    def format_var(i):
+        name, lb, ub, typ = model.var_info(i)
         return ampl_var(name=name, typ=typ, lb=lb, ub=ub)
 
     res += "".join(
-        format_var(name)
-        for name in model.vars
+        format_var(i)
+        for i, name in enumerate(model.vars_list)
         if name not in declared_vars
     )
 
     # Constraints:
 
-    def format_con(name):
-        lincomb, sign, rhs = model.cons[name]
-        lincomb = [(var, coef) for (var, coef) in lincomb]
+    names = model.vars_list
+
+    def format_con(i):
+        name, cols, coefs, sign, rhs = model.con_info(i)
+        lincomb = [(names[j], coef) for j, coef in zip(cols, coefs)]
         return ampl_con(name, lincomb, sign, rhs)
 
     res += "".join(
-        format_con(name)
-        for name in model.cons_list
+        format_con(i)
+        for i in range(model.num_cons())
     )
 
     return res
@@ -20,6 +20,9 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 from __future__ import print_function
 from builtins import str
+from builtins import zip
+from builtins import map
+from operator import add, getitem
 
 # MPS format
 #
@@ -30,6 +33,8 @@ from builtins import str
 
 FIELD_START = [None, 1, 4, 14, 24, 39, 49]
 FIELD_SIZE = [None, 2, 8, 8, 12, 8, 12]
+ROW_TYPES = {"<=": "L", "=": "E", ">=": "G"}
+CHUNK_SIZE = 1 << 16
 
 
 def mps_row(lst):
@@ -45,8 +50,11 @@ def mps_row(lst):
     return line
 
 
-def write_mps(model, filename):
+def write_mps(model, filename, free=False):
     """Write a model to a file in MPS format."""
+    if free:
+        write_free_mps(model, filename)
+        return
     fout = open(filename, "w")
     print("NAME          MODEL", file=fout)
 
@@ -75,11 +83,12 @@ def write_mps(model, filename):
         for var, coef in lincomb:
             columns[var].append((cname, coef))
 
-    Ivars = [v for v in model.vars_list if model.vars[v]["vtype"] == "I"]
-    Cvars = [v for v in model.vars_list if model.vars[v]["vtype"] != "I"]
+    vtypes = dict(zip(model.vars_list, model.get_vtypes()))
+    Ivars = [v for v in model.vars_list if vtypes[v] in ("I", "B")]
+    Cvars = [v for v in model.vars_list if vtypes[v] == "C"]
 
+    print("COLUMNS", file=fout)
     if len(Ivars) != 0:
-        print("COLUMNS", file=fout)
         print(
             mps_row([(2, "MARKER"), (3, "\'MARKER\'"), (5, "\'INTORG\'")]),
             file=fout
@@ -118,6 +127,10 @@ def write_mps(model, filename):
                 mps_row([(1, "LO"), (2, "BND1"), (3, vname), (4, lb)]),
                 file=fout
             )
+        elif ub is None:
+            print(mps_row([(1, "FR"), (2, "BND1"), (3, vname)]), file=fout)
+        else:
+            print(mps_row([(1, "MI"), (2, "BND1"), (3, vname)]), file=fout)
 
         if ub is not None:
             print(
@@ -128,3 +141,138 @@ def write_mps(model, filename):
     print("ENDATA", file=fout)
 
     fout.close()
+
+
+class _ValueCache(dict):
+    """Cache of formatted values (integers if isint is True)."""
+
+    def __init__(self, isint):
+        dict.__init__(self)
+        self.isint = isint
+
+    def __missing__(self, value):
+        text = str(int(value) if self.isint else value) + "\n"
+        if value != 0:  # do not mix 0.0 with -0.0
+            self[value] = text
+        return text
+
+
+def _format_values(values, flags):
+    """Format the values of an array ("value\\n") given the flags that mark
+    the ones that were given as integers."""
+    caches = (_ValueCache(False), _ValueCache(True))
+    nint = flags.count(1)
+    if nint == 0 or nint == len(flags):
+        return list(map(caches[nint != 0].__getitem__, values))
+    # values flagged as integers are always integral
+    return list(map(
+        getitem, zip(
+            map(caches[0].__getitem__, values),
+            map(caches[1].__getitem__, values)
+        ), flags
+    ))
+
+
+def write_free_mps(model, filename):
+    """Write a model to a file in free MPS format (names of any length)."""
+    var_names = model.vars_list
+    con_names = model.cons_list
+    for name in var_names + con_names:
+        assert name != "" and len(name.split()) == 1, \
+            "Invalid name for free MPS format: '{0}'".format(name)
+
+    fout = open(filename, "w")
+    buf = ["NAME MODEL\n"]
+
+    def flush():
+        fout.write("".join(buf))
+        del buf[:]
+
+    # Constraints:
+
+    signs, rhs = model.get_rhs()
+    buf.append("ROWS\n")
+    buf.append(" N OBJ\n")
+    buf.extend(
+        " {0} {1}\n".format(ROW_TYPES[sign], name)
+        for name, sign in zip(con_names, signs)
+    )
+    flush()
+
+    # A-matrix (column by column):
+
+    start, rows, coefs, pos = model.get_csc()
+    del coefs
+    values = _format_values(model.get_csr()[2], model.get_int_flags()[2])
+    values = list(map(values.__getitem__, pos))
+    del pos
+    row_names = [name + " " for name in con_names]
+    index = {name: j for j, name in enumerate(var_names)}
+    obj = {index[var]: coef for var, coef in model.obj}
+    vtypes = model.get_vtypes()
+
+    def write_columns(columns):
+        for j in columns:
+            name = var_names[j]
+            s, e = start[j], start[j+1]
+            if j in obj:
+                buf.append(" {0} OBJ {1}\n".format(name, str(obj[j])))
+            elif s == e:
+                # keep empty columns so that bounds can refer to them
+                buf.append(" {0} OBJ 0\n".format(name))
+            if s == e:
+                continue
+            prefix = " " + name + " "
+            buf.append(prefix + prefix.join(
+                map(add, map(row_names.__getitem__, rows[s:e]), values[s:e])
+            ))
+            if len(buf) >= CHUNK_SIZE:
+                flush()
+
+    buf.append("COLUMNS\n")
+    Ivars = [j for j, vtype in enumerate(vtypes) if vtype in ("I", "B")]
+    if Ivars != []:
+        buf.append(" MARKER 'MARKER' 'INTORG'\n")
+        write_columns(Ivars)
+        buf.append(" MARKER 'MARKER' 'INTEND'\n")
+    write_columns(j for j, vtype in enumerate(vtypes) if vtype == "C")
+    del values[:]  # free the column values (the closure still refers to it)
+
+    # Right-hand-side vector:
+
+    buf.append("RHS\n")
+    buf.extend(
+        " RHS1 {0} {1}\n".format(name, str(value))
+        for name, value in zip(con_names, rhs)
+    )
+    flush()
+
+    # Bounds:
+
+    inf = float("inf")
+    lbs, ubs = model.get_bounds()
+    lb_int, ub_int = model.get_int_flags()[:2]
+    buf.append("BOUNDS\n")
+    for j, name in enumerate(var_names):
+        lb, ub = lbs[j], ubs[j]
+        if lb == -inf and ub == inf:
+            buf.append(" FR BND1 {0}\n".format(name))
+        else:
+            if lb != -inf:
+                lb = int(lb) if lb_int[j] else lb
+                buf.append(" LO BND1 {0} {1}\n".format(name, str(lb)))
+            else:
+                buf.append(" MI BND1 {0}\n".format(name))
+            if ub != inf:
+                ub = int(ub) if ub_int[j] else ub
+                buf.append(" UP BND1 {0} {1}\n".format(name, str(ub)))
+            elif vtypes[j] != "C":
+                # some readers default to 1 for integer columns without
+                # an upper bound
+                buf.append(" PL BND1 {0}\n".format(name))
+        if len(buf) >= CHUNK_SIZE:
+            flush()
+
+    buf.append("ENDATA\n")
+    flush()
+    fout.close()
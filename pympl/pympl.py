@@ -24,19 +24,13 @@ from builtins import object
 
 import re
 import sys
+import shutil
+import tempfile
+from bisect import bisect_right
+from .utils import compile_regex, LineIndex, LRUCache
+from .utils import instrument
+from . import cmds
 from .cmds import SubmodBase
-from .cmds import CmdSet, CmdParam, CmdVar, CmdCon, CmdStmt
-from .cmds import SubmodVBPFlow, CmdVBPGraph, SubmodMVPFlow, CmdMVPGraph
-from .cmds import SubmodATSPMTZ, SubmodATSPSCF, SubmodATSPMCF
-from .cmds import SubmodSOS1, SubmodSOS2, SubmodPWL
-from .cmds import SubmodWWU, SubmodWWUB
-from .cmds import SubmodWWUSC, SubmodWWUSCB, SubmodWWULB
-from .cmds import SubmodWWCC, SubmodWWCCB
-from .cmds import SubmodLSU, SubmodLSU1, SubmodLSU2
-from .cmds import SubmodLSUB, SubmodLSUSC, SubmodLSUSCB
-from .cmds import SubmodDLSICC, SubmodDLSICCB
-from .cmds import SubmodDLSCCB, SubmodDLSCCSC
-from .cmds import SubmodWWU_AMPL, SubmodWWUB_AMPL
 
 
 class PyMPL(object):
@@ -58,41 +52,43 @@ class PyMPL(object):
     )
 
     EXEC_CMD = "EXEC"
+    CODE_CACHE = LRUCache(maxsize=4096)
+    # command classes (or their names in pympl.cmds, imported on first use)
     DEFAULT_CMDS = {
-        "SET": CmdSet,
-        "PARAM": CmdParam,
-        "VAR": CmdVar,
-        "CON": CmdCon,
-        "STMT": CmdStmt,
-        "ATSP_MTZ": SubmodATSPMTZ,
-        "ATSP_SCF": SubmodATSPSCF,
-        "ATSP_MCF": SubmodATSPMCF,
-        "VBP_FLOW": SubmodVBPFlow,
-        "VBP_GRAPH": CmdVBPGraph,
-        "MVP_FLOW": SubmodMVPFlow,
-        "MVP_GRAPH": CmdMVPGraph,
-        "SOS1": SubmodSOS1,
-        "SOS2": SubmodSOS2,
-        "PWL": SubmodPWL,
-        "WW_U": SubmodWWU,
-        "WW_U_AMPL": SubmodWWU_AMPL,
-        "WW_U_B": SubmodWWUB,
-        "WW_U_B_AMPL": SubmodWWUB_AMPL,
-        "WW_U_SC": SubmodWWUSC,
-        "WW_U_SCB": SubmodWWUSCB,
-        "WW_U_LB": SubmodWWULB,
-        "WW_CC": SubmodWWCC,
-        "WW_CC_B": SubmodWWCCB,
-        "LS_U": SubmodLSU,
-        "LS_U1": SubmodLSU1,
-        "LS_U2": SubmodLSU2,
-        "LS_U_B": SubmodLSUB,
-        "LS_U_SC": SubmodLSUSC,
-        "LS_U_SCB": SubmodLSUSCB,
-        "DLSI_CC": SubmodDLSICC,
-        "DLSI_CC_B": SubmodDLSICCB,
-        "DLS_CC_B": SubmodDLSCCB,
-        "DLS_CC_SC": SubmodDLSCCSC,
+        "SET": "CmdSet",
+        "PARAM": "CmdParam",
+        "VAR": "CmdVar",
+        "CON": "CmdCon",
+        "STMT": "CmdStmt",
+        "ATSP_MTZ": "SubmodATSPMTZ",
+        "ATSP_SCF": "SubmodATSPSCF",
+        "ATSP_MCF": "SubmodATSPMCF",
+        "VBP_FLOW": "SubmodVBPFlow",
+        "VBP_GRAPH": "CmdVBPGraph",
+        "MVP_FLOW": "SubmodMVPFlow",
+        "MVP_GRAPH": "CmdMVPGraph",
+        "SOS1": "SubmodSOS1",
+        "SOS2": "SubmodSOS2",
+        "PWL": "SubmodPWL",
+        "WW_U": "SubmodWWU",
+        "WW_U_AMPL": "SubmodWWU_AMPL",
+        "WW_U_B": "SubmodWWUB",
+        "WW_U_B_AMPL": "SubmodWWUB_AMPL",
+        "WW_U_SC": "SubmodWWUSC",
+        "WW_U_SCB": "SubmodWWUSCB",
+        "WW_U_LB": "SubmodWWULB",
+        "WW_CC": "SubmodWWCC",
+        "WW_CC_B": "SubmodWWCCB",
+        "LS_U": "SubmodLSU",
+        "LS_U1": "SubmodLSU1",
+        "LS_U2": "SubmodLSU2",
+        "LS_U_B": "SubmodLSUB",
+        "LS_U_SC": "SubmodLSUSC",
+        "LS_U_SCB": "SubmodLSUSCB",
+        "DLSI_CC": "SubmodDLSICC",
+        "DLSI_CC_B": "SubmodDLSICCB",
+        "DLS_CC_B": "SubmodDLSCCB",
+        "DLS_CC_SC": "SubmodDLSCCSC",
     }
 
     def __init__(self, locals_=None, globals_=None):
@@ -123,78 +119,195 @@ class PyMPL(object):
 
         self.input = ""
         self.output = ""
+        self._source_map = []
+        self._profile = None
 
     def add_cmd(self, cmd, cmdcls):
-        """Add a new command to the parser."""
-        prefix = "_{}{}".format(cmd.lower(), len(self._locals))
-        self._locals[cmd] = cmdcls(
-            cmd, prefix, self._locals, self._sets, self._params
-        )
+        """Add a new command to the parser.
+
+        cmdcls can also be the name of a class in pympl.cmds; the command
+        is then only created when it is first used.
+        """
+        # numbered by registration order, so that the names generated by
+        # a command do not depend on the variables in locals_/globals_
+        prefix = "_{}{}".format(cmd.lower(), len(self._cmds))
+        if not isinstance(cmdcls, type):
+            self._locals[cmd] = _LazyCmd(self, cmd, cmdcls, prefix)
+        else:
+            self._locals[cmd] = cmdcls(
+                cmd, prefix, self._locals, self._sets, self._params
+            )
         self._cmds.append(cmd)
 
+    def _command(self, cmd):
+        """Return the object of a command (creating it if needed)."""
+        obj = self._locals[cmd]
+        if isinstance(obj, _LazyCmd) and obj._parser is self:
+            cmdcls = getattr(cmds, obj._cmdcls)
+            obj = self._locals[cmd] = cmdcls(
+                cmd, obj._prefix, self._locals, self._sets, self._params
+            )
+        return obj
+
     def translate(
-            self, inputstr, comment_cmds=False, inline_data=True, **kwargs):
-        """Parse and translate PyMPL string to AMPL/GMPL string."""
+            self, inputstr, comment_cmds=False, inline_data=True,
+            profile=False, **kwargs):
+        """Parse and translate PyMPL string to AMPL/GMPL string.
+
+        inputstr can also be a TranslationPlan returned by PyMPL.compile.
+        With profile=True, the commands are evaluated under cProfile (see
+        PyMPL.translation_profile).
+        """
         if 'locals_' in kwargs:
             self.set_locals(kwargs['locals_'])
         if 'globals_' in kwargs:
             self.set_globals(kwargs['globals_'])
-        output = inputstr
-        output_data = ""
-        rgx = re.compile(PyMPL.t_CMD, re.DOTALL)
+        if isinstance(inputstr, TranslationPlan):
+            plan = inputstr
+        else:
+            plan = self.compile(inputstr)
+        self._profile = self._new_profile(profile)
+        output = []
+        output_data = []
+        outlen = 0
+        source_map = []
+        with instrument.stage("translate"):
+            for res, data, cmd in self._render(
+                    plan, comment_cmds, inline_data, self._profile):
+                if cmd is not None:
+                    line, col, label = cmd
+                    source_map.append(
+                        (outlen, outlen+len(res), line, col, label)
+                    )
+                output.append(res)
+                outlen += len(res)
+                if data:
+                    output_data.append(data)
+
+        output = "".join(output)
+        output_data = "".join(output_data)
+        if output_data != "":
+            start, end, data = self._data_splice(output, output_data)
+            output = output[:start] + data + output[end:]
+            shift = len(data)-(end-start)
+            source_map = [
+                (a+shift, b+shift, line, col, cmd) if a >= end
+                else (a, b, line, col, cmd)
+                for (a, b, line, col, cmd) in source_map
+            ]
+        self._source_map = source_map
+        if kwargs.get('debug', False):
+            print('\n\n>>\n{}\n<<\n\n'.format(output))
+        return output
+
+    @classmethod
+    def compile(cls, inputstr):
+        """Parse a PyMPL string and return a reusable TranslationPlan."""
+        lines = LineIndex(inputstr)
+        parts = []
+        last = 0
+        rgx = compile_regex(cls.t_CMD, re.DOTALL)
         for match in rgx.finditer(inputstr):
             comment, call, args1, args2, args3 = match.groups()
-            assert call in self._cmds
+            if comment is not None and not comment.startswith("/*"):
+                continue  # strings and '#' comments are copied verbatim
+
             strmatch = inputstr[match.start():match.end()]
             clean_strmatch = strmatch.strip("/*#$; ")
+            line, col = lines.position(match.start())
+            if comment is not None:
+                cmd = (None, None, None, None)
+            elif call is None:
+                cmd = (call, args1, args3, "eval")
+            elif call == cls.EXEC_CMD:
+                cmd = (call, args1, args2, "exec")
+            else:
+                if args1 is not None:
+                    args = "'''{0}'''".format(args1[1:-1])
+                else:
+                    args = None
+                cmd = (
+                    call, args1,
+                    "{0}[{1}]({2})".format(call, args, args2), "exec"
+                )
+
+            parts.append(inputstr[last:match.start()])
+            parts.append(
+                cmd + (strmatch, clean_strmatch, match.groups(), line, col)
+            )
+            last = match.end()
+
+        parts.append(inputstr[last:])
+        return TranslationPlan(cls, inputstr, parts)
+
+    @classmethod
+    def compile_file(cls, mod_in):
+        """Read a PyMPL file and return a reusable TranslationPlan."""
+        with open(mod_in, "r") as fin:
+            return cls.compile(fin.read())
+
+    def _render(self, plan, comment_cmds, inline_data, profile=None):
+        """Evaluate a plan; yields (text, data, (line, col, label) or None)."""
+        for part in plan.parts:
+            if not isinstance(part, tuple):
+                yield part, None, None
+                continue
+
+            call, args1, source, mode = part[:4]
+            strmatch, clean_strmatch, groups, line, col = part[4:]
+            assert call in self._cmds
 
             if PyMPL.DEBUG:
-                print(
-                    "\n---\n{0}\n{1}\n---\n".format(strmatch, match.groups())
-                )
+                print("\n---\nline {0:d} col {1:d}:\n{2}\n{3}\n---\n".format(
+                    line, col, strmatch, groups
+                ))
 
-            if comment is not None:
-                if comment_cmds and comment.startswith("/*"):
-                    output = output.replace(
-                        strmatch, "/*IGNORED:{0}*/".format(clean_strmatch)
-                    )
+            if mode is None:
+                if comment_cmds:
+                    yield "/*IGNORED:{0}*/".format(clean_strmatch), None, None
+                else:
+                    yield strmatch, None, None
                 continue
 
+            data = None
+            label = self._cmd_label(call, args1)
+            stats = None
             try:
                 self._locals["_model"] = ""
                 self._locals["_defs"] = ""
                 self._locals["_data"] = ""
-                if call is None:
-                    res = str(eval(args3, self._locals))
-                elif call == PyMPL.EXEC_CMD:
-                    assert args1 is None
-                    exec(args2, self._locals)
-                    res = str(self._locals["_model"])
-                else:
-                    if call in self._locals:
-                        if issubclass(type(self._locals[call]), SubmodBase):
+                if mode == "exec":
+                    if call == PyMPL.EXEC_CMD:
+                        assert args1 is None
+                    elif call in self._locals:
+                        if isinstance(self._command(call), SubmodBase):
                             self._submodels.add(call)
-                    if args1 is not None:
-                        args1 = "'''{0}'''".format(args1[1:-1])
-                    exec(
-                        "{0}[{1}]({2})".format(call, args1, args2),
-                        self._locals
+                code = self._compile(source, mode)
+                with instrument.stage(label, line=line, col=col):
+                    if profile is not None:
+                        stats = profile.begin(label, line, col)
+                    try:
+                        if mode == "eval":
+                            res = str(eval(code, self._locals))
+                        else:
+                            exec(code, self._locals)
+                            res = str(self._locals["_model"])
+                    finally:
+                        if stats is not None:
+                            profile.end(stats)
+                if stats is not None:
+                    stats.add_output(
+                        res, self._locals["_defs"], self._locals["_data"]
                     )
-                    res = str(self._locals["_model"])
 
                 res = self._locals["_defs"]+res
                 if inline_data is True and self._locals["_data"] != "":
                     res += ';data;' + self._locals["_data"] + 'model;'
                 else:
-                    output_data += self._locals["_data"]
+                    data = self._locals["_data"]
             except Exception as e:
-                msg = "Exception occurred while evaluating {0}".format(
-                    "$"+call+("[...]" if args1 is not None else "")+"{...}"
-                )
-                msg += " at line {0:d} col {1:d}".format(
-                    inputstr[:match.start()].count("\n")+1,
-                    match.start()-inputstr[:match.start()].rfind("\n"),
-                )
+                msg = "Exception occurred while evaluating {0}".format(label)
+                msg += " at line {0:d} col {1:d}".format(line, col)
                 e.args += (msg,)
                 raise
 
@@ -203,39 +316,120 @@ class PyMPL(object):
                     clean_strmatch, res
                 )
 
-            output = output.replace(strmatch, res, 1)
+            yield res, data, (line, col, label)
 
-        output = self._add_data(output, output_data)
-        if kwargs.get('debug', False):
-            print('\n\n>>\n{}\n<<\n\n'.format(output))
-        return output
+    @staticmethod
+    def _new_profile(profile):
+        """Return a TranslationProfile if profile is True."""
+        if not profile:
+            return None
+        from .utils.profiling import TranslationProfile
+        return TranslationProfile()
+
+    def translate_stream(self, inputstr, fout, comment_cmds=False,
+                         inline_data=True, profile=False, **kwargs):
+        """Translate a PyMPL string writing the output to fout as it is
+        produced (same output as translate, but not kept in memory).
 
-    def parse(self, mod_in=None, mod_out=None, comment_cmds=True):
-        """Parse the input file."""
+        Data sections are spilled to a temporary file and copied to the
+        position of the data;/end; statement at the end.
+        """
+        if 'locals_' in kwargs:
+            self.set_locals(kwargs['locals_'])
+        if 'globals_' in kwargs:
+            self.set_globals(kwargs['globals_'])
+        if isinstance(inputstr, TranslationPlan):
+            plan = inputstr
+        else:
+            plan = self.compile(inputstr)
+        self._profile = self._new_profile(profile)
+        stream = _SplicedOutput(fout)
+        try:
+            with instrument.stage("translate"):
+                for res, data, cmd in self._render(
+                        plan, comment_cmds, inline_data, self._profile):
+                    stream.write(res)
+                    if data:
+                        stream.write_data(data)
+                stream.close()
+        finally:
+            stream.discard()
+        self._source_map = []
+
+    def parse(self, mod_in=None, mod_out=None, comment_cmds=True,
+              stream=False, profile=False):
+        """Parse the input file.
+
+        With stream=True, the output is written directly to mod_out
+        instead of being stored in self.output (which is set to None).
+        """
         if mod_in is not None:
             self.read(mod_in)
+        if stream:
+            assert mod_out is not None
+            with open(mod_out, "w") as fout:
+                self.translate_stream(
+                    self.input, fout, comment_cmds, inline_data=False,
+                    profile=profile
+                )
+                fout.write("\n")
+            self.output = None
+            return
         self.output = self.translate(
-            self.input, comment_cmds, inline_data=False
+            self.input, comment_cmds, inline_data=False, profile=profile
         )
         if mod_out is not None:
             self.write(mod_out)
 
+    @staticmethod
+    def _compile(source, mode):
+        """Compile the body of a command (code objects are cached)."""
+        code = PyMPL.CODE_CACHE.get((source, mode))
+        if code is None:
+            if mode == "eval":
+                # like eval(source), ignore leading spaces and tabs
+                code = compile(source.lstrip(" \t"), "<pympl>", mode)
+            else:
+                code = compile(source, "<pympl>", mode)
+            PyMPL.CODE_CACHE.put((source, mode), code)
+        return code
+
+    @staticmethod
+    def set_code_cache_size(maxsize):
+        """Set the maximum number of compiled commands kept in the cache."""
+        PyMPL.CODE_CACHE.resize(maxsize)
+
+    @staticmethod
+    def code_cache_info():
+        """Return the hit/miss statistics of the compiled-code cache."""
+        return PyMPL.CODE_CACHE.info()
+
+    @staticmethod
+    def _cmd_label(call, args1):
+        """Return a short label identifying a command call."""
+        if call is None:
+            return "${...}$"
+        return "$"+call+("[...]" if args1 is not None else "")+"{...}"
+
+    @staticmethod
+    def _data_splice(output, data):
+        """Return (start, end, text) such that text replaces output[start:end]
+        in order to add the data section to the model."""
+        data_stmt = compile_regex("data\\s*;", re.DOTALL).search(output)
+        if data_stmt is not None:
+            return data_stmt.end(), data_stmt.end(), "\n"+data
+        end_stmt = compile_regex("end\\s*;", re.DOTALL).search(output)
+        if end_stmt is not None:
+            return (
+                end_stmt.start(), end_stmt.end(), "data;\n" + data + "\nend;"
+            )
+        return len(output), len(output), "data;\n" + data + "\nend;"
+
     def _add_data(self, output, data):
         """Add data to the model."""
         if data != "":
-            data_stmt = re.search("data\\s*;", output, re.DOTALL)
-            end_stmt = re.search("end\\s*;", output, re.DOTALL)
-            if data_stmt is not None:
-                match = data_stmt.group(0)
-                output = output.replace(match, match+"\n"+data)
-            else:
-                if end_stmt is None:
-                    output += "data;\n" + data + "\nend;"
-                else:
-                    match = end_stmt.group(0)
-                    output = output.replace(
-                        match, "data;\n" + data + "\nend;"
-                    )
+            start, end, data = self._data_splice(output, data)
+            output = output[:start] + data + output[end:]
         return output
 
     def read(self, mod_in):
@@ -252,6 +446,29 @@ class PyMPL(object):
         """Return the names of submodels used."""
         return self._submodels
 
+    def source_map(self):
+        """Return the source map of the last translation.
+
+        List of (start, end, line, col, cmd) tuples, sorted by start, where
+        output[start:end] was produced by the command cmd that appears at
+        the given line and column of the input.
+        """
+        return list(self._source_map)
+
+    def translation_profile(self):
+        """Return the TranslationProfile of the last translation (None if
+        it was not profiled)."""
+        return self._profile
+
+    def source_position(self, offset):
+        """Return the (line, col, cmd) that produced output[offset]."""
+        i = bisect_right(self._source_map, (offset, float("inf"))) - 1
+        if i >= 0:
+            start, end, line, col, cmd = self._source_map[i]
+            if start <= offset < end:
+                return line, col, cmd
+        return None
+
     def set_locals(self, locals_):
         """Update local variables."""
         for var in locals_:
@@ -265,8 +482,159 @@ class PyMPL(object):
 
     def __getitem__(self, varname):
         """Get an internal variable."""
+        if varname in self._cmds:
+            return self._command(varname)
         return self._locals[varname]
 
     def __setitem__(self, varname, value):
         """Set an internal variable."""
         self._locals[varname] = value
+
+
+class _LazyCmd(object):
+    """Placeholder for a command that is created when it is first used."""
+
+    def __init__(self, parser, cmd, cmdcls, prefix):
+        self._parser = parser
+        self._cmd = cmd
+        self._cmdcls = cmdcls
+        self._prefix = prefix
+
+    def __getitem__(self, arg1):
+        return self._parser._command(self._cmd)[arg1]
+
+    def __call__(self, *args, **kwargs):
+        return self._parser._command(self._cmd)(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._parser._command(self._cmd), name)
+
+
+class TranslationPlan(object):
+    """PyMPL template parsed by PyMPL.compile and ready to be rendered."""
+
+    def __init__(self, parser_cls, inputstr, parts):
+        self.parser_cls = parser_cls
+        self.input = inputstr
+        self.parts = parts
+
+    def render(self, locals_=None, globals_=None, comment_cmds=False,
+               inline_data=True, parser=None, **kwargs):
+        """Translate the template using new local variables.
+
+        Each call uses a new parser unless an existing one is provided.
+        """
+        if parser is None:
+            parser = self.parser_cls(locals_=locals_, globals_=globals_)
+        else:
+            if locals_ is not None:
+                parser.set_locals(locals_)
+            if globals_ is not None:
+                parser.set_globals(globals_)
+        return parser.translate(self, comment_cmds, inline_data, **kwargs)
+
+    def commands(self):
+        """Return the (line, col, label) of the commands in the template."""
+        return [
+            (part[-2], part[-1], PyMPL._cmd_label(part[0], part[1]))
+            for part in self.parts
+            if isinstance(part, tuple) and part[3] is not None
+        ]
+
+
+class _SplicedOutput(object):
+    """Output stream that adds the data section at the first data;
+    statement (or, if there is none, at the first end; statement or at
+    the end of the output), as PyMPL._data_splice, without keeping the
+    whole output in memory."""
+
+    DATA_STMT = "data\\s*;"
+    END_STMT = "end\\s*;"
+    PARTIAL_STMT = r"(?:d(?:a(?:t(?:a\s*)?)?)?|e(?:n(?:d\s*)?)?)\Z"
+
+    def __init__(self, fout):
+        self._fout = fout
+        self._pending = ""
+        self._state = None  # None, "end" or "data"
+        self._end_len = 0
+        self._after = None
+        self._data = None
+
+    def write(self, text):
+        """Write a piece of the model."""
+        if self._state == "data":
+            self._after.write(text)
+            return
+        pending = self._pending + text
+        data_stmt = compile_regex(self.DATA_STMT).search(pending)
+        if data_stmt is not None:
+            self._output(pending[:data_stmt.end()])
+            self._state = "data"
+            self._new_after().write(pending[data_stmt.end():])
+            self._pending = ""
+            return
+        if self._state is None:
+            end_stmt = compile_regex(self.END_STMT).search(pending)
+            if end_stmt is not None:
+                self._output(pending[:end_stmt.start()])
+                self._state = "end"
+                self._end_len = end_stmt.end()-end_stmt.start()
+                self._new_after()
+                pending = pending[end_stmt.start():]
+        partial = compile_regex(self.PARTIAL_STMT).search(pending)
+        cut = partial.start() if partial is not None else len(pending)
+        self._output(pending[:cut])
+        self._pending = pending[cut:]
+
+    def write_data(self, data):
+        """Write a piece of the data section."""
+        if self._data is None:
+            self._data = tempfile.TemporaryFile(mode="w+")
+        self._data.write(data)
+
+    def close(self):
+        """Write the data section and the rest of the model."""
+        pending, self._pending = self._pending, ""
+        self._output(pending)
+        if self._data is None:
+            if self._after is not None:
+                self._copy(self._after)
+            return
+        if self._state == "data":
+            self._fout.write("\n")
+            self._copy(self._data)
+            self._copy(self._after)
+        else:
+            self._fout.write("data;\n")
+            self._copy(self._data)
+            self._fout.write("\nend;")
+            if self._state == "end":
+                self._after.seek(0)
+                self._after.read(self._end_len)
+                shutil.copyfileobj(self._after, self._fout)
+
+    def discard(self):
+        """Delete the temporary files."""
+        for f in (self._after, self._data):
+            if f is not None:
+                f.close()
+        self._after = self._data = None
+
+    def _output(self, text):
+        if self._state == "end":
+            self._after.write(text)
+        else:
+            self._fout.write(text)
+
+    def _new_after(self):
+        if self._after is not None:
+            self._copy(self._after)
+            self._after.close()
+        self._after = tempfile.TemporaryFile(mode="w+")
+        return self._after
+
+    def _copy(self, f):
+        f.seek(0)
+        shutil.copyfileobj(f, self._fout)
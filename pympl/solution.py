@@ -0,0 +1,207 @@
+"""
+This code is part of the Mathematical Programming Toolbox PyMPL.
+
+Copyright (C) 2015-2016, Filipe Brandao
+Faculdade de Ciencias, Universidade do Porto
+Porto, Portugal. All rights reserved. E-mail: <fdabrandao@dcc.fc.up.pt>.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from builtins import map
+from builtins import zip
+from builtins import range
+
+from array import array
+from xml.sax.saxutils import escape
+from bisect import bisect_left
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+
+def get_values(get_var_value, names):
+    """Return the list of values of names given a Solution or a function
+    (e.g., the get_var_value argument of extract and separate)."""
+    if isinstance(get_var_value, Solution):
+        return get_var_value.lookup(names)
+    return list(map(get_var_value, names))
+
+
+def _number(value):
+    """Return an integral float as an int."""
+    return int(value) if value.is_integer() else value
+
+
+class Solution(MutableMapping):
+    """Variable values returned by solvers.
+
+    The names are stored in a list and the values in an array("d"), so
+    solutions with millions of variables can be read and queried in
+    bulk. As a mapping, a solution behaves like a dictionary with the
+    non-zero variables, where integral values are ints (assigning a
+    variable updates the arrays; deleting it sets its value to 0).
+    """
+
+    def __init__(self, names, values):
+        self.names = list(names)
+        self.values = array("d", values)
+        assert len(self.names) == len(self.values)
+        self._index = None
+        self._list = None
+        self._dict = None
+        self._sorted = None
+
+    @classmethod
+    def read(cls, sol_file):
+        """Read a solution file with "name value" pairs."""
+        with open(sol_file) as f:
+            sol = f.read().split()
+        assert len(sol) % 2 == 0
+        return cls(sol[0::2], map(float, sol[1::2]))
+
+    @classmethod
+    def from_dict(cls, values):
+        """Create a solution from a name -> value dictionary."""
+        return cls(list(values), (float(v) for v in values.values()))
+
+    def write(self, fname, fmt="sol"):
+        """Write the solution to a file (e.g., as a MIP start).
+
+        Formats: "sol" ("name value" lines; SCIP .sol and Gurobi .mst
+        files), "cbc" (CBC solution files) and "mst" (CPLEX MST files).
+        """
+        pairs = list(zip(self.names, self.as_list()))
+        with open(fname, "w") as f:
+            if fmt == "sol":
+                for name, value in pairs:
+                    f.write("{0} {1}\n".format(name, value))
+            elif fmt == "cbc":
+                f.write("Stopped on iterations - objective value 0\n")
+                for i, (name, value) in enumerate(pairs):
+                    f.write("{0} {1} {2} 0\n".format(i, name, value))
+            elif fmt == "mst":
+                f.write(
+                    '<?xml version="1.0" encoding="UTF-8" '
+                    'standalone="yes"?>\n'
+                    '<CPLEXSolutions version="1.2">\n'
+                    ' <CPLEXSolution version="1.2">\n'
+                    '  <header solutionName="start"/>\n'
+                    '  <variables>\n'
+                )
+                for name, value in pairs:
+                    f.write('   <variable name="{0}" value="{1}"/>\n'.format(
+                        escape(name, {'"': "&quot;"}), value
+                    ))
+                f.write(
+                    "  </variables>\n"
+                    " </CPLEXSolution>\n"
+                    "</CPLEXSolutions>\n"
+                )
+            else:
+                raise Exception("Invalid solution format!")
+
+    @property
+    def index(self):
+        """Dictionary mapping the names to positions."""
+        if self._index is None:
+            self._index = dict(zip(self.names, range(len(self.names))))
+        return self._index
+
+    def as_list(self):
+        """Return the list of values, where integral values are ints
+        (built once)."""
+        if self._list is None:
+            self._list = list(map(_number, self.values))
+        return self._list
+
+    def as_dict(self):
+        """Return the solution as a dictionary with the non-zero variables
+        (built once)."""
+        if self._dict is None:
+            self._dict = {
+                name: value
+                for name, value in zip(self.names, self.as_list())
+                if value != 0
+            }
+        return self._dict
+
+    def value(self, name, default=0):
+        """Return the value of a variable (default if it is missing)."""
+        i = self.index.get(name)
+        if i is None:
+            return default
+        return self.as_list()[i]
+
+    __call__ = value
+
+    def lookup(self, names, default=0):
+        """Return the list of values of a list of variables."""
+        values = self.as_list()
+        return [
+            default if i is None else values[i]
+            for i in map(self.index.get, names)
+        ]
+
+    def prefix(self, prefix):
+        """Return a dictionary with the variables whose name starts with
+        prefix (without the prefix)."""
+        if self._sorted is None:
+            self._sorted = sorted(self.index)
+        names = self._sorted
+        first = bisect_left(names, prefix)
+        last = first
+        while last < len(names) and names[last].startswith(prefix):
+            last += 1
+        n = len(prefix)
+        names = names[first:last]
+        return dict(zip((name[n:] for name in names), self.lookup(names)))
+
+    def __getitem__(self, name):
+        return self.as_dict()[name]
+
+    def __setitem__(self, name, value):
+        value = float(value)
+        i = self.index.get(name)
+        if i is None:
+            i = self._index[name] = len(self.names)
+            self.names.append(name)
+            self.values.append(value)
+            if self._list is not None:
+                self._list.append(None)
+            self._sorted = None
+        else:
+            self.values[i] = value
+        value = _number(value)
+        if self._list is not None:
+            self._list[i] = value
+        if self._dict is not None:
+            if value != 0:
+                self._dict[name] = value
+            else:
+                self._dict.pop(name, None)
+
+    def __delitem__(self, name):
+        if name not in self.as_dict():
+            raise KeyError(name)
+        self[name] = 0
+
+    def __iter__(self):
+        return iter(self.as_dict())
+
+    def __len__(self):
+        return len(self.as_dict())
+
+    def __repr__(self):
+        return "Solution({0!r})".format(self.as_dict())
@@ -0,0 +1,346 @@
+"""
+This code is part of the Mathematical Programming Toolbox PyMPL.
+
+Copyright (C) 2015-2016, Filipe Brandao
+Faculdade de Ciencias, Universidade do Porto
+Porto, Portugal. All rights reserved. E-mail: <fdabrandao@dcc.fc.up.pt>.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from __future__ import division
+from builtins import object
+
+import os
+import re
+
+from .utils.instrument import wall_time
+
+INFINITY = 1e50  # CBC reports 1e+50 when there is no incumbent
+
+
+def _number(token):
+    """Convert a number in a solver log (None if it is not finite)."""
+    token = token.strip().rstrip("%")
+    try:
+        value = float(token)
+    except ValueError:
+        return None
+    if abs(value) >= INFINITY or value != value:
+        return None
+    return value
+
+
+def _percent(token):
+    """Convert a gap in percent (e.g., "2.5%" or "< 0.1%") into a fraction
+    (None if it cannot be parsed)."""
+    value = _number(token.strip().lstrip("<"))
+    return value / 100 if value is not None else None
+
+
+class LogParser(object):
+    """Base class of the solver log parsers.
+
+    parse(line) returns a progress event (a dictionary with the solver
+    name, the incumbent, the best bound, the relative gap and the time
+    reported by the solver) or None if the line does not report progress.
+    """
+
+    name = None
+    OPTIMAL_RE = None  # matches the log of solves that proved optimality
+
+    def __init__(self):
+        self.time = None
+
+    def parse(self, line):
+        """Return the progress event of a line of the log (or None)."""
+        raise NotImplementedError
+
+    @classmethod
+    def optimal(cls, output):
+        """Check if the log of a solve reports an optimal solution."""
+        return cls.OPTIMAL_RE.search(output) is not None
+
+    def event(self, incumbent, bound, gap=None, time=None):
+        """Build a progress event (the gap is computed if missing)."""
+        if time is not None:
+            self.time = time
+        if gap is None and incumbent is not None and bound is not None:
+            gap = abs(incumbent - bound) / max(abs(incumbent), 1e-10)
+        return {
+            "solver": self.name,
+            "incumbent": incumbent,
+            "bound": bound,
+            "gap": gap,
+            "time": self.time,
+        }
+
+
+class GLPKParser(LogParser):
+    """Parser of glpsol logs."""
+
+    name = "glpk"
+    OPTIMAL_RE = re.compile(r"^(INTEGER )?OPTIMAL (LP )?SOLUTION FOUND", re.M)
+    PROGRESS_RE = re.compile(
+        r"^\+\s*\d+:\s+(?:mip =|>>>>>)\s+(not found yet|\S+)\s+[<>]=\s+"
+        r"(tree is empty|\S+)\s+(?:(<?\s*\S+)%\s+)?\("
+    )
+
+    def parse(self, line):
+        match = self.PROGRESS_RE.match(line)
+        if match is None:
+            return None
+        incumbent, bound, gap = match.groups()
+        if gap is not None:
+            gap = _percent(gap)
+            if gap is None:
+                return None
+        incumbent = _number(incumbent)
+        if bound == "tree is empty":  # the incumbent is optimal
+            return self.event(incumbent, incumbent, 0.0)
+        return self.event(incumbent, _number(bound), gap)
+
+
+class CBCParser(LogParser):
+    """Parser of COIN-OR CBC logs."""
+
+    name = "cbc"
+    OPTIMAL_RE = re.compile(r"^Result - Optimal solution found", re.M)
+    SOLUTION_RE = re.compile(
+        r"^Cbc0\d+I Integer solution of (\S+) found.*\((\S+) seconds\)"
+    )
+    NODES_RE = re.compile(
+        r"^Cbc0010I After \d+ nodes, \d+ on tree, (\S+) best solution, "
+        r"best possible (\S+) \((\S+) seconds\)"
+    )
+
+    def __init__(self):
+        LogParser.__init__(self)
+        self.incumbent = None
+        self.bound = None
+
+    def parse(self, line):
+        match = self.SOLUTION_RE.match(line)
+        if match is not None:
+            self.incumbent = _number(match.group(1))
+            return self.event(
+                self.incumbent, self.bound, time=_number(match.group(2))
+            )
+        match = self.NODES_RE.match(line)
+        if match is not None:
+            self.incumbent = _number(match.group(1))
+            self.bound = _number(match.group(2))
+            return self.event(
+                self.incumbent, self.bound, time=_number(match.group(3))
+            )
+        return None
+
+
+class SCIPParser(LogParser):
+    """Parser of SCIP logs (the columns are read from the table header)."""
+
+    name = "scip"
+    OPTIMAL_RE = re.compile(
+        r"^SCIP Status\s*: problem is solved \[optimal solution found\]",
+        re.M
+    )
+    TIME_RE = re.compile(r"^\s*\S?\s*(\d+(?:\.\d+)?)s\s*$")
+
+    def __init__(self):
+        LogParser.__init__(self)
+        self.columns = None
+
+    def parse(self, line):
+        fields = [field.strip() for field in line.split("|")]
+        if "primalbound" in fields and "dualbound" in fields:
+            self.columns = dict(
+                (field, i) for i, field in enumerate(fields)
+            )
+            return None
+        if self.columns is None or len(fields) < len(self.columns):
+            return None
+        match = self.TIME_RE.match(fields[self.columns.get("time", 0)])
+        if match is None:
+            return None
+        gap = fields[self.columns["gap"]] if "gap" in self.columns else None
+        if gap and gap[-1] == "%":
+            gap = _percent(gap)
+            if gap is None:
+                return None
+        else:
+            gap = None
+        return self.event(
+            _number(fields[self.columns["primalbound"]]),
+            _number(fields[self.columns["dualbound"]]),
+            gap, float(match.group(1))
+        )
+
+
+class GurobiParser(LogParser):
+    """Parser of Gurobi logs."""
+
+    name = "gurobi"
+    OPTIMAL_RE = re.compile(r"^Optimal solution found", re.M)
+    PROGRESS_RE = re.compile(
+        r"^\s*[H*]?\s*\d+\+?\s+\d+\+?\s.*?(\S+)\s+(\S+)\s+(\S+%|-)\s+"
+        r"\S+\s+(\d+)s\s*$"
+    )
+
+    def parse(self, line):
+        match = self.PROGRESS_RE.match(line)
+        if match is None:
+            return None
+        incumbent, bound, gap, time = match.groups()
+        if gap != "-":
+            gap = _percent(gap)
+            if gap is None:
+                return None
+        else:
+            gap = None
+        return self.event(
+            _number(incumbent), _number(bound), gap, float(time)
+        )
+
+
+class CPLEXParser(LogParser):
+    """Parser of CPLEX logs."""
+
+    name = "cplex"
+    OPTIMAL_RE = re.compile(
+        r"^(MIP - Integer optimal|.* - Optimal:)", re.M
+    )
+    PROGRESS_RE = re.compile(
+        r"^\s*\*?\s*\d+\+?\s+\d+\+?\s.*?(\S+)\s+(\S+)\s+\d+\s+(\S+)%\s*$"
+    )
+    TIME_RE = re.compile(r"^Elapsed time = (\S+) sec\.")
+
+    def parse(self, line):
+        match = self.TIME_RE.match(line)
+        if match is not None:
+            self.time = _number(match.group(1))
+            return None
+        match = self.PROGRESS_RE.match(line)
+        if match is None:
+            return None
+        incumbent, bound, gap = match.groups()
+        gap = _percent(gap)
+        if gap is None:
+            return None
+        return self.event(_number(incumbent), _number(bound), gap)
+
+
+class LPSolveParser(LogParser):
+    """Parser of lp_solve logs (lp_solve does not report progress)."""
+
+    name = "lpsolve"
+    OPTIMAL_RE = re.compile(r"^Value of objective function:", re.M)
+    SUBOPTIMAL_RE = re.compile(r"sub-optimal")
+
+    def parse(self, line):
+        return None
+
+    @classmethod
+    def optimal(cls, output):
+        return (cls.OPTIMAL_RE.search(output) is not None and
+                cls.SUBOPTIMAL_RE.search(output) is None)
+
+
+PARSERS = {
+    "glpk": GLPKParser,
+    "coinor": CBCParser,
+    "cbc": CBCParser,
+    "scip": SCIPParser,
+    "gurobi": GurobiParser,
+    "cplex": CPLEXParser,
+    "lpsolve": LPSolveParser,
+}
+
+
+def get_parser(parser):
+    """Return a log parser given a parser, a solver name or a command (the
+    solver is guessed from the name of the wrapper script)."""
+    if parser is None or isinstance(parser, LogParser):
+        return parser
+    name = os.path.basename(parser.split()[0]).lower() if parser else ""
+    for key in sorted(PARSERS):
+        if name.startswith(key):
+            return PARSERS[key]()
+    raise Exception("No log parser for '{0}'!".format(parser))
+
+
+def is_optimal(script_name, output):
+    """Check if the output of a solver script reports an optimal solution
+    (None if the solver of the script is unknown)."""
+    try:
+        parser = get_parser(script_name)
+    except Exception:
+        return None
+    return parser.optimal(output)
+
+
+class GapBelow(object):
+    """Stop rule: the relative gap is at most gap (e.g., 0.01 for 1%)."""
+
+    def __init__(self, gap):
+        self.gap = gap
+
+    def __call__(self, event):
+        return event["gap"] is not None and event["gap"] <= self.gap
+
+
+class NoImprovement(object):
+    """Stop rule: the incumbent has not improved for the given number of
+    seconds (checked whenever the solver reports progress)."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.incumbent = None
+        self.since = None
+
+    def __call__(self, event):
+        if event["incumbent"] is None:
+            return False
+        if event["incumbent"] != self.incumbent:
+            self.incumbent = event["incumbent"]
+            self.since = event["elapsed"]
+            return False
+        return event["elapsed"] - self.since >= self.seconds
+
+
+class LogMonitor(object):
+    """Feeds the lines of a solver log to a parser, reports the progress
+    events to a callback and checks the stop rules."""
+
+    def __init__(self, parser, progress=None, stop=None):
+        self.parser = parser
+        self.progress = progress
+        if stop is None:
+            stop = []
+        elif callable(stop):
+            stop = [stop]
+        self.stop = list(stop)
+        self.start = wall_time()
+        self.stopped = False
+
+    def feed(self, line):
+        """Process a line; returns True (once) if the solver must stop."""
+        event = self.parser.parse(line)
+        if event is None:
+            return False
+        event["elapsed"] = wall_time() - self.start
+        if self.progress is not None:
+            self.progress(event)
+        if self.stopped or not any([rule(event) for rule in self.stop]):
+            return False
+        self.stopped = True
+        return True
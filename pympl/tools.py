@@ -24,20 +24,34 @@ from builtins import object
 
 import os
 import sys
+import json
 import signal
 import atexit
-import shutil
-import tempfile
+import threading
 import subprocess
+from queue import Queue, Empty
+
+from .utils import DiskCache, instrument
+from .solution import Solution
+from .workspace import Workspace
+
+# MIP start formats: wrapper script prefix -> (format, extension)
+START_FORMATS = {
+    "coinor": ("cbc", ".sol"),
+    "cplex": ("mst", ".mst"),
+    "gurobi": ("sol", ".mst"),
+    "scip": ("sol", ".sol"),
+}
 
 
 class Tools(object):
     """Tools for calling solver wrappers."""
 
-    TMP_DIR = tempfile.mkdtemp()
-    TMP_CNT = 0
-    PLIST = []
+    WORKSPACE = Workspace()  # default workspace (directory created lazily)
+    PLIST = WORKSPACE.processes
     VERBOSE = True
+    CACHE = None
+    SIGNALS = False
 
     @staticmethod
     def set_verbose(verbose):
@@ -46,30 +60,76 @@ class Tools(object):
             Tools.VERBOSE = verbose
 
     @staticmethod
-    def new_tmp_file(ext="tmp"):
+    def set_workspace(workspace):
+        """Set the default workspace (a pympl.Workspace)."""
+        Tools.WORKSPACE = workspace
+        Tools.PLIST = workspace.processes
+
+    @staticmethod
+    def tmp_dir(workspace=None):
+        """Return the directory for temporary files (created on first
+        use)."""
+        return (workspace or Tools.WORKSPACE).tmp_dir()
+
+    @staticmethod
+    def new_tmp_file(ext="tmp", workspace=None):
         """Create temporary files."""
-        if not ext.startswith("."):
-            ext = ".{0}".format(ext)
-        fname = "{0}/{1}{2}".format(Tools.TMP_DIR, Tools.TMP_CNT, ext)
-        Tools.TMP_CNT += 1
-        if not os.path.exists(Tools.TMP_DIR):
-            os.makedirs(Tools.TMP_DIR)
-        return fname
+        return (workspace or Tools.WORKSPACE).new_file(ext)
 
     @staticmethod
-    @atexit.register
-    def clear():
-        """Delete temporary files and kill child processes."""
-        for p in Tools.PLIST:
-            try:
-                os.killpg(p.pid, signal.SIGTERM)
-            except:
-                pass
+    def set_signal_handlers():
+        """Kill the child processes and delete the temporary files on
+        SIGINT/SIGTERM/SIGHUP (called before starting solvers)."""
+        if Tools.SIGNALS:
+            return
         try:
-            shutil.rmtree(Tools.TMP_DIR)
-        except:
+            signal.signal(signal.SIGINT, signal_handler)
+            signal.signal(signal.SIGTERM, signal_handler)
+            signal.signal(signal.SIGHUP, signal_handler)
+            Tools.SIGNALS = True
+        except (ValueError, AttributeError):  # not the main thread; Windows
             pass
 
+    @staticmethod
+    @atexit.register
+    def clear():
+        """Delete temporary files and kill child processes (of every
+        workspace)."""
+        Workspace.clear_all()
+
+    @staticmethod
+    def set_cache(directory, maxsize=2**30):
+        """Enable the solve-result cache of Tools.script in directory
+        (maxsize in bytes) or disable it if directory is None."""
+        if directory is None:
+            Tools.CACHE = None
+        else:
+            Tools.CACHE = DiskCache(directory, maxsize)
+
+    @staticmethod
+    def cache_lookup(script_name, model, options=None):
+        """Return (key, result) for a script call; result is the cached
+        (output, solution) pair or None."""
+        if Tools.CACHE is None:
+            return None, None
+        key = DiskCache.hash_key(
+            "script", json.dumps([script_name, options]),
+            DiskCache.hash_file(model)
+        )
+        data = Tools.CACHE.load(key)
+        if data is None:
+            return key, None
+        result = json.loads(data.decode("utf-8"))
+        return key, (result["output"], Solution.from_dict(result["values"]))
+
+    @staticmethod
+    def cache_store(key, output, values):
+        """Store the result of a script call in the cache."""
+        if Tools.CACHE is None or key is None or values is None:
+            return
+        data = json.dumps({"output": output, "values": values.as_dict()})
+        Tools.CACHE.put(key, data.encode("utf-8"))
+
     @staticmethod
     def log(msg, verbose=None):
         """Log function."""
@@ -79,24 +139,161 @@ class Tools(object):
             print(msg)
 
     @staticmethod
-    def run(cmd, tee=None, grep=None, grepv=None, verbose=None):
-        """Run a system command."""
+    def run(cmd, tee=None, grep=None, grepv=None, verbose=None,
+            workspace=None, progress=None, stop=None, parser=None,
+            stop_grace=10, timeout=None, memory_limit=None, cpu_limit=None):
+        """Run a system command (tracked by the workspace).
+
+        If progress or stop is given, the output is parsed with a solver
+        log parser (see pympl.solverlog; by default guessed from the name
+        of the wrapper script): progress is called with each progress
+        event and, once a stop rule returns True, the process group gets
+        SIGINT so that the solver stops with its incumbent (and SIGTERM
+        if it is still running stop_grace seconds later). The same
+        happens when the command runs for more than timeout seconds.
+
+        memory_limit (bytes of address space) and cpu_limit (seconds) are
+        applied to each process started by the command (RLIMIT_AS and
+        RLIMIT_CPU). Returns the resource usage of the command: wall time,
+        user/system/cpu time and max_rss (bytes) of its processes, the exit
+        code, and whether it was stopped or timed out.
+        """
         if verbose is None:
             verbose = Tools.VERBOSE
+        if workspace is None:
+            workspace = Tools.WORKSPACE
+        monitor = None
+        if progress is not None or stop is not None:
+            from .solverlog import LogMonitor, get_parser
+            monitor = LogMonitor(
+                get_parser(parser or cmd), progress=progress, stop=stop
+            )
+        Tools.set_signal_handlers()
+
+        usage = {"stopped": False, "timeout": False}
+        timers = []
+
+        def interrupt(reason):
+            usage[reason] = True
+            Tools._stop(proc, stop_grace, timers)
 
+        start = instrument.wall_time()
         proc = subprocess.Popen(
             cmd, shell=True,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
-            preexec_fn=os.setsid
+            preexec_fn=Tools._preexec(memory_limit, cpu_limit)
         )
-        Tools.PLIST.append(proc)
+        workspace.track(proc)
+        if timeout is not None:
+            timer = threading.Timer(timeout, interrupt, args=("timeout",))
+            timer.daemon = True
+            timer.start()
+            timers.append(timer)
+        try:
+            exit_code, rusage = Tools._wait(
+                proc, tee, grep, grepv, verbose, monitor,
+                lambda: interrupt("stopped")
+            )
+        except BaseException:  # e.g., an error raised by progress
+            try:
+                os.killpg(proc.pid, signal.SIGTERM)
+            except OSError:
+                pass
+            proc.wait()
+            raise
+        finally:
+            for timer in list(timers):
+                timer.cancel()
+            workspace.untrack(proc)
+        usage.update(Tools._usage(rusage))
+        usage["wall"] = instrument.wall_time() - start
+        usage["exit_code"] = exit_code
+        if exit_code != 0 and not (usage["stopped"] or usage["timeout"]):
+            raise RuntimeError("failed to run '{0}'".format(cmd))
+        return usage
+
+    @staticmethod
+    def _preexec(memory_limit, cpu_limit):
+        """Return the function that sets up the child process (new session
+        and resource limits)."""
+        if memory_limit is None and cpu_limit is None:
+            return os.setsid
+        import resource
+        limits = [
+            (resource.RLIMIT_AS, memory_limit),
+            (resource.RLIMIT_CPU, cpu_limit),
+        ]
+        limits = [
+            (res, int(limit), resource.getrlimit(res)[1])
+            for res, limit in limits if limit is not None
+        ]
+
+        def preexec():
+            os.setsid()
+            for res, limit, hard in limits:
+                if hard != resource.RLIM_INFINITY:
+                    limit = min(limit, hard)
+                resource.setrlimit(res, (limit, hard))
+        return preexec
 
+    @staticmethod
+    def _reap(proc):
+        """Wait for a process; returns its exit code and resource usage
+        (including the descendants it waited for) if available."""
+        if hasattr(os, "wait4"):
+            try:
+                _, status, rusage = os.wait4(proc.pid, 0)
+            except OSError:  # already reaped
+                return proc.wait(), None
+            if os.WIFSIGNALED(status):
+                proc.returncode = -os.WTERMSIG(status)
+            else:
+                proc.returncode = os.WEXITSTATUS(status)
+            return proc.returncode, rusage
+        return proc.wait(), None
+
+    @staticmethod
+    def _usage(rusage):
+        """Convert the result of wait4 into a dictionary."""
+        if rusage is None:
+            return {"user": None, "system": None, "cpu": None,
+                    "max_rss": None}
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return {
+            "user": rusage.ru_utime,
+            "system": rusage.ru_stime,
+            "cpu": rusage.ru_utime + rusage.ru_stime,
+            "max_rss": rusage.ru_maxrss * scale,
+        }
+
+    @staticmethod
+    def _stop(proc, grace, timers):
+        """Interrupt a process group (and terminate it after grace
+        seconds)."""
+        def kill(sig):
+            try:
+                os.killpg(proc.pid, sig)
+            except OSError:
+                pass
+
+        kill(signal.SIGINT)
+        timer = threading.Timer(grace, kill, args=(signal.SIGTERM,))
+        timer.daemon = True
+        timer.start()
+        timers.append(timer)
+
+    @staticmethod
+    def _wait(proc, tee, grep, grepv, verbose, monitor=None, stop=None):
+        """Pipe the output of a process and wait for it to finish."""
         def pipe_output(fin, fout_list, grep=None, grepv=None):
             while True:
                 line = fin.readline().decode("utf-8")
                 if not line:
                     break
+                if monitor is not None and monitor.feed(line):
+                    stop()
                 if grep is not None and grep not in line:
                     continue
                 if grepv is not None and grepv in line:
@@ -108,6 +305,8 @@ class Tools(object):
         if tee is None:
             if verbose:
                 pipe_output(proc.stdout, [sys.stdout], grep, grepv)
+            elif monitor is not None:
+                pipe_output(proc.stdout, [], grep, grepv)
         else:
             with open(tee, "w") as ftee:
                 if verbose:
@@ -115,14 +314,13 @@ class Tools(object):
                 else:
                     pipe_output(proc.stdout, [ftee], grep, grepv)
 
-        exit_code = proc.wait()
+        result = Tools._reap(proc)
         proc.stdout.close()
-        if exit_code != 0:
-            raise RuntimeError("failed to run '{0}'".format(cmd))
+        return result
 
     @staticmethod
-    def script(script_name, model, options=None, verbose=None):
-        """Call a solver script and returns the solutions."""
+    def script_cmd(script_name, model, options=None, start_file=None):
+        """Build the command for calling a solver script."""
         cmd = script_name
         if model.endswith(".mps"):
             cmd += " --mps {0}".format(model)
@@ -132,32 +330,260 @@ class Tools(object):
             raise Exception("Invalid file extension!")
         if options is not None:
             cmd += " --options \"{0}\"".format(options)
-        out_file = Tools.new_tmp_file()
-        sol_file = Tools.new_tmp_file(".sol")
-        Tools.run(
-            "{0} --wsol {1}".format(cmd, sol_file),
-            tee=out_file,
-            verbose=verbose
-        )
+        if start_file is not None:
+            cmd += " --start {0}".format(start_file)
+        return cmd
+
+    @staticmethod
+    def write_start(script_name, start, workspace=None):
+        """Write a MIP start (a Solution or a name -> value dictionary) in
+        the format expected by the solver of a script; returns the file
+        name."""
+        if not isinstance(start, Solution):
+            start = Solution.from_dict(start)
+        name = os.path.basename(script_name).lower()
+        fmt, ext = "sol", ".sol"
+        for prefix in sorted(START_FORMATS):
+            if name.startswith(prefix):
+                fmt, ext = START_FORMATS[prefix]
+        start_file = Tools.new_tmp_file(ext, workspace=workspace)
+        start.write(start_file, fmt)
+        return start_file
+
+    @staticmethod
+    def read_output(out_file, sol_file):
+        """Read (and remove) the output and solution files of a script."""
         with open(out_file) as f:
             output = f.read()
         os.remove(out_file)
         try:
-            with open(sol_file) as f:
-                sol = f.read().split()
-                values = {}
-                assert len(sol) % 2 == 0
-                for i in range(0, len(sol), 2):
-                    var, value = sol[i], float(sol[i+1])
-                    if int(value) == value:
-                        value = int(value)
-                    if value != 0:
-                        values[var] = value
+            values = Solution.read(sol_file)
             os.remove(sol_file)
         except:
             values = None
         return output, values
 
+    @staticmethod
+    def script(script_name, model, options=None, verbose=None, cache=True,
+               workspace=None, progress=None, stop=None, timeout=None,
+               memory_limit=None, cpu_limit=None, return_usage=False,
+               start=None):
+        """Call a solver script and returns the solutions.
+
+        Returns (output, solution) where solution is a pympl.Solution
+        (a mapping with the non-zero variables) or None; with
+        return_usage=True, returns (output, solution, usage) where usage is
+        the resource usage returned by Tools.run (None for cached results).
+
+        If the cache is enabled (see Tools.set_cache), identical calls
+        return the stored result; use cache=False to bypass it. The
+        temporary files and the process belong to workspace (by default,
+        Tools.WORKSPACE). See Tools.run for progress, stop and the limits.
+
+        start is a MIP start (e.g., the solution of a previous call) that
+        is written in the format of the solver and passed to the script
+        with --start (calls with stop rules or starts are not cached).
+        """
+        with instrument.stage(
+            "script", script=script_name, model=model
+        ) as stage:
+            key = None
+            if cache and stop is None and start is None:
+                key, result = Tools.cache_lookup(script_name, model, options)
+                if result is not None:
+                    Tools.log(result[0].rstrip("\n"), verbose)
+                    return result + (None,) if return_usage else result
+            start_file = None
+            if start is not None:
+                start_file = Tools.write_start(script_name, start, workspace)
+            cmd = Tools.script_cmd(script_name, model, options, start_file)
+            out_file = Tools.new_tmp_file(workspace=workspace)
+            sol_file = Tools.new_tmp_file(".sol", workspace=workspace)
+            try:
+                usage = Tools.run(
+                    "{0} --wsol {1}".format(cmd, sol_file),
+                    tee=out_file,
+                    verbose=verbose,
+                    workspace=workspace,
+                    progress=progress,
+                    stop=stop,
+                    parser=script_name,
+                    timeout=timeout,
+                    memory_limit=memory_limit,
+                    cpu_limit=cpu_limit
+                )
+            finally:
+                if start_file is not None:
+                    os.remove(start_file)
+            if stage is not None:
+                stage.info["usage"] = usage
+            output, values = Tools.read_output(out_file, sol_file)
+            if not usage["timeout"]:
+                Tools.cache_store(key, output, values)
+            if return_usage:
+                return output, values, usage
+            return output, values
+
+    @staticmethod
+    def script_many(jobs, max_workers=None, verbose=False, workspace=None):
+        """Call solver scripts concurrently.
+
+        Each job is a (script_name, model[, options]) tuple or a dictionary
+        with the arguments of Tools.script (jobs run in workspace unless
+        they specify one). Yields (index, result) pairs as the jobs
+        complete, where result is the (output, solution) pair returned by
+        Tools.script or the exception raised by the job. If the generator
+        is closed early, the jobs that have not finished are killed.
+        """
+        jobs = list(jobs)
+        if max_workers is None:
+            from multiprocessing import cpu_count
+            max_workers = cpu_count()
+        assert max_workers >= 1
+        pending, done, stop = Queue(), Queue(), threading.Event()
+        workspaces = []
+        for i, job in enumerate(jobs):
+            if isinstance(job, dict):
+                kwargs = dict(job)
+            else:
+                kwargs = dict(zip(("script_name", "model", "options"), job))
+            kwargs.setdefault("verbose", verbose)
+            parent = kwargs.get("workspace") or workspace or Tools.WORKSPACE
+            # each job has its own workspace to be killed alone
+            kwargs["workspace"] = Workspace(root=parent.tmp_dir())
+            workspaces.append(kwargs["workspace"])
+            pending.put((i, kwargs))
+
+        def worker():
+            while not stop.is_set():
+                try:
+                    i, kwargs = pending.get_nowait()
+                except Empty:
+                    return
+                try:
+                    result = Tools.script(**kwargs)
+                except Exception as e:
+                    result = e
+                finally:
+                    kwargs["workspace"].clear()
+                done.put((i, result))
+
+        Tools.set_signal_handlers()  # only possible in the main thread
+        threads = []
+        for _ in range(min(max_workers, len(jobs))):
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        try:
+            for _ in range(len(jobs)):
+                yield done.get()
+        finally:  # e.g., GeneratorExit if the caller stops iterating
+            stop.set()
+            for job_workspace in workspaces:
+                job_workspace.cancel()
+            for thread in threads:
+                thread.join()
+
+    @staticmethod
+    def script_portfolio(portfolio, model, verbose=False, cache=True,
+                         workspace=None):
+        """Race several solver scripts (or options) on the same model.
+
+        Each configuration is a script name, a (script_name, options)
+        tuple or a dictionary with the arguments of Tools.script (except
+        model). All configurations start at the same time; the first one
+        that proves optimality wins (it must not be stopped or timed out,
+        and its log must report an optimal solution; for scripts of unknown
+        solvers, a clean exit is enough) and the process groups of the
+        others are killed. Returns (output, solution, winner) where winner
+        is the index of the winning configuration in portfolio. If no
+        configuration proves optimality, winner is None and the first
+        result with a solution is returned.
+        """
+        from .solverlog import is_optimal
+        portfolio = list(portfolio)
+        assert len(portfolio) >= 1
+        if workspace is None:
+            workspace = Tools.WORKSPACE
+        done, stop = Queue(), threading.Event()
+        jobs = []
+        for config in portfolio:
+            if isinstance(config, dict):
+                kwargs = dict(config)
+            elif isinstance(config, (tuple, list)):
+                kwargs = dict(zip(("script_name", "options"), config))
+            else:
+                kwargs = {"script_name": config}
+            kwargs.setdefault("verbose", verbose)
+            kwargs.setdefault("cache", cache)
+            kwargs["model"] = model
+            kwargs["return_usage"] = True
+            # each configuration has its own workspace to be killed alone
+            kwargs["workspace"] = Workspace(root=workspace.tmp_dir())
+            jobs.append(kwargs)
+
+        def optimal(kwargs, result):
+            if isinstance(result, Exception):
+                return False
+            output, values, usage = result
+            if values is None:
+                return False
+            if usage is not None and (usage["stopped"] or usage["timeout"]):
+                return False
+            return is_optimal(kwargs["script_name"], output) is not False
+
+        def worker(i, kwargs):
+            try:
+                if stop.is_set():
+                    result = RuntimeError("cancelled")
+                else:
+                    # if the portfolio is decided before the process is
+                    # tracked, the workspace kills it (see Workspace.track)
+                    result = Tools.script(**kwargs)
+            except Exception as e:
+                result = e
+            finally:
+                kwargs["workspace"].clear()
+            done.put((i, result))
+
+        with instrument.stage("portfolio", model=model) as stage:
+            Tools.set_signal_handlers()
+            for i, kwargs in enumerate(jobs):
+                thread = threading.Thread(target=worker, args=(i, kwargs))
+                thread.daemon = True
+                thread.start()
+            results, order = {}, []
+            winner = None
+            for _ in range(len(jobs)):
+                i, result = done.get()
+                results[i] = result
+                order.append(i)
+                if optimal(jobs[i], result):
+                    winner = i
+                    break
+            stop.set()
+            for kwargs in jobs:
+                kwargs["workspace"].cancel()
+            if winner is not None:
+                Tools.log("portfolio winner: {0}".format(portfolio[winner]),
+                          verbose)
+                output, values = results[winner][:2]
+            else:
+                solved = [
+                    i for i in order
+                    if not isinstance(results[i], Exception) and
+                    results[i][1] is not None
+                ]
+                if not solved:
+                    raise RuntimeError("portfolio failed: {0}".format(
+                        results[order[0]]
+                    ))
+                output, values = results[solved[0]][:2]
+            if stage is not None:
+                stage.info["winner"] = winner
+            return output, values, winner
+
 
 def signal_handler(signal_, frame):
     """Signal handler for a cleaner exit."""
@@ -165,9 +591,17 @@ def signal_handler(signal_, frame):
     Tools.clear()
     sys.exit(0)
 
-try:
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    signal.signal(signal.SIGHUP, signal_handler)
-except:
-    pass
+
+if sys.version_info >= (3, 5):
+    def arun(*args, **kwargs):
+        """Coroutine version of Tools.run (see pympl.aiotools)."""
+        from . import aiotools
+        return aiotools.arun(*args, **kwargs)
+
+    def ascript(*args, **kwargs):
+        """Coroutine version of Tools.script (see pympl.aiotools)."""
+        from . import aiotools
+        return aiotools.ascript(*args, **kwargs)
+
+    Tools.arun = staticmethod(arun)
+    Tools.ascript = staticmethod(ascript)
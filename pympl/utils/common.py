@@ -22,7 +22,13 @@ from builtins import range
 from builtins import object
 import six
 
-from collections import defaultdict
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+from threading import Lock
+from collections import defaultdict, OrderedDict
 
 
 def linear_constraint(left, sign, right):
@@ -154,3 +160,230 @@ class UnionFind(object):
         for x in range(self.N):
             grps[self.find(x)].append(x)
         return list(grps.values())
+
+
+class LRUCache(object):
+    """Least-recently-used cache with hit/miss statistics."""
+
+    def __init__(self, maxsize=128):
+        """Create a new cache that holds at most maxsize entries."""
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Return the value for key (or default if key is not cached)."""
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries."""
+        with self._lock:
+            self._data.pop(key, None)
+            if self.maxsize > 0:
+                self._data[key] = value
+            self._evict()
+
+    def resize(self, maxsize):
+        """Change the maximum number of entries."""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """Return the cache statistics."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+    def _evict(self):
+        while len(self._data) > max(self.maxsize, 0):
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+class DiskCache(object):
+    """Size-bounded on-disk cache shared across processes.
+
+    Entries are files named after their keys. Reading an entry updates
+    its modification time and the least recently used entries are removed
+    when the total size exceeds maxsize bytes. Entries are written to
+    temporary files and renamed into place, so concurrent readers never
+    see partial entries; temporary files left by interrupted writers are
+    removed once they are older than TMP_MAX_AGE seconds.
+    """
+
+    TMP_MAX_AGE = 3600
+
+    def __init__(self, directory, maxsize=2**30):
+        """Create a cache in directory that holds at most maxsize bytes."""
+        self.directory = os.path.abspath(directory)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
+        self._sweep()
+
+    @staticmethod
+    def hash_key(*parts):
+        """Compute a key from strings/bytes."""
+        sha = hashlib.sha256()
+        for part in parts:
+            if not isinstance(part, bytes):
+                part = part.encode("utf-8")
+            sha.update("{0}:".format(len(part)).encode("utf-8"))
+            sha.update(part)
+        return sha.hexdigest()
+
+    @staticmethod
+    def hash_file(filename):
+        """Compute the hash of the contents of a file."""
+        sha = hashlib.sha256()
+        with open(filename, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def path(self, key):
+        """Return the path of the entry for key."""
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Return the path of the entry for key (None if not cached)."""
+        path = self.path(key)
+        try:
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def load(self, key):
+        """Return the contents of the entry for key (None if not cached)."""
+        path = self.get(key)
+        if path is not None:
+            try:
+                with open(path, "rb") as f:
+                    return f.read()
+            except (IOError, OSError):  # evicted by another process
+                pass
+        return None
+
+    def put(self, key, data):
+        """Store bytes under key."""
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self._commit(tmp, key)
+
+    def put_file(self, key, filename):
+        """Store a copy of a file under key."""
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=self.directory)
+        os.close(fd)
+        shutil.copyfile(filename, tmp)
+        self._commit(tmp, key)
+
+    def _commit(self, tmp, key):
+        try:
+            getattr(os, "replace", os.rename)(tmp, self.path(key))
+        except OSError:
+            os.remove(tmp)
+            raise
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.startswith(".tmp-"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def _sweep(self):
+        """Remove the stale temporary files of interrupted writers."""
+        limit = time.time() - self.TMP_MAX_AGE
+        for name in os.listdir(self.directory):
+            if not name.startswith(".tmp-"):
+                continue
+            try:
+                path = os.path.join(self.directory, name)
+                if os.stat(path).st_mtime < limit:
+                    os.remove(path)
+            except OSError:  # committed or removed by another process
+                pass
+
+    def _evict(self):
+        self._sweep()
+        entries = self._entries()
+        total = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self.maxsize:
+                break
+            try:
+                os.remove(self.path(name))
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        self._sweep()
+        for mtime, size, name in self._entries():
+            try:
+                os.remove(self.path(name))
+            except OSError:
+                pass
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """Return the cache statistics (size in bytes)."""
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "size": sum(size for mtime, size, name in entries),
+            "maxsize": self.maxsize,
+        }
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
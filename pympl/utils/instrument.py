@@ -0,0 +1,205 @@
+"""
+This code is part of the Mathematical Programming Toolbox PyMPL.
+
+Copyright (C) 2015-2016, Filipe Brandao
+Faculdade de Ciencias, Universidade do Porto
+Porto, Portugal. All rights reserved. E-mail: <fdabrandao@dcc.fc.up.pt>.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from builtins import object
+
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+wall_time = getattr(time, "perf_counter", None) or time.time
+cpu_time = getattr(time, "process_time", None) or time.clock
+
+ACTIVE = []
+LOCK = threading.Lock()
+
+
+class _Stage(object):
+    """A stage being recorded."""
+
+    def __init__(self, name, info, parent):
+        self.name = name
+        self.info = info
+        self.parent = parent
+        self.children = []
+        self.peak = 0
+        self.memory = 0
+        self.wall = wall_time()
+        self.cpu = cpu_time()
+
+    def report(self):
+        """Return the stage as a dictionary."""
+        result = {
+            "name": self.name,
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "peak_memory": self.peak,
+        }
+        result.update(self.info)
+        result["stages"] = [child.report() for child in self.children]
+        return result
+
+
+class Recorder(object):
+    """Records the wall time, CPU time and peak memory of each stage.
+
+    While a recorder is active (``with Recorder() as rec: ...``), PyMPL
+    records the translation (with one sub-stage per command), the GMPL
+    conversions (glpkutils.mod2lp/mod2mps), the solver scripts
+    (Tools.script) and the extract methods of submodels. rec.report()
+    returns the stages as a tree of dictionaries. CPU time and memory are
+    process-wide; peak_memory is the peak of the memory allocated during
+    the stage (traced with tracemalloc if memory=True).
+    """
+
+    def __init__(self, memory=True):
+        self._tracemalloc = None
+        if memory:
+            try:
+                import tracemalloc
+                self._tracemalloc = tracemalloc
+            except ImportError:  # Python < 3.4
+                pass
+        self.memory = self._tracemalloc is not None
+        self._root = _Stage("total", {}, None)
+        self._current = threading.local()
+        self._tracing = False
+
+    def __enter__(self):
+        if self.memory and not self._tracemalloc.is_tracing():
+            self._tracemalloc.start()
+            self._tracing = True
+        self._root = _Stage("total", {}, None)
+        self._begin(self._root)
+        with LOCK:
+            ACTIVE.append(self)
+        return self
+
+    def __exit__(self, *args):
+        with LOCK:
+            ACTIVE.remove(self)
+        self._end(self._root)
+        if self._tracing:
+            self._tracemalloc.stop()
+            self._tracing = False
+
+    def _begin(self, stage):
+        """Start measuring a stage."""
+        if self.memory:
+            current, peak = self._tracemalloc.get_traced_memory()
+            parent = stage.parent
+            while parent is not None:
+                parent.peak = max(parent.peak, peak - parent.memory)
+                parent = parent.parent
+            if hasattr(self._tracemalloc, "reset_peak"):  # Python 3.9+
+                self._tracemalloc.reset_peak()
+            stage.memory = current
+        stage.wall = wall_time()
+        stage.cpu = cpu_time()
+
+    def _end(self, stage):
+        """Stop measuring a stage."""
+        stage.wall = wall_time() - stage.wall
+        stage.cpu = cpu_time() - stage.cpu
+        if self.memory:
+            peak = self._tracemalloc.get_traced_memory()[1]
+            while stage is not None:
+                stage.peak = max(stage.peak, peak - stage.memory)
+                stage = stage.parent
+
+    @contextmanager
+    def stage(self, name, **info):
+        """Record a stage (stages can be nested)."""
+        parent = getattr(self._current, "stage", None) or self._root
+        stage = _Stage(name, info, parent)
+        with LOCK:
+            parent.children.append(stage)
+        self._current.stage = stage
+        self._begin(stage)
+        try:
+            yield stage
+        finally:
+            self._end(stage)
+            self._current.stage = parent
+
+    def report(self):
+        """Return the recorded stages as a dictionary.
+
+        "stages" is the tree of stages (name, wall, cpu, peak_memory,
+        extra information such as the line of a command, and sub-stages);
+        "totals" aggregates the count, wall and CPU time of each name.
+        """
+        stages = self._root.report()
+        totals = {}
+
+        def add(stage):
+            total = totals.setdefault(
+                stage["name"], {"count": 0, "wall": 0, "cpu": 0}
+            )
+            total["count"] += 1
+            total["wall"] += stage["wall"]
+            total["cpu"] += stage["cpu"]
+            for child in stage["stages"]:
+                add(child)
+
+        for stage in stages["stages"]:
+            add(stage)
+        return {"stages": stages, "totals": totals}
+
+    def to_json(self, fname=None, **kwargs):
+        """Return the report as a JSON string (or write it to fname)."""
+        data = json.dumps(self.report(), **kwargs)
+        if fname is not None:
+            with open(fname, "w") as f:
+                f.write(data)
+        return data
+
+
+class _NullStage(object):
+    """Context manager used when no recorder is active."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *args):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+def stage(name, **info):
+    """Record a stage in the active recorders (if any)."""
+    if not ACTIVE:
+        return NULL_STAGE
+    return _stages(list(ACTIVE), name, info)
+
+
+@contextmanager
+def _stages(recorders, name, info):
+    """Record a stage in several recorders."""
+    if len(recorders) == 1:
+        with recorders[0].stage(name, **info) as stage_:
+            yield stage_
+        return
+    with recorders[0].stage(name, **info) as stage_:
+        with _stages(recorders[1:], name, info):
+            yield stage_
@@ -18,8 +18,10 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
+from builtins import object
 
 import re
+from bisect import bisect_right
 
 t_SYMBNAME1 = r'[a-zA-Z_][a-zA-Z0-9_]*'
 t_SYMBNAME2 = r'\^[^,\[\]\{\}]*'
@@ -29,6 +31,35 @@ t_INDEX2 = r'(?:\s*{[^}]*})?'  # {} index
 t_SYMBNAME_INDEX1 = t_SYMBNAME + t_INDEX1
 t_SYMBNAME_INDEX2 = t_SYMBNAME + t_INDEX2
 
+_REGEX_CACHE = {}
+
+
+def compile_regex(pattern, flags=0):
+    """Compile a regular expression (compiled patterns are cached)."""
+    try:
+        return _REGEX_CACHE[pattern, flags]
+    except KeyError:
+        rgx = re.compile(pattern, flags)
+        _REGEX_CACHE[pattern, flags] = rgx
+        return rgx
+
+
+class LineIndex(object):
+    """Index of line offsets for mapping string offsets to positions."""
+
+    def __init__(self, text):
+        starts = [0]
+        pos = text.find("\n")
+        while pos != -1:
+            starts.append(pos+1)
+            pos = text.find("\n", pos+1)
+        self._starts = starts
+
+    def position(self, offset):
+        """Return the (line, col) of an offset (starting at 1)."""
+        line = bisect_right(self._starts, offset)
+        return line, offset-self._starts[line-1]+1
+
 
 def parse_symbname(expr, allow_index=""):
     """Match and return a symbolic name."""
@@ -39,7 +70,7 @@ def parse_symbname(expr, allow_index=""):
         t_symb = t_SYMBNAME_INDEX2
     else:
         t_symb = t_SYMBNAME
-    match = re.match(r'\s*('+t_symb+r')\s*$', expr)
+    match = compile_regex(r'\s*('+t_symb+r')\s*$').match(expr)
     if match is None:
         return None
     name = match.groups()[0]
@@ -55,9 +86,9 @@ def parse_symblist(expr, allow_index=""):
         t_symb = t_SYMBNAME_INDEX2
     else:
         t_symb = t_SYMBNAME
-    match = re.match(
-        r'\s*(\s*'+t_symb+r'\s*(?:,\s*'+t_symb+r'\s*)*)\s*$', expr
-    )
+    match = compile_regex(
+        r'\s*(\s*'+t_symb+r'\s*(?:,\s*'+t_symb+r'\s*)*)\s*$'
+    ).match(expr)
     if match is None:
         return None
     lst = match.groups()[0].split(",")
@@ -69,18 +100,16 @@ def parse_indexed(expr, index_type):
     """Match and return an indexed symbolic name (i.e., name{index})."""
     assert index_type in ("[]", "{}")
     if index_type == "[]":
-        match = re.match(
+        match = compile_regex(
             r'\s*('+t_SYMBNAME+r')\s*'
             r'(\[\s*'+t_SYMBNAME+r'\s*(?:,'
-            r'\s*'+t_SYMBNAME+r'\s*)*\])?\s*$',
-            expr
-        )
+            r'\s*'+t_SYMBNAME+r'\s*)*\])?\s*$'
+        ).match(expr)
     elif index_type == "{}":
-        match = re.match(
+        match = compile_regex(
             r'\s*('+t_SYMBNAME+r')\s*'
-            r'({\s*'+t_SYMBNAME+r'\s*(?:,\s*'+t_SYMBNAME+r'\s*)*})?\s*$',
-            expr
-        )
+            r'({\s*'+t_SYMBNAME+r'\s*(?:,\s*'+t_SYMBNAME+r'\s*)*})?\s*$'
+        ).match(expr)
     if match is None:
         return None
     name, index = match.groups()
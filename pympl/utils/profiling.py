@@ -0,0 +1,201 @@
+"""
+This code is part of the Mathematical Programming Toolbox PyMPL.
+
+Copyright (C) 2015-2016, Filipe Brandao
+Faculdade de Ciencias, Universidade do Porto
+Porto, Portugal. All rights reserved. E-mail: <fdabrandao@dcc.fc.up.pt>.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from __future__ import division
+from builtins import object
+
+import os
+import json
+import pstats
+import cProfile
+
+from .instrument import wall_time
+
+MAX_DEPTH = 64
+DISABLE = "<method 'disable' of '_lsprof.Profiler' objects>"
+THIS_MODULE = os.path.splitext(__file__)[0]
+
+
+class _CommandStats(object):
+    """Statistics of the calls of a command at a given position."""
+
+    def __init__(self, label, line, col):
+        self.label = label
+        self.line = line
+        self.col = col
+        self.count = 0
+        self.time = 0
+        self.model_bytes = 0
+        self.defs_bytes = 0
+        self.data_bytes = 0
+        self.profiler = cProfile.Profile()
+        self._start = None
+
+    def add_output(self, model, defs, data):
+        """Add the sizes of the text emitted by a call."""
+        self.model_bytes += len(model)
+        self.defs_bytes += len(defs)
+        self.data_bytes += len(data)
+
+    def report(self):
+        """Return the statistics as a dictionary."""
+        return {
+            "cmd": self.label,
+            "line": self.line,
+            "col": self.col,
+            "count": self.count,
+            "time": self.time,
+            "model_bytes": self.model_bytes,
+            "defs_bytes": self.defs_bytes,
+            "data_bytes": self.data_bytes,
+            "bytes": self.model_bytes + self.defs_bytes + self.data_bytes,
+        }
+
+
+def _func_name(func):
+    """Return a frame name for a pstats function key."""
+    filename, line, name = func
+    if filename == "~":  # built-in functions
+        return name
+    return "{0} ({1}:{2})".format(name, os.path.basename(filename), line)
+
+
+class TranslationProfile(object):
+    """Profile of the commands evaluated by PyMPL.translate(profile=True).
+
+    Each evaluation runs under cProfile; the results are aggregated per
+    command and source position (line and column).
+    """
+
+    def __init__(self):
+        self._commands = {}
+
+    def begin(self, label, line, col):
+        """Start profiling an evaluation of a command."""
+        key = (label, line, col)
+        stats = self._commands.get(key)
+        if stats is None:
+            stats = self._commands[key] = _CommandStats(label, line, col)
+        stats.count += 1
+        stats._start = wall_time()
+        stats.profiler.enable()
+        return stats
+
+    def end(self, stats):
+        """Stop profiling an evaluation of a command."""
+        stats.profiler.disable()
+        stats.time += wall_time() - stats._start
+
+    def commands(self):
+        """Return the statistics of each command and position."""
+        return [stats.report() for stats in self._commands.values()]
+
+    def report(self, top=10):
+        """Return a dictionary with the statistics of every command and
+        position ("commands"), the totals per command name ("totals") and
+        the top commands by time and by emitted bytes."""
+        commands = self.commands()
+        totals = {}
+        for cmd in commands:
+            total = totals.setdefault(cmd["cmd"], {
+                "count": 0, "time": 0, "model_bytes": 0, "defs_bytes": 0,
+                "data_bytes": 0, "bytes": 0,
+            })
+            for field in total:
+                total[field] += cmd[field]
+        return {
+            "commands": commands,
+            "totals": totals,
+            "top_time": sorted(
+                commands, key=lambda cmd: cmd["time"], reverse=True
+            )[:top],
+            "top_bytes": sorted(
+                commands, key=lambda cmd: cmd["bytes"], reverse=True
+            )[:top],
+        }
+
+    def to_json(self, fname=None, top=10, **kwargs):
+        """Return the report as a JSON string (or write it to fname)."""
+        data = json.dumps(self.report(top), **kwargs)
+        if fname is not None:
+            with open(fname, "w") as f:
+                f.write(data)
+        return data
+
+    def stats(self, label=None):
+        """Return the pstats.Stats of the commands (of a given label)."""
+        profilers = [
+            stats.profiler for stats in self._commands.values()
+            if label is None or stats.label == label
+        ]
+        if not profilers:
+            return None
+        result = pstats.Stats(profilers[0])
+        for profiler in profilers[1:]:
+            result.add(profiler)
+        return result
+
+    def collapsed(self):
+        """Return the profile as collapsed stacks ("a;b;c microseconds"),
+        the input format of flamegraph.pl and speedscope.
+
+        The stacks are rebuilt from the caller/callee times recorded by
+        cProfile, so the time of functions called from several places is
+        split in proportion to the time spent in each call site.
+        """
+        stacks = {}
+        for stats in self._commands.values():
+            root = "{0}@{1}:{2}".format(stats.label, stats.line, stats.col)
+            data = pstats.Stats(stats.profiler).stats
+            callees = {}
+            for func, (cc, nc, tt, ct, callers) in data.items():
+                for caller, edge in callers.items():
+                    callees.setdefault(caller, []).append((func, edge[3]))
+            roots = [
+                func for func, value in data.items()
+                if not value[4] and func[2] != DISABLE and
+                os.path.splitext(func[0])[0] != THIS_MODULE
+            ]
+
+            def walk(func, stack, time):
+                tt, ct = data[func][2], data[func][3]
+                scale = time/ct if ct > 0 else 0
+                key = ";".join(stack)
+                stacks[key] = stacks.get(key, 0) + tt*scale
+                if len(stack) >= MAX_DEPTH:
+                    return
+                for callee, edge_time in callees.get(func, []):
+                    name = _func_name(callee)
+                    if name not in stack:  # recursion
+                        walk(callee, stack + [name], edge_time*scale)
+
+            for func in roots:
+                walk(func, [root, _func_name(func)], data[func][3])
+        return [
+            "{0} {1}".format(stack, int(round(time*1e6)))
+            for stack, time in sorted(stacks.items())
+            if time*1e6 >= 0.5
+        ]
+
+    def write_collapsed(self, fname):
+        """Write the collapsed stacks to a file."""
+        with open(fname, "w") as f:
+            for line in self.collapsed():
+                f.write(line + "\n")
@@ -0,0 +1,187 @@
+"""
+This code is part of the Mathematical Programming Toolbox PyMPL.
+
+Copyright (C) 2015-2016, Filipe Brandao
+Faculdade de Ciencias, Universidade do Porto
+Porto, Portugal. All rights reserved. E-mail: <fdabrandao@dcc.fc.up.pt>.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from builtins import object
+
+import os
+import atexit
+import signal
+import shutil
+import weakref
+import tempfile
+import threading
+
+SHM_DIR = "/dev/shm"
+
+
+class _AtExit(object):
+    """Call func(*args) once, at the latest when the interpreter exits
+    (replaces weakref.finalize on Python 2)."""
+
+    def __init__(self, obj, func, *args):
+        self._call = (func, args)
+        atexit.register(self)
+
+    def __call__(self):
+        call, self._call = self._call, None
+        if call is not None:
+            call[0](*call[1])
+
+
+_finalize = getattr(weakref, "finalize", _AtExit)
+
+
+def _running(proc):
+    """Check if a process has not been waited for (processes are not
+    polled here, since Tools.run collects their resource usage)."""
+    return proc.returncode is None
+
+
+def _killpg(proc, sig):
+    """Send a signal to the process group of a process."""
+    try:
+        os.killpg(proc.pid, sig)
+    except OSError:
+        pass
+
+
+class Workspace(object):
+    """Temporary directory and child processes of a pipeline.
+
+    A workspace creates its directory on first use (in root, in /dev/shm
+    if shm=True and it exists, or in the default temporary directory),
+    allocates unique file names atomically and keeps track of the
+    processes it runs, so that several pipelines can run concurrently in
+    the same process. Use it as a context manager or call clear() to kill
+    its processes and delete its files (the directory is also deleted when
+    the workspace is garbage collected or the interpreter exits).
+    """
+
+    ALL = weakref.WeakSet()
+    ALL_LOCK = threading.RLock()  # reentrant: clear() runs in handlers
+
+    def __init__(self, root=None, shm=False, prefix="pympl-"):
+        if root is None and shm and os.path.isdir(SHM_DIR):
+            root = SHM_DIR
+        self.root = root
+        self.prefix = prefix
+        self.directory = None
+        self.processes = []
+        self.cancelled = False
+        self._finalizer = None
+        self._count = 0
+        self._lock = threading.RLock()
+        with Workspace.ALL_LOCK:
+            Workspace.ALL.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.clear()
+
+    def tmp_dir(self):
+        """Return the directory of the workspace (created on first use)."""
+        with self._lock:
+            if self.directory is None:
+                if self.root is not None and not os.path.exists(self.root):
+                    os.makedirs(self.root)
+                self.directory = tempfile.mkdtemp(
+                    prefix=self.prefix, dir=self.root
+                )
+                # delete the directory if the workspace is never cleared
+                self._finalizer = _finalize(
+                    self, shutil.rmtree, self.directory, True
+                )
+            elif not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            return self.directory
+
+    def new_file(self, ext="tmp"):
+        """Return a new file name in the workspace."""
+        if not ext.startswith("."):
+            ext = ".{0}".format(ext)
+        tmp_dir = self.tmp_dir()
+        with self._lock:
+            count = self._count
+            self._count += 1
+        return "{0}/{1}{2}".format(tmp_dir, count, ext)
+
+    def track(self, proc):
+        """Track a child process (started in a new session); after
+        cancel(), the process is killed right away."""
+        with self._lock:
+            self.processes.append(proc)
+            if self.cancelled:
+                _killpg(proc, signal.SIGTERM)
+
+    def untrack(self, proc):
+        """Stop tracking a child process."""
+        with self._lock:
+            if proc in self.processes:
+                self.processes.remove(proc)
+
+    def reap(self):
+        """Stop tracking the processes that have finished."""
+        with self._lock:
+            self.processes[:] = [
+                proc for proc in self.processes if _running(proc)
+            ]
+
+    def kill(self, sig=signal.SIGTERM):
+        """Send a signal to the process groups of the child processes."""
+        self.reap()
+        with self._lock:
+            processes = list(self.processes)
+        for proc in processes:
+            _killpg(proc, sig)
+
+    def cancel(self):
+        """Kill the child processes and any process tracked later."""
+        with self._lock:
+            self.cancelled = True
+            self.kill()
+
+    def clear(self):
+        """Kill the child processes and delete the directory."""
+        self.kill()
+        with self._lock:
+            self.directory = None
+            finalizer, self._finalizer = self._finalizer, None
+        if finalizer is not None:
+            finalizer()  # deletes the directory
+
+    @staticmethod
+    def clear_all():
+        """Clear every workspace."""
+        with Workspace.ALL_LOCK:
+            workspaces = list(Workspace.ALL)
+        for workspace in workspaces:
+            workspace.clear()
+
+    def run(self, cmd, **kwargs):
+        """Run a system command in this workspace (see Tools.run)."""
+        from .tools import Tools
+        return Tools.run(cmd, workspace=self, **kwargs)
+
+    def script(self, script_name, model, **kwargs):
+        """Call a solver script in this workspace (see Tools.script)."""
+        from .tools import Tools
+        return Tools.script(script_name, model, workspace=self, **kwargs)
@@ -30,6 +30,7 @@ usage(){
     echo -e "Usage:"
     echo -e "  $0 --mps/--lp model.mps/.lp"
     echo -e "  $0 --mps/--lp model.mps/.lp --wsol vars.sol"
+    echo -e "  $0 --mps/--lp model.mps/.lp --start start.sol --wsol vars.sol"
 }
 
 error(){
@@ -43,20 +44,26 @@ solve(){
     local model_file=$1
     echo -e "\n>>> solving the MIP model using COIN-OR CBC..."
     echo -e "Note: different parameter settings may improve the performance substantially!"
+    # run the solver in the foreground so that it receives SIGINT
+    # (background jobs ignore it), e.g., from a stop rule of Tools.run;
+    # the wrapper then carries on to report the incumbent
+    trap ":" SIGINT
+    local start=""
+    if [[ -n "$start_file" ]]; then
+        start="-mipstart $start_file"
+    fi
     if ! [ -x "$(command -v stdbuf)" ]; then
-        cbc $model_file $options -solve -solu $TMP_DIR/sol.out &
+        cbc $model_file $start $options -solve -solu $TMP_DIR/sol.out
     else
-        stdbuf -i0 -o0 -e0 cbc $model_file $options -solve -solu $TMP_DIR/sol.out &
+        stdbuf -i0 -o0 -e0 cbc $model_file $start $options -solve -solu $TMP_DIR/sol.out
     fi
-    local pid=$!
-    trap "kill $pid &> /dev/null" SIGHUP SIGINT SIGTERM
-    wait $pid
     tail -n +2 $TMP_DIR/sol.out | awk '{ print $2, $3 }' > $TMP_DIR/vars.sol
 }
 
 options="-cuts off -randomSeed 1234 -randomCbcSeed 1234"
 model_file=""
 sol_file=""
+start_file=""
 
 while true;
 do
@@ -93,6 +100,14 @@ do
         fi
         shift 2;;
 
+    --start)
+        if [[ -n "$2" && -e "$2" ]]; then
+            start_file=$2
+        else
+            error
+        fi
+        shift 2;;
+
     *)
         if [[ -n "$1" ]]; then
             error
@@ -30,6 +30,7 @@ usage(){
     echo -e "Usage:"
     echo -e "  $0 --mps/--lp model.mps/.lp"
     echo -e "  $0 --mps/--lp model.mps/.lp --wsol vars.sol"
+    echo -e "  $0 --mps/--lp model.mps/.lp --start start.sol --wsol vars.sol"
 }
 
 error(){
@@ -43,16 +44,17 @@ solve(){
     local model_file=$1
     echo -e "\n>>> solving the MIP model using GLPK..."
     echo -e "Note: different parameter settings may improve the performance substantially!"
+    # run the solver in the foreground so that it receives SIGINT
+    # (background jobs ignore it), e.g., from a stop rule of Tools.run;
+    # the wrapper then carries on to report the incumbent
+    trap ":" SIGINT
+    if [[ -n "$start_file" ]]; then
+        echo -e "Warning: GLPK does not support MIP starts (--start ignored)."
+    fi
     if [[ $model_file =~ \.mps$ ]]; then
-        glpsol --mps $model_file $options -o $TMP_DIR/sol.out &
-        local pid=$!
-        trap "kill $pid &> /dev/null" SIGHUP SIGINT SIGTERM
-        wait $pid
+        glpsol --freemps $model_file $options -o $TMP_DIR/sol.out
     else
-        glpsol --lp $model_file $options -o $TMP_DIR/sol.out &
-        local pid=$!
-        trap "kill $pid &> /dev/null" SIGHUP SIGINT SIGTERM
-        wait $pid
+        glpsol --lp $model_file $options -o $TMP_DIR/sol.out
     fi
     sed -n '/Column name/,/^$/p' $TMP_DIR/sol.out > $TMP_DIR/sol.out2
     mv $TMP_DIR/sol.out2 $TMP_DIR/sol.out
@@ -70,6 +72,7 @@ solve(){
 options="--seed 1234"
 model_file=""
 sol_file=""
+start_file=""
 
 while true;
 do
@@ -106,6 +109,14 @@ do
         fi
         shift 2;;
 
+    --start)
+        if [[ -n "$2" && -e "$2" ]]; then
+            start_file=$2
+        else
+            error
+        fi
+        shift 2;;
+
     *)
         if [[ -n "$1" ]]; then
             error
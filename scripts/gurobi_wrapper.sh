@@ -30,6 +30,7 @@ usage(){
     echo -e "Usage:"
     echo -e "  $0 --mps/--lp model.mps/.lp"
     echo -e "  $0 --mps/--lp model.mps/.lp --wsol vars.sol"
+    echo -e "  $0 --mps/--lp model.mps/.lp --start start.sol --wsol vars.sol"
 }
 
 error(){
@@ -43,10 +44,15 @@ solve(){
     local model_file=$1
     echo -e "\n>>> solving the MIP model using Gurobi..."
     echo -e "Note: different parameter settings may improve the performance substantially!"
-    gurobi_cl $options ResultFile=$TMP_DIR/vars.sol $model_file &
-    local pid=$!
-    trap "kill $pid &> /dev/null" SIGHUP SIGINT SIGTERM
-    wait $pid
+    # run the solver in the foreground so that it receives SIGINT
+    # (background jobs ignore it), e.g., from a stop rule of Tools.run;
+    # the wrapper then carries on to report the incumbent
+    trap ":" SIGINT
+    local start=""
+    if [[ -n "$start_file" ]]; then
+        start="InputFile=$start_file"
+    fi
+    gurobi_cl $options $start ResultFile=$TMP_DIR/vars.sol $model_file
     sed '/#/d' $TMP_DIR/vars.sol > $TMP_DIR/vars.sol2
     mv $TMP_DIR/vars.sol2 $TMP_DIR/vars.sol
 }
@@ -55,6 +61,7 @@ options="Threads=1 Presolve=1 Method=2 MIPFocus=1 Heuristics=1 MIPGap=0 Seed=123
 model_file=""
 model_file=""
 sol_file=""
+start_file=""
 
 while true;
 do
@@ -91,6 +98,14 @@ do
         fi
         shift 2;;
 
+    --start)
+        if [[ -n "$2" && -e "$2" ]]; then
+            start_file=$2
+        else
+            error
+        fi
+        shift 2;;
+
     *)
         if [[ -n "$1" ]]; then
             error
@@ -30,6 +30,7 @@ usage(){
     echo -e "Usage:"
     echo -e "  $0 --mps/--lp model.mps/.lp"
     echo -e "  $0 --mps/--lp model.mps/.lp --wsol vars.sol"
+    echo -e "  $0 --mps/--lp model.mps/.lp --start start.sol --wsol vars.sol"
 }
 
 error(){
@@ -43,17 +44,18 @@ solve(){
     local model_file=$1
     echo -e "\n>>> solving the MIP model using lp_solve..."
     echo -e "Note: different parameter settings may improve the performance substantially!"
+    # run the solver in the foreground so that it receives SIGINT
+    # (background jobs ignore it), e.g., from a stop rule of Tools.run;
+    # the wrapper then carries on to report the incumbent
+    trap ":" SIGINT
+    if [[ -n "$start_file" ]]; then
+        echo -e "Warning: lp_solve does not support MIP starts (--start ignored)."
+    fi
     if [[ $model_file =~ \.mps$ ]]; then
-        lp_solve -mps $model_file $options > $TMP_DIR/sol.out  &
-        local pid=$!
-        trap "kill $pid &> /dev/null" SIGHUP SIGINT SIGTERM
-        wait $pid
+        lp_solve -fmps $model_file $options > $TMP_DIR/sol.out
     else
         echo -e "Note: lp_solve requires xli_CPLEX to read CPLEX lp models"
-        lp_solve -rxli xli_CPLEX $model_file $options > $TMP_DIR/sol.out &
-        local pid=$!
-        trap "kill $pid &> /dev/null" SIGHUP SIGINT SIGTERM
-        wait $pid
+        lp_solve -rxli xli_CPLEX $model_file $options > $TMP_DIR/sol.out
     fi
     sed -e '1,/variables:/d' $TMP_DIR/sol.out > $TMP_DIR/vars.sol
 }
@@ -62,6 +64,7 @@ options=""
 model_file=""
 model_file=""
 sol_file=""
+start_file=""
 
 while true;
 do
@@ -98,6 +101,14 @@ do
         fi
         shift 2;;
 
+    --start)
+        if [[ -n "$2" && -e "$2" ]]; then
+            start_file=$2
+        else
+            error
+        fi
+        shift 2;;
+
     *)
         if [[ -n "$1" ]]; then
             error
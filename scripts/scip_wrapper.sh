@@ -30,6 +30,7 @@ usage(){
     echo -e "Usage:"
     echo -e "  $0 --mps/--lp model.mps/.lp"
     echo -e "  $0 --mps/--lp model.mps/.lp --wsol vars.sol"
+    echo -e "  $0 --mps/--lp model.mps/.lp --start start.sol --wsol vars.sol"
 }
 
 error(){
@@ -43,16 +44,20 @@ solve(){
     local model_file=$1
     echo -e "\n>>> solving the MIP model using SCIP..."
     echo -e "Note: different parameter settings may improve the performance substantially!"
+    # run the solver in the foreground so that it receives SIGINT
+    # (background jobs ignore it), e.g., from a stop rule of Tools.run;
+    # the wrapper then carries on to report the incumbent
+    trap ":" SIGINT
     rm -rf $TMP_DIR/vars.sol;
     (
         echo "read $model_file"
+        if [[ -n "$start_file" ]]; then
+            echo "read $start_file"
+        fi
         echo -e "$options"
         echo "optimize"
         echo "write solution $TMP_DIR/vars.sol"
-    ) | scip &
-    local pid=$!
-    trap "kill $pid &> /dev/null" SIGHUP SIGINT SIGTERM
-    wait $pid
+    ) | scip
     echo ""
     tail -n+3 $TMP_DIR/vars.sol | awk '{ print $1, $2 }' > $TMP_DIR/vars.sol2
     mv $TMP_DIR/vars.sol2 $TMP_DIR/vars.sol
@@ -62,6 +67,7 @@ options=""
 model_file=""
 model_file=""
 sol_file=""
+start_file=""
 
 while true;
 do
@@ -98,6 +104,14 @@ do
         fi
         shift 2;;
 
+    --start)
+        if [[ -n "$2" && -e "$2" ]]; then
+            start_file=$2
+        else
+            error
+        fi
+        shift 2;;
+
     *)
         if [[ -n "$1" ]]; then
             error